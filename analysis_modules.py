@@ -0,0 +1,572 @@
+"""
+/analysis 模块注册表
+
+Every module of an /analysis response (score_summary, sleep_structure,
+night_fluctuation, ...) is registered as its own producer together with
+the UserProfile fields it reads. A request runs only the producers its
+`modules` list names (all of them when the list is empty) and loads only
+the union of their fields. Intermediate values several modules share --
+the requested nights, last night's hypnogram metrics, the period score --
+live on AnalysisContext as cached properties, computed on first use and at
+most once per request.
+
+"sleep_data" in a module's fields means "the nights of the request's
+days": a TsRange over the local calendar days of the request, or the
+latest night when a day/explore request names no date.
+"""
+import datetime
+from functools import cached_property
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, NamedTuple, Optional
+
+from sleep_analytics import analyze_nights, fluctuation_score, night_vitals, score_label
+from user_profile import (
+  AGGREGATE_WINDOWS, AnalysisData, ProfileView, UserProfile,
+  day_range, epoch_day, nights_between, resolve_timezone, top_scenes,
+)
+
+# calendar days of sleep_data each request type covers, ending at the request date
+ANALYSIS_DAYS = {
+  "analysis_overview":    7,
+  "analysis_sleep_day":   1,
+  "analysis_sleep_week":  7,
+  "analysis_sleep_month": 30,
+  "analysis_explore":     1,
+}
+
+# numeric behaviors the week/month analysis summarizes from their day rollups
+VITAL_TREND_TYPES = (
+  "heart_rate", "resting_heart_rate", "heart_rate_variability_sdnn", "respiratory_rate", "blood_oxygen",
+)
+
+
+def today(d: AnalysisData) -> datetime.date:
+  return datetime.datetime.now(resolve_timezone(d.timezone)).date()
+
+
+def range_dates(d: AnalysisData, days: int) -> tuple[str, str]:
+  """start_date/end_date of the request, defaulting to the `days` days ending today."""
+  now = today(d)
+  start = d.start_date or (now - datetime.timedelta(days=days - 1)).isoformat()
+  end   = d.end_date   or now.isoformat()
+  return start, end
+
+
+def analysis_window(request_type: str, d: AnalysisData) -> Optional[tuple[str, str]]:
+  """Local calendar days [first, last] of sleep_data a request reads; None = the latest night."""
+  days = ANALYSIS_DAYS.get(request_type)
+  if days is None or (days == 1 and not d.date):
+    return None
+  if request_type in ("analysis_sleep_week", "analysis_sleep_month"):
+    return range_dates(d, days)
+  last = datetime.date.fromisoformat(d.date) if d.date else today(d)
+  return (last - datetime.timedelta(days=days - 1)).isoformat(), last.isoformat()
+
+
+def overall_score(profile: UserProfile | ProfileView, nights: Optional[list] = None) -> Optional[float]:
+  """计算用户平均睡眠质量得分（0-100）
+
+  Averages `nights` when given (the nights of the requested days),
+  otherwise reads the 7-day running aggregate ending today.
+  """
+  if nights is None:
+    week = profile.sleep_aggregates.window(7, epoch_day())
+    return week["sleep_quality"] if week else None
+  scores = [s.sleep_quality for s in nights if s.sleep_quality is not None]
+  return round(sum(scores) / len(scores), 2) if scores else None
+
+
+def scene_title(cmd: str) -> str:
+  return cmd.replace("sleep.scene.", "").replace("_", " ").title()
+
+
+class AnalysisContext:
+  """一次 /analysis 请求的共享中间结果（按需计算，至多一次）"""
+
+  def __init__(self, request_type: str, d: AnalysisData, profile: Optional[ProfileView]):
+    self.request_type = request_type
+    self.d = d
+    self.profile = profile
+
+  @cached_property
+  def tz(self) -> datetime.tzinfo:
+    return resolve_timezone(self.d.timezone)
+
+  @cached_property
+  def date(self) -> str:
+    return self.d.date or today(self.d).isoformat()
+
+  @cached_property
+  def span(self) -> tuple[str, str]:
+    """start/end dates a week or month response reports."""
+    return range_dates(self.d, ANALYSIS_DAYS[self.request_type])
+
+  @cached_property
+  def nights(self) -> list:
+    """Nights on the requested local days, found by bisect on the sorted sleep_data."""
+    if self.profile is None or not self.profile.sleep_data:
+      return []
+    window = analysis_window(self.request_type, self.d)
+    if window is None:
+      return self.profile.sleep_data[-1:]
+    return nights_between(self.profile.sleep_data, *window, self.tz)
+
+  @cached_property
+  def latest(self):
+    return self.nights[-1] if self.nights else None
+
+  @cached_property
+  def period_score(self) -> Optional[float]:
+    """Mean sleep_quality of the request's days.
+
+    A default trailing range reads the running 7/30-day aggregate (UTC
+    days, ending at epoch_day of the local end date) in O(1); a range the
+    request names averages its own nights.
+    """
+    if self.profile is None:
+      return None
+    days = ANALYSIS_DAYS[self.request_type]
+    if self.request_type == "analysis_overview":
+      end, explicit = self.date, bool(self.d.date)
+    else:
+      end, explicit = self.span[1], bool(self.d.start_date or self.d.end_date)
+    if explicit:
+      return overall_score(self.profile, self.nights)
+    rolling = self.profile.sleep_aggregates.window(days, epoch_day(end, self.tz))
+    return rolling["sleep_quality"] if rolling else None
+
+  def top_scenes_between(self, start: str, end: str, n: int) -> list:
+    """Most used scenes with their sop_start counts over [start, end]."""
+    if self.profile is None:
+      return []
+    days = (datetime.date.fromisoformat(end) - datetime.date.fromisoformat(start)).days + 1
+    return top_scenes(self.profile.scene_usage, epoch_day(end, self.tz), days, n)
+
+  # ---- last night (explore) ----
+
+  @cached_property
+  def summaries(self) -> dict:
+    latest = self.latest
+    return latest.sequence_summaries if (latest and latest.sleep_status) else {}
+
+  @cached_property
+  def night(self) -> Optional[Dict[str, float]]:
+    """Hypnogram metrics of the latest night."""
+    return self._night_metrics.night(0) if self._night_metrics else None
+
+  @cached_property
+  def _night_metrics(self):
+    return analyze_nights([self.latest]) if self.latest else None
+
+  def _night_vitals(self, behavior: str) -> Optional[dict]:
+    if not self.night:
+      return None
+    metrics = self._night_metrics
+    return night_vitals(self.profile.behavior_rollups.get(behavior), int(metrics.bed_start[0]), int(metrics.bed_end[0]))
+
+  @cached_property
+  def heart_rate(self) -> Optional[dict]:
+    return self._night_vitals("heart_rate")
+
+  @cached_property
+  def respiration(self) -> Optional[dict]:
+    return self._night_vitals("respiratory_rate")
+
+  @cached_property
+  def onset_score(self) -> int:
+    if self.latest and self.latest.soe:
+      return int(self.latest.soe)
+    return round(self.night["efficiency"]) if self.night else 82
+
+  @cached_property
+  def structure_score(self) -> int:
+    return round(self.night["structure_score"]) if self.night else 49
+
+  @cached_property
+  def fluctuation_score(self) -> int:
+    night = self.night
+    if not night:
+      return 34
+    hr_cv = self.heart_rate["cv_pct"] if self.heart_rate else 0.0
+    return round(float(fluctuation_score(night["waso"], night["awakenings"], night["fragmentation"], hr_cv)))
+
+
+class AnalysisModule(NamedTuple):
+  name: str
+  produce: Callable[[AnalysisContext], Any]
+  fields: FrozenSet[str]
+
+
+class AnalysisRegistry:
+  """request_type -> 有序的模块生产者，以及各自依赖的 UserProfile 字段"""
+
+  def __init__(self):
+    self._modules: Dict[str, Dict[str, AnalysisModule]] = {}
+
+  def module(self, request_type: str, name: str, fields: Iterable[str] = ()):
+    """Decorator registering `fn(ctx)` as module `name` of `request_type`; response keys follow registration order."""
+    def register(fn: Callable[[AnalysisContext], Any]):
+      self._modules.setdefault(request_type, {})[name] = AnalysisModule(name, fn, frozenset(fields))
+      return fn
+    return register
+
+  def request_types(self) -> List[str]:
+    return list(self._modules)
+
+  def select(self, request_type: str, modules: Optional[Iterable[str]] = None) -> List[AnalysisModule]:
+    """Producers for the requested modules (all when none are named); unknown names are ignored."""
+    registered = self._modules.get(request_type)
+    if registered is None:
+      raise ValueError(f"Unknown request_type: {request_type}")
+    if not modules:
+      return list(registered.values())
+    wanted = set(modules)
+    return [module for name, module in registered.items() if name in wanted]
+
+  def fields(self, request_type: str, d: AnalysisData) -> dict:
+    """get_profile field spec covering the requested modules, sleep_data narrowed to the request's days."""
+    if request_type not in self._modules:
+      return {}
+    names = set().union(*(module.fields for module in self.select(request_type, d.modules)))
+    spec = {name: None for name in sorted(names - {"sleep_data"})}
+    if "sleep_data" in names:
+      window = analysis_window(request_type, d)
+      spec["sleep_data"] = 1 if window is None else day_range(*window, resolve_timezone(d.timezone))
+    return spec
+
+  def build(self, request_type: str, d: AnalysisData, profile: Optional[ProfileView]) -> dict:
+    ctx = AnalysisContext(request_type, d, profile)
+    return {module.name: module.produce(ctx) for module in self.select(request_type, d.modules)}
+
+
+ANALYSIS_MODULES = AnalysisRegistry()
+module = ANALYSIS_MODULES.module
+
+_PERIOD_SCORE_FIELDS = ("sleep_data", "sleep_aggregates")
+
+
+# -------------------------- analysis_overview --------------------------
+def _overview_score(ctx: AnalysisContext) -> float:
+  score = ctx.period_score
+  return 82 if score is None else score
+
+
+@module("analysis_overview", "overall_score", fields=_PERIOD_SCORE_FIELDS)
+def _overview_overall_score(ctx: AnalysisContext) -> dict:
+  return {"score": int(_overview_score(ctx)), "date": ctx.date}
+
+
+@module("analysis_overview", "weekly_best", fields=_PERIOD_SCORE_FIELDS + ("scene_usage",))
+def _overview_weekly_best(ctx: AnalysisContext) -> dict:
+  start = (datetime.date.fromisoformat(ctx.date) - datetime.timedelta(days=6)).isoformat()
+  best = top_scenes(ctx.profile.scene_usage, epoch_day(ctx.date, ctx.tz), 7) if ctx.profile else []
+  if best:
+    cmd, used_times = best[0]
+    return {
+      "audio_name": scene_title(cmd),
+      "used_times": used_times,
+      "score": int(_overview_score(ctx)),
+      "start_date": start,
+      "end_date": ctx.date,
+    }
+  return {
+    "audio_name": "Sedona Red Rocks",
+    "used_times": 5,
+    "score": 92,
+    "start_date": start,
+    "end_date": ctx.date,
+  }
+
+
+@module("analysis_overview", "sleep_insight")
+def _overview_sleep_insight(ctx: AnalysisContext) -> dict:
+  return {
+    "title": "Excellent Deep Sleep Performance",
+    "description": "Your deep sleep accounts for a healthy proportion of total sleep. Keep maintaining a regular sleep schedule.",
+    "date": ctx.date,
+  }
+
+
+# -------------------------- analysis_sleep_day --------------------------
+@module("analysis_sleep_day", "score_summary", fields=("sleep_data",))
+def _day_score_summary(ctx: AnalysisContext) -> dict:
+  latest = ctx.latest
+  score = int(latest.sleep_quality) if latest and latest.sleep_quality else 70
+  return {"score": score, "date": ctx.date}
+
+
+@module("analysis_sleep_day", "sleep_scenarios_reco")
+def _day_sleep_scenarios_reco(ctx: AnalysisContext) -> dict:
+  return {
+    "title": "Sedona Desert Calm",
+    "description": "You fell asleep quickly and maintained a stable sleep rhythm after the scenario started.",
+    "date": ctx.date,
+  }
+
+
+@module("analysis_sleep_day", "stage_insights")
+def _day_stage_insights(ctx: AnalysisContext) -> dict:
+  date = ctx.date
+  return {
+    "awake": {"description": "A brief awakening was detected and you returned to sleep quickly.", "date": date},
+    "rem":   {"description": "REM sleep was sustained and supports emotional processing.", "date": date},
+    "core":  {"description": "Core sleep remained stable across most of the night.", "date": date},
+    "deep":  {"description": "Deep sleep contributed strongly to physical recovery.", "date": date},
+  }
+
+
+# -------------------------- analysis_sleep_week / analysis_sleep_month --------------------------
+def _period_int_score(ctx: AnalysisContext) -> int:
+  score = ctx.period_score
+  default = 86 if ctx.request_type == "analysis_sleep_week" else 89
+  return int(score) if score else default
+
+
+def _score_summary(ctx: AnalysisContext) -> dict:
+  score = _period_int_score(ctx)
+  label = "Excellent" if score >= 80 else "Good" if score >= 60 else "Fair"
+  start, end = ctx.span
+  return {"score": score, "label": label, "start_date": start, "end_date": end}
+
+
+def _sleep_metrics(ctx: AnalysisContext) -> Optional[dict]:
+  """Hypnogram metrics averaged over the requested nights."""
+  return analyze_nights(ctx.nights).mean() if ctx.nights else None
+
+
+def _rolling_trends(ctx: AnalysisContext) -> Optional[dict]:
+  """7/30/90-day means of the nightly metrics ending at the range end, from the running aggregates."""
+  if ctx.profile is None:
+    return None
+  end_day = epoch_day(ctx.span[1], ctx.tz)
+  return {f"{days}d": ctx.profile.sleep_aggregates.window(days, end_day) for days in AGGREGATE_WINDOWS}
+
+
+def _vital_trends(ctx: AnalysisContext) -> dict:
+  """min/max/mean/count per vital over the range (UTC days), plus one entry per day."""
+  if ctx.profile is None:
+    return {}
+  utc = datetime.timezone.utc
+  lo, hi = day_range(*ctx.span, utc)
+  trends = {}
+  for name in VITAL_TREND_TYPES:
+    rollup = ctx.profile.behavior_rollups.get(name)
+    days = rollup["day"].window(lo, hi) if rollup is not None else None
+    summary = days.summary() if days is not None else None
+    if summary is None:
+      continue
+    summary["daily"] = [
+      {"date": datetime.datetime.fromtimestamp(day, utc).date().isoformat(), "min": mn, "max": mx, "mean": mean, "count": n}
+      for day, mn, mx, mean, n in days.to_rows()
+    ]
+    trends[name] = summary
+  return trends
+
+
+module("analysis_sleep_week", "score_summary", fields=_PERIOD_SCORE_FIELDS)(_score_summary)
+
+
+@module("analysis_sleep_week", "sleep_trends")
+def _week_sleep_trends(ctx: AnalysisContext) -> dict:
+  start, end = ctx.span
+  return {
+    "body": "Excellent Deep Sleep Performance",
+    "description": "Your deep sleep accounted for a healthy proportion of total sleep this week.",
+    "start_date": start,
+    "end_date": end,
+  }
+
+
+@module("analysis_sleep_week", "onset_efficiency", fields=_PERIOD_SCORE_FIELDS + ("scene_usage",))
+def _week_onset_efficiency(ctx: AnalysisContext) -> dict:
+  start, end = ctx.span
+  best = ctx.top_scenes_between(start, end, 1)
+  scenario_name, used_times = (scene_title(best[0][0]), best[0][1]) if best else ("Sedona Desert Calm", 5)
+  return {
+    "scenario_name": scenario_name,
+    "used_times": used_times,
+    "score": _period_int_score(ctx),
+    "start_date": start,
+    "end_date": end,
+  }
+
+
+module("analysis_sleep_week", "sleep_metrics", fields=("sleep_data",))(_sleep_metrics)
+module("analysis_sleep_week", "rolling_trends", fields=("sleep_aggregates",))(_rolling_trends)
+module("analysis_sleep_week", "vital_trends", fields=("behavior_rollups",))(_vital_trends)
+
+module("analysis_sleep_month", "score_summary", fields=_PERIOD_SCORE_FIELDS)(_score_summary)
+
+
+@module("analysis_sleep_month", "sleep_trends", fields=("sleep_data",))
+def _month_sleep_trends(ctx: AnalysisContext) -> dict:
+  start, end = ctx.span
+  # Build score_series from real data, fall back to mock trend
+  score_series: list = []
+  for sr in ctx.nights:
+    if sr.sleep_quality is not None:
+      score_series.append({
+        "date": datetime.datetime.fromtimestamp(sr.timestamp, ctx.tz).date().isoformat(),
+        "score": int(sr.sleep_quality),
+      })
+  if not score_series:
+    cur = datetime.date.fromisoformat(start)
+    end_d = datetime.date.fromisoformat(end)
+    base = 62
+    while cur <= end_d:
+      score_series.append({"date": cur.isoformat(), "score": min(100, base)})
+      base += 1
+      cur += datetime.timedelta(days=1)
+  return {
+    "body": "This month, you maintained a consistent amount of sleep.",
+    "description": "Deep sleep remained above the standard level and your bedtime trended earlier.",
+    "score_series": score_series,
+    "start_date": start,
+    "end_date": end,
+  }
+
+
+@module("analysis_sleep_month", "onset_efficiency", fields=("scene_usage",))
+def _month_onset_efficiency(ctx: AnalysisContext) -> dict:
+  start, end = ctx.span
+  scenario_list = [scene_title(cmd) for cmd, _ in ctx.top_scenes_between(start, end, 3)]
+  if not scenario_list:
+    scenario_list = ["Sedona Desert Calm", "Maldives Drift Sleep", "Canadian Forest Solace"]
+  return {
+    "scenario_list": scenario_list,
+    "description": f"{scenario_list[0]} was your most frequently used sleep scenario this month and showed the best onset performance.",
+    "start_date": start,
+    "end_date": end,
+  }
+
+
+module("analysis_sleep_month", "sleep_metrics", fields=("sleep_data",))(_sleep_metrics)
+module("analysis_sleep_month", "rolling_trends", fields=("sleep_aggregates",))(_rolling_trends)
+module("analysis_sleep_month", "vital_trends", fields=("behavior_rollups",))(_vital_trends)
+
+
+# -------------------------- analysis_explore --------------------------
+_NIGHT_FIELDS = ("sleep_data", "behavior_rollups")
+
+
+@module("analysis_explore", "data_ready", fields=("sleep_data",))
+def _explore_data_ready(ctx: AnalysisContext) -> bool:
+  return bool(ctx.nights)
+
+
+@module("analysis_explore", "header_summary")
+def _explore_header_summary(ctx: AnalysisContext) -> dict:
+  return {
+    "intro_text": "Last night your body entered a stable, relaxed, and highly restorative sleep state.",
+    "intro_detail_text": "What happened last night, what helped you most, and how Mindora adjusted for you.",
+    "date": ctx.date,
+  }
+
+
+@module("analysis_explore", "score_summary", fields=_NIGHT_FIELDS)
+def _explore_score_summary(ctx: AnalysisContext) -> dict:
+  latest = ctx.latest
+  return {
+    "score": int(latest.sleep_quality) if latest and latest.sleep_quality else 82,
+    "title": "Sleep Score",
+    "efficiency_score":   ctx.onset_score,
+    "structure_score":    ctx.structure_score,
+    "fluctuation_score":  ctx.fluctuation_score,
+    "date": ctx.date,
+  }
+
+
+@module("analysis_explore", "onset_efficiency", fields=("sleep_data",))
+def _explore_onset_efficiency(ctx: AnalysisContext) -> dict:
+  latest, night = ctx.latest, ctx.night
+  if night:
+    onset_minutes = round(night["latency"])
+  else:
+    onset_minutes = round(latest.onset) if latest and latest.onset is not None else 12
+  return {
+    "score": ctx.onset_score,
+    "label": "Healthy Range" if onset_minutes <= 30 else "Slow Onset",
+    "onset_minutes": onset_minutes,
+    "first_sleep_time":           latest.first_sleep_time if latest else "23:45",
+    "pre_sleep_heart_rate":       f"{int(latest.hr_before_sleep)}bpm"  if latest and latest.hr_before_sleep  else "68bpm",
+    "pre_sleep_respiratory_rate": f"{int(latest.rr_before_sleep)}brpm" if latest and latest.rr_before_sleep else "15brpm",
+    "description": "You fell asleep faster than your recent average and your pre-sleep physiology stayed calm.",
+    "date": ctx.date,
+  }
+
+
+@module("analysis_explore", "sleep_structure", fields=("sleep_data",))
+def _explore_sleep_structure(ctx: AnalysisContext) -> dict:
+  summaries = ctx.summaries
+  tb = summaries.get("time_in_bed") or 1
+  rem_pct  = f"{round(summaries.get('rem_sleep_duration',  0) / tb * 100, 1)}%" if summaries else "22%"
+  deep_pct = f"{round(summaries.get('deep_sleep_duration', 0) / tb * 100, 1)}%" if summaries else "29.8%"
+  core_pct = f"{round(summaries.get('core_sleep_duration', 0) / tb * 100, 1)}%" if summaries else "48.2%"
+  return {
+    "score": ctx.structure_score,
+    "label": score_label(ctx.structure_score),
+    "continuous_sleep_minutes": int(ctx.night["longest_sleep"]) if ctx.night else int(tb),
+    "rem_percent":  rem_pct,
+    "deep_percent": deep_pct,
+    "core_percent": core_pct,
+    "description": "Your sleep structure remained relatively balanced, with deep sleep contributing strongly to recovery.",
+    "date": ctx.date,
+  }
+
+
+@module("analysis_explore", "night_fluctuation", fields=_NIGHT_FIELDS)
+def _explore_night_fluctuation(ctx: AnalysisContext) -> dict:
+  latest, summaries = ctx.latest, ctx.summaries
+  hr, resp = ctx.heart_rate, ctx.respiration
+  if hr:
+    hr_range = f"{int(hr['min'])}-{int(hr['max'])}bpm"
+  else:
+    hr_mid = int(latest.avg_heart_rate) if latest and latest.avg_heart_rate else 70
+    hr_range = f"{hr_mid - 15}-{hr_mid + 15}bpm"
+  if resp:
+    resp_fluct = f"{round(resp['cv_pct'])}%"
+  else:
+    resp_fluct = f"{int(latest.respiratory_var or 25)}%" if latest else "25%"
+  awake_count = summaries.get("night_awake_count", 2)
+  return {
+    "score": ctx.fluctuation_score,
+    "label": "High Fluctuation" if awake_count > 3 else "Normal",
+    "intervention": "Rain Wash",
+    "awake_count":            awake_count,
+    "awake_duration_minutes": int(summaries.get("night_awake_duration", 5)),
+    "awake_type":             summaries.get("night_awake_type") or "Brief awakening",
+    "heart_rate_range":       hr_range,
+    "respiratory_fluctuation": resp_fluct,
+    "description": "You had a small number of brief interruptions and the system applied a suitable intervention.",
+    "date": ctx.date,
+  }
+
+
+@module("analysis_explore", "scene_preference", fields=("scene_usage",))
+def _explore_scene_preference(ctx: AnalysisContext) -> dict:
+  date = ctx.date
+  scene_id   = "cocos_island_moonlight"
+  scene_name = "Cocos Island Moonlight"
+  if ctx.profile:
+    # this week's favourite, else the all-time one
+    usage = ctx.profile.scene_usage
+    end_day = epoch_day(date, ctx.tz)
+    best = top_scenes(usage, end_day, 7) or top_scenes(usage, end_day)
+    if best:
+      scene_id   = best[0][0].replace("sleep.scene.", "")
+      scene_name = scene_title(best[0][0])
+  return {
+    "scene_id":   scene_id,
+    "scene_name": scene_name,
+    "scene_type": "Ocean wind with slow percussion",
+    "description": "This scene has recently matched your sleep onset rhythm most consistently.",
+    "start_date": (datetime.date.fromisoformat(date) - datetime.timedelta(days=6)).isoformat(),
+    "end_date":   date,
+  }
+
+
+@module("analysis_explore", "sleep_advice")
+def _explore_sleep_advice(ctx: AnalysisContext) -> dict:
+  return {
+    "description": "Keep your current bedtime and continue using the same wind-down scene for the next few nights.",
+    "date": ctx.date,
+  }
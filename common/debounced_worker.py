@@ -0,0 +1,180 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Set, Tuple
+
+
+class _Job:
+  __slots__ = ("first_at", "due_at", "seq", "tags")
+
+  def __init__(self, now: float):
+    self.first_at = now
+    self.due_at = now
+    self.seq = 0
+    self.tags: Set[str] = set()
+
+
+class DebouncedWorker:
+  """按uid去抖的后台任务池
+
+  schedule(uid, tags) asks for `run(uid, tags)` on one of `workers` threads.
+  Requests for a uid that has not started yet are coalesced into one job
+  (tags are unioned) that runs `debounce_sec` after the latest request, but
+  never later than `max_delay_sec` after the first, so a steady stream of
+  updates cannot starve it. A uid never runs on two threads at once: a
+  request arriving while its job runs is queued behind it.
+
+  stats() reports queue depth, the age of the oldest waiting job and run
+  times.
+  """
+
+  def __init__(self, run: Callable[[str, Set[str]], None], workers: int = 4,
+               debounce_sec: float = 5.0, max_delay_sec: float = 60.0, name: str = "debounced-worker"):
+    self.run = run
+    self.debounce = max(debounce_sec, 0.0)
+    self.max_delay = max(max_delay_sec, self.debounce)
+    self._cond = threading.Condition()
+    # uid -> job waiting to run; in _heap unless that uid is running right now
+    self._pending: Dict[str, _Job] = {}
+    self._heap: List[Tuple[float, int, str]] = []
+    self._running: Set[str] = set()
+    self._seq = itertools.count(1)
+    self._closed = False
+    # metrics
+    self._scheduled = 0
+    self._coalesced = 0
+    self._runs = 0
+    self._failed = 0
+    self._dropped = 0
+    self._run_sec = 0.0
+    self._max_run_sec = 0.0
+    self._wait_sec = 0.0
+    self._max_wait_sec = 0.0
+
+    self._threads = [
+      threading.Thread(target=self._loop, name=f"{name}-{i}", daemon=True)
+      for i in range(max(1, workers))
+    ]
+    for thread in self._threads:
+      thread.start()
+
+  def schedule(self, uid: str, tags: Iterable[str] = ()) -> bool:
+    """Queue (or push back) the job of `uid`; False once closed."""
+    with self._cond:
+      if self._closed:
+        return False
+      now = time.monotonic()
+      job = self._pending.get(uid)
+      if job is None:
+        job = self._pending[uid] = _Job(now)
+      else:
+        self._coalesced += 1
+      self._scheduled += 1
+      job.tags.update(tags)
+      job.due_at = min(now + self.debounce, job.first_at + self.max_delay)
+      job.seq = next(self._seq)
+      if uid not in self._running:
+        heapq.heappush(self._heap, (job.due_at, job.seq, uid))
+        # wait_idle() callers share the condition, so wake everyone
+        self._cond.notify_all()
+      return True
+
+  def _next_job(self):
+    """Block until a job is due; None when closed."""
+    with self._cond:
+      while True:
+        # entries of rescheduled jobs are superseded by the one with the latest seq
+        while self._heap:
+          due_at, seq, uid = self._heap[0]
+          job = self._pending.get(uid)
+          if job is not None and job.seq == seq:
+            break
+          heapq.heappop(self._heap)
+        if self._closed:
+          return None
+        if not self._heap:
+          self._cond.wait()
+          continue
+        wait = due_at - time.monotonic()
+        if wait > 0:
+          self._cond.wait(wait)
+          continue
+        heapq.heappop(self._heap)
+        del self._pending[uid]
+        self._running.add(uid)
+        return uid, job
+
+  def _loop(self):
+    while True:
+      item = self._next_job()
+      if item is None:
+        return
+      uid, job = item
+      start = time.monotonic()
+      failed = False
+      try:
+        self.run(uid, job.tags)
+      except Exception as e:
+        logging.exception("background job for uid=%s failed: %s", uid, e)
+        failed = True
+      end = time.monotonic()
+
+      with self._cond:
+        self._runs += 1
+        self._failed += failed
+        self._run_sec += end - start
+        self._max_run_sec = max(self._max_run_sec, end - start)
+        self._wait_sec += start - job.first_at
+        self._max_wait_sec = max(self._max_wait_sec, start - job.first_at)
+        self._running.discard(uid)
+        # a request that came in while this job ran
+        later = self._pending.get(uid)
+        if later is not None:
+          heapq.heappush(self._heap, (later.due_at, later.seq, uid))
+        self._cond.notify_all()
+
+  def wait_idle(self, timeout: float = None) -> bool:
+    """Block until no job is waiting or running; False on timeout."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    with self._cond:
+      while self._pending or self._running:
+        remaining = None if deadline is None else deadline - time.monotonic()
+        if remaining is not None and remaining <= 0:
+          return False
+        self._cond.wait(remaining)
+      return True
+
+  def stats(self) -> dict:
+    with self._cond:
+      now = time.monotonic()
+      runs = self._runs or 1
+      oldest = min((job.first_at for job in self._pending.values()), default=now)
+      return {
+        "queued": len(self._pending),
+        "running": len(self._running),
+        "oldest_queued_ms": round((now - oldest) * 1000, 1),
+        "scheduled": self._scheduled,
+        "coalesced": self._coalesced,
+        "runs": self._runs,
+        "failed": self._failed,
+        "dropped": self._dropped,
+        "avg_run_ms": round(self._run_sec / runs * 1000, 3),
+        "max_run_ms": round(self._max_run_sec * 1000, 3),
+        "avg_queue_wait_ms": round(self._wait_sec / runs * 1000, 3),
+        "max_queue_wait_ms": round(self._max_wait_sec * 1000, 3),
+      }
+
+  def close(self):
+    """Drop jobs that have not started, let running ones finish and join the threads."""
+    with self._cond:
+      self._closed = True
+      self._dropped += len(self._pending)
+      if self._pending:
+        logging.info("dropping %d queued background jobs on close", len(self._pending))
+      self._pending.clear()
+      self._heap.clear()
+      self._cond.notify_all()
+    for thread in self._threads:
+      thread.join()
@@ -0,0 +1,45 @@
+import asyncio
+import logging
+import time
+
+
+class EventLoopLagMonitor:
+  """事件循环卡顿检测
+
+  Sleeps `interval_sec` in a loop and measures how late it wakes up. Any
+  delay above `warn_ms` means some callback held the loop that long (blocking
+  I/O, a large json dump, ...) and is logged with the running max.
+  """
+
+  def __init__(self, warn_ms: float = 100, interval_sec: float = 0.5):
+    self.warn_ms = warn_ms
+    self.interval_sec = interval_sec
+    self.stalls = 0
+    self.max_lag_ms = 0.0
+    self._task = None
+
+  def start(self) -> asyncio.Task:
+    if self._task is None or self._task.done():
+      self._task = asyncio.get_running_loop().create_task(self._run(), name="event-loop-lag-monitor")
+    return self._task
+
+  async def _run(self):
+    while True:
+      expected = time.perf_counter() + self.interval_sec
+      await asyncio.sleep(self.interval_sec)
+      lag_ms = (time.perf_counter() - expected) * 1000
+      self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+      if lag_ms > self.warn_ms:
+        self.stalls += 1
+        logging.warning(
+          "event loop stalled %.1f ms (warn > %s ms, stalls=%d, max=%.1f ms)",
+          lag_ms, self.warn_ms, self.stalls, self.max_lag_ms,
+        )
+
+  def stop(self):
+    if self._task is not None:
+      self._task.cancel()
+      self._task = None
+
+  def stats(self) -> dict:
+    return {"stalls": self.stalls, "max_lag_ms": round(self.max_lag_ms, 3)}
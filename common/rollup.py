@@ -0,0 +1,293 @@
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from pydantic_core import core_schema
+
+from common.series import BehaviorSeries, _b64, _unb64, _first_per_ts
+
+# resolution -> bucket width in seconds; buckets are aligned to UTC
+RESOLUTIONS = {"minute": 60, "hour": 3600, "day": 86400}
+# resolution -> buckets kept, counted back from the newest bucket
+DEFAULT_RETENTION = {"minute": 360, "hour": 192, "day": 400}
+_PACKED_TAG = "_rollup"
+_PACKED_VERSION = 1
+
+
+def _reduce_rows(start, mn, mx, sm, cnt):
+  """Combine rows with equal bucket start (start sorted) into one row each."""
+  if len(start) <= 1:
+    return start, mn, mx, sm, cnt
+  idx = np.flatnonzero(_first_per_ts(start))
+  if len(idx) == len(start):
+    return start, mn, mx, sm, cnt
+  return (
+    start[idx],
+    np.minimum.reduceat(mn, idx),
+    np.maximum.reduceat(mx, idx),
+    np.add.reduceat(sm, idx),
+    np.add.reduceat(cnt, idx),
+  )
+
+
+class Rollup:
+  """单一分辨率的时间桶聚合（min/max/mean/count）
+
+  One row per non-empty bucket, sorted by bucket start: int64 start,
+  float32 min/max, float64 sum and int32 count (mean = sum / count). Keeps
+  at most `max_buckets` buckets counted back from the newest one, so it is
+  bounded both in rows and in time span. Folding new rows only rewrites the
+  buckets from the first one they touch onwards -- for live data, the last.
+  """
+  __slots__ = ("step", "max_buckets", "start", "min", "max", "sum", "count")
+
+  def __init__(self, step: int, max_buckets: int, start=None, mn=None, mx=None, sm=None, cnt=None):
+    self.step = step
+    self.max_buckets = max(1, max_buckets)
+    self.start = np.empty(0, dtype=np.int64) if start is None else np.asarray(start, dtype=np.int64)
+    self.min = np.empty(0, dtype=np.float32) if mn is None else np.asarray(mn, dtype=np.float32)
+    self.max = np.empty(0, dtype=np.float32) if mx is None else np.asarray(mx, dtype=np.float32)
+    self.sum = np.empty(0, dtype=np.float64) if sm is None else np.asarray(sm, dtype=np.float64)
+    self.count = np.empty(0, dtype=np.int32) if cnt is None else np.asarray(cnt, dtype=np.int32)
+
+  def add_rows(self, start, mn, mx, sm, cnt):
+    """Fold rows (sorted by start, any finer resolution) into the buckets."""
+    if not len(start):
+      return
+    start = start // self.step * self.step
+    start, mn, mx, sm, cnt = _reduce_rows(start, mn, mx, sm, cnt)
+    # buckets older than the first incoming one are untouched
+    pos = int(np.searchsorted(self.start, start[0], side="left"))
+    if pos < len(self.start):
+      start = np.concatenate((self.start[pos:], start))
+      order = np.argsort(start, kind="stable")
+      start, mn, mx, sm, cnt = _reduce_rows(
+        start[order],
+        np.concatenate((self.min[pos:], mn))[order],
+        np.concatenate((self.max[pos:], mx))[order],
+        np.concatenate((self.sum[pos:], sm))[order],
+        np.concatenate((self.count[pos:], cnt))[order],
+      )
+    self.start = np.concatenate((self.start[:pos], start))
+    self.min = np.concatenate((self.min[:pos], mn.astype(np.float32)))
+    self.max = np.concatenate((self.max[:pos], mx.astype(np.float32)))
+    self.sum = np.concatenate((self.sum[:pos], sm.astype(np.float64)))
+    self.count = np.concatenate((self.count[:pos], cnt.astype(np.int32)))
+    self._prune()
+
+  def _prune(self):
+    oldest = self.start[-1] - (self.max_buckets - 1) * self.step
+    cut = int(np.searchsorted(self.start, oldest, side="left"))
+    if cut:
+      self.start, self.min, self.max = self.start[cut:], self.min[cut:], self.max[cut:]
+      self.sum, self.count = self.sum[cut:], self.count[cut:]
+
+  def window(self, start_ts: Optional[int] = None, end_ts: Optional[int] = None) -> "Rollup":
+    """Buckets with start_ts <= bucket start < end_ts."""
+    lo = 0 if start_ts is None else int(np.searchsorted(self.start, start_ts, side="left"))
+    hi = len(self) if end_ts is None else int(np.searchsorted(self.start, end_ts, side="left"))
+    return Rollup(
+      self.step, self.max_buckets,
+      self.start[lo:hi], self.min[lo:hi], self.max[lo:hi], self.sum[lo:hi], self.count[lo:hi],
+    )
+
+  @property
+  def mean(self) -> np.ndarray:
+    return self.sum / np.maximum(self.count, 1)
+
+  def summary(self) -> Optional[dict]:
+    """min/max/mean/count over every bucket, or None if empty."""
+    if not len(self):
+      return None
+    count = int(self.count.sum())
+    return {
+      "min": round(float(self.min.min()), 3),
+      "max": round(float(self.max.max()), 3),
+      "mean": round(float(self.sum.sum()) / count, 3),
+      "count": count,
+    }
+
+  def to_rows(self) -> List[list]:
+    """[[bucket_start, min, max, mean, count], ...]"""
+    return [
+      [s, round(lo, 3), round(hi, 3), round(m, 3), c]
+      for s, lo, hi, m, c in zip(
+        self.start.tolist(), self.min.tolist(), self.max.tolist(), self.mean.tolist(), self.count.tolist()
+      )
+    ]
+
+  @classmethod
+  def from_rows(cls, step: int, max_buckets: int, rows: List[list]) -> "Rollup":
+    if not rows:
+      return cls(step, max_buckets)
+    arr = np.asarray(rows, dtype=np.float64)
+    cnt = arr[:, 4]
+    return cls(step, max_buckets, arr[:, 0], arr[:, 1], arr[:, 2], arr[:, 3] * cnt, cnt)
+
+  def pack(self) -> dict:
+    return {
+      "n": len(self),
+      "keep": self.max_buckets,
+      "s": _b64(self.start.astype("<i8")),
+      "lo": _b64(self.min.astype("<f4")),
+      "hi": _b64(self.max.astype("<f4")),
+      "sum": _b64(self.sum.astype("<f8")),
+      "cnt": _b64(self.count.astype("<i4")),
+    }
+
+  @classmethod
+  def unpack(cls, step: int, packed: dict) -> "Rollup":
+    if not packed.get("n"):
+      return cls(step, packed.get("keep", 1))
+    return cls(
+      step, packed["keep"],
+      _unb64(packed["s"], "<i8"), _unb64(packed["lo"], "<f4"), _unb64(packed["hi"], "<f4"),
+      _unb64(packed["sum"], "<f8"), _unb64(packed["cnt"], "<i4"),
+    )
+
+  def __len__(self) -> int:
+    return len(self.start)
+
+  def __eq__(self, other) -> bool:
+    if not isinstance(other, Rollup):
+      return NotImplemented
+    return (
+      self.step == other.step
+      and np.array_equal(self.start, other.start)
+      and np.array_equal(self.min, other.min)
+      and np.array_equal(self.max, other.max)
+      and np.array_equal(self.sum, other.sum)
+      and np.array_equal(self.count, other.count)
+    )
+
+  @property
+  def nbytes(self) -> int:
+    return self.start.nbytes + self.min.nbytes + self.max.nbytes + self.sum.nbytes + self.count.nbytes
+
+
+class BehaviorRollup:
+  """一个数值行为的多分辨率聚合（分钟/小时/天）
+
+  The raw BehaviorSeries only keeps the last `capacity` samples; this keeps
+  min/max/mean/count per minute, hour and day bucket with per-resolution
+  retention, so week and month analysis still see long-horizon data.
+  Samples are folded in once, at merge time: the minute rows of a batch are
+  re-aggregated into hours and the hour rows into days. `watermark` is the
+  newest timestamp folded so far; see fold_behavior_rollups for how it keeps
+  re-sent samples from being counted twice.
+  """
+  __slots__ = ("levels", "watermark")
+
+  def __init__(self, retention: Optional[Dict[str, int]] = None, levels: Optional[Dict[str, Rollup]] = None,
+               watermark: Optional[int] = None):
+    retention = {**DEFAULT_RETENTION, **(retention or {})}
+    self.levels = levels or {name: Rollup(step, retention[name]) for name, step in RESOLUTIONS.items()}
+    self.watermark = watermark
+
+  def add(self, ts: np.ndarray, values: np.ndarray):
+    """Fold samples (sorted by ts, one per ts) into every resolution."""
+    if not len(ts):
+      return
+    values = np.asarray(values, dtype=np.float32)
+    rows = (ts, values, values, values.astype(np.float64), np.ones(len(ts), dtype=np.int32))
+    for name in RESOLUTIONS:
+      level = self.levels[name]
+      rows = _reduce_rows(rows[0] // level.step * level.step, *rows[1:])
+      level.add_rows(*rows)
+    last = int(ts[-1])
+    self.watermark = last if self.watermark is None else max(self.watermark, last)
+
+  def __getitem__(self, resolution: str) -> Rollup:
+    return self.levels[resolution]
+
+  def bucket_counts(self) -> Dict[str, int]:
+    return {name: len(level) for name, level in self.levels.items()}
+
+  @property
+  def nbytes(self) -> int:
+    return sum(level.nbytes for level in self.levels.values())
+
+  def __eq__(self, other) -> bool:
+    if not isinstance(other, BehaviorRollup):
+      return NotImplemented
+    return self.watermark == other.watermark and self.levels == other.levels
+
+  def __repr__(self) -> str:
+    return f"BehaviorRollup(buckets={self.bucket_counts()}, watermark={self.watermark})"
+
+  # ---------------------------------------------------------------- pydantic
+
+  def pack(self) -> dict:
+    packed = {_PACKED_TAG: _PACKED_VERSION, "wm": self.watermark}
+    packed.update({name: level.pack() for name, level in self.levels.items()})
+    return packed
+
+  @classmethod
+  def _validate(cls, value: Any) -> "BehaviorRollup":
+    if isinstance(value, BehaviorRollup):
+      return value
+    if not isinstance(value, dict):
+      raise ValueError(f"cannot build a BehaviorRollup from {type(value).__name__}")
+    if _PACKED_TAG in value:
+      if value[_PACKED_TAG] != _PACKED_VERSION:
+        raise ValueError(f"unsupported packed rollup version: {value[_PACKED_TAG]!r}")
+      levels = {name: Rollup.unpack(step, value.get(name, {})) for name, step in RESOLUTIONS.items()}
+      return cls(levels=levels, watermark=value.get("wm"))
+    # wire form written by _serialize without the packed context
+    keep = {**DEFAULT_RETENTION, **value.get("keep", {})}
+    levels = {name: Rollup.from_rows(step, keep[name], value.get(name, [])) for name, step in RESOLUTIONS.items()}
+    return cls(levels=levels, watermark=value.get("watermark"))
+
+  @staticmethod
+  def _serialize(value: "BehaviorRollup", info: core_schema.SerializationInfo) -> Any:
+    if info.context and info.context.get("packed_series"):
+      return value.pack()
+    data = {"watermark": value.watermark, "keep": {name: level.max_buckets for name, level in value.levels.items()}}
+    data.update({name: level.to_rows() for name, level in value.levels.items()})
+    return data
+
+  @classmethod
+  def __get_pydantic_core_schema__(cls, source, handler) -> core_schema.CoreSchema:
+    return core_schema.no_info_plain_validator_function(
+      cls._validate,
+      serialization=core_schema.plain_serializer_function_ser_schema(cls._serialize, info_arg=True),
+    )
+
+
+def fold_behavior_rollups(
+  rollups: Dict[str, BehaviorRollup],
+  old: Dict[str, Any],
+  new: Dict[str, Any],
+  retention: Optional[Dict[str, int]] = None,
+) -> List[str]:
+  """Fold the numeric samples of an update into `rollups`; call before `new` is merged into `old`.
+
+  A sample is counted unless its timestamp is already in the raw series, or
+  it is older than both the raw window and the watermark -- i.e. it may be a
+  re-send of a sample the ring has already evicted. A type seen for the
+  first time is seeded with its raw samples. Returns the types updated.
+  """
+  updated = []
+  for name, series in new.items():
+    if not isinstance(series, BehaviorSeries) or not len(series):
+      continue
+    raw = old.get(name)
+    raw_ts = raw.ts if isinstance(raw, BehaviorSeries) else np.empty(0, dtype=np.int64)
+    rollup = rollups.get(name)
+    if rollup is None:
+      rollup = rollups[name] = BehaviorRollup(retention)
+      if len(raw_ts):
+        rollup.add(raw_ts, raw.values)
+
+    keep = _first_per_ts(series.ts)
+    ts, values = series.ts[keep], series.values[keep]
+    if rollup.watermark is None:
+      fresh = np.ones(len(ts), dtype=bool)
+    else:
+      fresh = ts > rollup.watermark
+    if len(raw_ts):
+      pos = np.minimum(np.searchsorted(raw_ts, ts), len(raw_ts) - 1)
+      fresh = (fresh | (ts >= raw_ts[0])) & (raw_ts[pos] != ts)
+    if fresh.any():
+      rollup.add(ts[fresh], values[fresh])
+      updated.append(name)
+  return updated
@@ -0,0 +1,484 @@
+import base64
+from collections import deque
+from itertools import islice
+from operator import itemgetter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from pydantic import TypeAdapter
+from pydantic_core import core_schema
+
+# model_dump(context=PACKED_CONTEXT) writes series in their packed on-disk form;
+# without it they serialize as the list-of-(ts, value) wire format
+PACKED_CONTEXT = {"packed_series": True}
+_PACKED_TAG = "_series"
+_PACKED_VERSION = 1
+# float32 represents every integer up to 2**24 exactly
+_MAX_EXACT_INT = 1 << 24
+# samples kept per series unless a capacity is given
+DEFAULT_CAPACITY = 100
+_MIN_ALLOC = 8
+
+
+def _b64(arr: np.ndarray) -> str:
+  return base64.b64encode(arr.tobytes()).decode("ascii")
+
+
+def _unb64(text: str, dtype) -> np.ndarray:
+  return np.frombuffer(base64.b64decode(text), dtype=dtype)
+
+
+def _shortest_floats(values: np.ndarray) -> np.ndarray:
+  """float32 -> float64 rounded to 7 significant digits, so 36.55 comes back as 36.55, not 36.54999923706055."""
+  x = values.astype(np.float64)
+  nonzero = x != 0
+  scale = np.ones_like(x)
+  scale[nonzero] = 10.0 ** (6 - np.floor(np.log10(np.abs(x[nonzero]))))
+  return np.round(x * scale) / scale
+
+
+def _first_per_ts(ts: np.ndarray) -> np.ndarray:
+  """Mask keeping the first sample of every run of equal timestamps (ts sorted)."""
+  keep = np.ones(len(ts), dtype=bool)
+  keep[1:] = ts[1:] != ts[:-1]
+  return keep
+
+
+class BehaviorSeries:
+  """数值型行为时间序列（列式、定长环形缓冲）
+
+  int64 timestamps and float32 values, sorted by timestamp, holding at most
+  `capacity` samples. Replaces a list of (ts, value) tuples for numeric
+  signals such as heart_rate or blood_oxygen; non-numeric signals use
+  EventSeries. `integral` remembers that every value came in as an int so
+  the wire format round-trips 72 as 72 rather than 72.0. It is one flag per
+  series, not per value: once any float is seen, every value serializes as
+  a float, so [(1, 70), (2, 70.5)] comes back as [(1, 70.0), (2, 70.5)].
+
+  Storage is a mirrored ring: every sample is written at slot p and p+alloc
+  of 2*alloc-long arrays, so the live samples are always one contiguous
+  slice (`ts` / `values` are views, no copy) while appends stay O(1) and
+  overwrite the oldest sample once full. `alloc` doubles up to `capacity`,
+  so memory is bounded per series without paying for it on sparse signals.
+  A late sample is inserted in O(capacity).
+
+  Behaves like a read-only sequence of (ts, value) tuples (len, iteration,
+  indexing; slicing returns a BehaviorSeries).
+  """
+  __slots__ = ("capacity", "integral", "_ts", "_values", "_alloc", "_start", "_size")
+
+  def __init__(
+    self,
+    ts: Optional[np.ndarray] = None,
+    values: Optional[np.ndarray] = None,
+    integral: bool = True,
+    capacity: Optional[int] = None,
+  ):
+    self.capacity = max(1, capacity or DEFAULT_CAPACITY)
+    self.integral = integral
+    ts = np.empty(0, dtype=np.int64) if ts is None else np.asarray(ts, dtype=np.int64)
+    values = np.empty(0, dtype=np.float32) if values is None else np.asarray(values, dtype=np.float32)
+    self._reset(ts, values)
+
+  # ---------------------------------------------------------------- ring storage
+
+  def _reset(self, ts: np.ndarray, values: np.ndarray, size_hint: int = 0):
+    """Lay out sorted samples from slot 0, keeping the newest `capacity`."""
+    ts, values = ts[-self.capacity:], values[-self.capacity:]
+    n = len(ts)
+    wanted = max(n, size_hint, 1)
+    self._alloc = min(self.capacity, max(_MIN_ALLOC, 1 << (wanted - 1).bit_length()))
+    self._ts = np.empty(2 * self._alloc, dtype=np.int64)
+    self._values = np.empty(2 * self._alloc, dtype=np.float32)
+    self._ts[:n] = ts
+    self._ts[self._alloc:self._alloc + n] = ts
+    self._values[:n] = values
+    self._values[self._alloc:self._alloc + n] = values
+    self._start = 0
+    self._size = n
+
+  def _reserve(self, size: int):
+    """Grow the ring (up to capacity) so `size` samples fit without evicting."""
+    if size > self._alloc and self._alloc < self.capacity:
+      self._reset(self.ts.copy(), self.values.copy(), size_hint=size)
+
+  @property
+  def ts(self) -> np.ndarray:
+    return self._ts[self._start:self._start + self._size]
+
+  @property
+  def values(self) -> np.ndarray:
+    return self._values[self._start:self._start + self._size]
+
+  def append(self, ts: int, value: float) -> bool:
+    """Add one sample; a sample with an existing timestamp is ignored. Returns True if stored.
+
+    In-order samples cost O(1); a late one is inserted in O(capacity), or
+    dropped when the series is full and it is older than everything kept.
+    """
+    if isinstance(value, float) and not value.is_integer():
+      self.integral = False
+    if self._size and ts <= self._ts[self._start + self._size - 1]:
+      return self._insert_late(ts, value)
+    self._reserve(self._size + 1)
+    alloc = self._alloc
+    if self._size < alloc:
+      slot = (self._start + self._size) % alloc
+      self._size += 1
+    else:
+      slot = self._start
+      self._start = (self._start + 1) % alloc
+    self._ts[slot] = self._ts[slot + alloc] = ts
+    self._values[slot] = self._values[slot + alloc] = value
+    return True
+
+  def extend(self, other: "BehaviorSeries") -> bool:
+    """Append a series whose samples are all newer than ours, in O(len(other)).
+
+    Returns False (and changes nothing) if `other` overlaps our time range.
+    """
+    if not len(other):
+      return True
+    if self._size and other.ts[0] <= self._ts[self._start + self._size - 1]:
+      return False
+    keep = _first_per_ts(other.ts)
+    ts, values = other.ts[keep][-self.capacity:], other.values[keep][-self.capacity:]
+    self.integral = self.integral and other.integral
+    self._reserve(self._size + len(ts))
+    alloc = self._alloc
+    slots = (self._start + self._size + np.arange(len(ts))) % alloc
+    self._ts[slots] = self._ts[slots + alloc] = ts
+    self._values[slots] = self._values[slots + alloc] = values
+    self._size += len(ts)
+    if self._size > alloc:
+      self._start = (self._start + self._size - alloc) % alloc
+      self._size = alloc
+    return True
+
+  def _insert_late(self, ts: int, value: float) -> bool:
+    pos = int(np.searchsorted(self.ts, ts, side="left"))
+    if pos < self._size and self.ts[pos] == ts:
+      return False
+    if self._size >= self.capacity and pos == 0:
+      return False
+    self._reset(np.insert(self.ts, pos, ts), np.insert(self.values, pos, np.float32(value)))
+    return True
+
+  # ---------------------------------------------------------------- conversion
+
+  @classmethod
+  def from_pairs(cls, pairs: Iterable[Any], capacity: Optional[int] = None) -> "BehaviorSeries":
+    """Build from [(ts, value), ...]; raises ValueError unless every value is an int or float."""
+    pairs = list(pairs)
+    if not pairs:
+      raise ValueError("empty series has no numeric type")
+    integral = True
+    for item in pairs:
+      if not isinstance(item, (list, tuple)) or len(item) != 2:
+        raise ValueError(f"series sample must be a (ts, value) pair: {item!r}")
+      kind = type(item[1])
+      if kind is float:
+        integral = False
+      elif kind is not int:
+        raise ValueError(f"non-numeric series value: {item[1]!r}")
+    ts = np.fromiter(map(itemgetter(0), pairs), dtype=np.int64, count=len(pairs))
+    values = np.fromiter(map(itemgetter(1), pairs), dtype=np.float64, count=len(pairs))
+    if integral and np.abs(values).max() > _MAX_EXACT_INT:
+      raise ValueError("integer values exceed float32 precision")
+    order = np.argsort(ts, kind="stable")
+    return cls(ts[order], values[order].astype(np.float32), integral, capacity)
+
+  def to_pairs(self) -> List[Tuple[int, Any]]:
+    if self.integral:
+      values = self.values.astype(np.int64).tolist()
+    else:
+      values = _shortest_floats(self.values).tolist()
+    return list(zip(self.ts.tolist(), values))
+
+  def pack(self) -> dict:
+    """Packed on-disk form: first timestamp + base64 int32 deltas (int64 if they overflow) and float32 values."""
+    packed = {_PACKED_TAG: _PACKED_VERSION, "n": len(self), "int": self.integral, "cap": self.capacity}
+    if len(self):
+      deltas = np.diff(self.ts)
+      wide = bool(len(deltas)) and int(deltas.max()) > np.iinfo(np.int32).max
+      packed["t0"] = int(self.ts[0])
+      packed["dt"] = _b64(deltas.astype(np.int64 if wide else np.int32))
+      packed["wide"] = wide
+      packed["v"] = _b64(self.values.astype("<f4"))
+    return packed
+
+  @classmethod
+  def unpack(cls, packed: dict) -> "BehaviorSeries":
+    if packed.get(_PACKED_TAG) != _PACKED_VERSION:
+      raise ValueError(f"unsupported packed series version: {packed.get(_PACKED_TAG)!r}")
+    capacity = packed.get("cap")
+    if not packed.get("n"):
+      return cls(integral=packed.get("int", True), capacity=capacity)
+    deltas = _unb64(packed["dt"], "<i8" if packed.get("wide") else "<i4")
+    ts = np.empty(len(deltas) + 1, dtype=np.int64)
+    ts[0] = packed["t0"]
+    np.cumsum(deltas, dtype=np.int64, out=ts[1:])
+    ts[1:] += packed["t0"]
+    return cls(ts, _unb64(packed["v"], "<f4"), packed["int"], capacity)
+
+  @staticmethod
+  def is_packed(value: Any) -> bool:
+    return isinstance(value, dict) and _PACKED_TAG in value
+
+  # ---------------------------------------------------------------- array ops
+
+  def merge(self, other: "BehaviorSeries", max_len: Optional[int] = None) -> "BehaviorSeries":
+    """Union by timestamp; on equal timestamps self's sample wins. Keeps the last max_len samples."""
+    ts = np.concatenate((self.ts, other.ts))
+    values = np.concatenate((self.values, other.values))
+    order = np.argsort(ts, kind="stable")
+    ts, values = ts[order], values[order]
+    keep = _first_per_ts(ts)
+    merged = BehaviorSeries(ts[keep], values[keep], self.integral and other.integral, self.capacity)
+    return merged.trim(max_len)
+
+  def trim(self, max_len: Optional[int]) -> "BehaviorSeries":
+    if max_len is None or len(self) <= max_len:
+      return self
+    return self[-max_len:] if max_len > 0 else BehaviorSeries(integral=self.integral, capacity=self.capacity)
+
+  def window(self, start_ts: Optional[int] = None, end_ts: Optional[int] = None) -> "BehaviorSeries":
+    """Samples with start_ts <= ts < end_ts."""
+    lo = 0 if start_ts is None else int(np.searchsorted(self.ts, start_ts, side="left"))
+    hi = len(self) if end_ts is None else int(np.searchsorted(self.ts, end_ts, side="left"))
+    return self[lo:hi]
+
+  # ---------------------------------------------------------------- sequence protocol
+
+  def __len__(self) -> int:
+    return self._size
+
+  def __iter__(self) -> Iterator[Tuple[int, Any]]:
+    return iter(self.to_pairs())
+
+  def __getitem__(self, index):
+    if isinstance(index, slice):
+      return BehaviorSeries(self.ts[index], self.values[index], self.integral, self.capacity)
+    value = self.values[index]
+    return int(self.ts[index]), int(value) if self.integral else float(_shortest_floats(np.asarray([value]))[0])
+
+  def __eq__(self, other) -> bool:
+    if not isinstance(other, BehaviorSeries):
+      return NotImplemented
+    return (
+      self.integral == other.integral
+      and np.array_equal(self.ts, other.ts)
+      and np.array_equal(self.values, other.values)
+    )
+
+  def __repr__(self) -> str:
+    return f"BehaviorSeries(n={len(self)}, capacity={self.capacity}, integral={self.integral})"
+
+  @property
+  def nbytes(self) -> int:
+    """Bytes held by the ring buffers."""
+    return self._ts.nbytes + self._values.nbytes
+
+  # ---------------------------------------------------------------- pydantic
+
+  @classmethod
+  def _validate(cls, value: Any) -> "BehaviorSeries":
+    if isinstance(value, BehaviorSeries):
+      return value
+    if cls.is_packed(value):
+      return cls.unpack(value)
+    if isinstance(value, (list, tuple)):
+      # keep every sample of an incoming payload (rollups fold all of them); merging trims to the stored capacity
+      return cls.from_pairs(value, capacity=max(len(value), DEFAULT_CAPACITY))
+    raise ValueError(f"cannot build a BehaviorSeries from {type(value).__name__}")
+
+  @staticmethod
+  def _serialize(value: "BehaviorSeries", info: core_schema.SerializationInfo) -> Any:
+    if info.context and info.context.get("packed_series"):
+      return value.pack()
+    pairs = value.to_pairs()
+    return [list(p) for p in pairs] if info.mode_is_json() else pairs
+
+  @classmethod
+  def __get_pydantic_core_schema__(cls, source, handler) -> core_schema.CoreSchema:
+    return core_schema.no_info_plain_validator_function(
+      cls._validate,
+      serialization=core_schema.plain_serializer_function_ser_schema(cls._serialize, info_arg=True),
+    )
+
+
+_EVENT_ITEMS = TypeAdapter(List[Tuple[int, Any]])
+
+
+class EventSeries:
+  """非数值事件序列（定长环形缓冲）
+
+  (ts, payload) items sorted by timestamp in a deque bounded to `capacity`,
+  for signals whose payload is not a number (clicks, plays) and for
+  mindora_record. In-order appends are O(1) and evict the oldest item once
+  full; a late item is inserted by walking back from the newest end, at
+  most `capacity` steps. Serializes as the usual list of (ts, payload).
+  """
+  __slots__ = ("capacity", "_items")
+
+  def __init__(self, items: Iterable[Tuple[int, Any]] = (), capacity: Optional[int] = None):
+    self.capacity = max(1, capacity or DEFAULT_CAPACITY)
+    ordered = sorted(items, key=itemgetter(0))
+    self._items = deque(ordered[-self.capacity:], maxlen=self.capacity)
+
+  def append(self, item: Tuple[int, Any], dedup: bool = False) -> bool:
+    """Add one item; equal timestamps go after existing ones (or are dropped with dedup). Returns True if stored."""
+    items = self._items
+    ts = item[0]
+    if not items or items[-1][0] < ts:
+      items.append(item)
+      return True
+    pos = len(items)
+    while pos > 0 and items[pos - 1][0] > ts:
+      pos -= 1
+    if dedup and pos > 0 and items[pos - 1][0] == ts:
+      return False
+    if len(items) == self.capacity:
+      if pos == 0:
+        return False
+      items.popleft()
+      pos -= 1
+    items.insert(pos, item)
+    return True
+
+  def extend(self, items: Iterable[Tuple[int, Any]], dedup: bool = True) -> bool:
+    """Append sorted items that are all newer than ours; returns False (unchanged) on overlap."""
+    items = list(items)
+    if not items:
+      return True
+    if self._items and items[0][0] <= self._items[-1][0]:
+      return False
+    if dedup:
+      items = [item for k, item in enumerate(items) if k == 0 or item[0] != items[k - 1][0]]
+    self._items.extend(items)
+    return True
+
+  def trim(self, max_len: int) -> "EventSeries":
+    """The newest max_len items in a ring of capacity max_len."""
+    if len(self) <= max_len and self.capacity == max_len:
+      return self
+    return EventSeries(self[-max_len:], max_len)
+
+  def to_pairs(self) -> List[Tuple[int, Any]]:
+    return list(self._items)
+
+  def __len__(self) -> int:
+    return len(self._items)
+
+  def __iter__(self) -> Iterator[Tuple[int, Any]]:
+    return iter(self._items)
+
+  def __getitem__(self, index):
+    if isinstance(index, slice):
+      return list(islice(self._items, *index.indices(len(self._items))))
+    return self._items[index]
+
+  def __eq__(self, other) -> bool:
+    if isinstance(other, EventSeries):
+      return list(self._items) == list(other._items)
+    if isinstance(other, list):
+      return list(self._items) == other
+    return NotImplemented
+
+  def __repr__(self) -> str:
+    return f"EventSeries(n={len(self)}, capacity={self.capacity})"
+
+  @classmethod
+  def _validate(cls, value: Any) -> "EventSeries":
+    if isinstance(value, EventSeries):
+      return value
+    items = _EVENT_ITEMS.validate_python(value)
+    # keep every item of an incoming payload (plays feed mindora_record); merging trims to the stored capacity
+    return cls(items, capacity=max(len(items), DEFAULT_CAPACITY))
+
+  @staticmethod
+  def _serialize(value: "EventSeries", info: core_schema.SerializationInfo) -> Any:
+    if info.mode_is_json():
+      return _EVENT_ITEMS.dump_python(list(value._items), mode="json")
+    return list(value._items)
+
+  @classmethod
+  def __get_pydantic_core_schema__(cls, source, handler) -> core_schema.CoreSchema:
+    return core_schema.no_info_plain_validator_function(
+      cls._validate,
+      serialization=core_schema.plain_serializer_function_ser_schema(cls._serialize, info_arg=True),
+    )
+
+
+def merge_behavior_groups(old: Dict[str, Any], new: Dict[str, Any], max_len: Optional[int] = None) -> Dict[str, Any]:
+  """Merge every behavior type of `new` into `old` in one vectorized pass.
+
+  All samples of all types are concatenated (old before new), stable-sorted
+  by (type, ts), deduplicated keeping the first sample per (type, ts) -- so
+  on equal timestamps the stored sample wins, as in merge_two_sorted_dedup
+  -- and trimmed to the last `max_len` samples per type. Types whose both
+  sides are BehaviorSeries come back as BehaviorSeries; anything else
+  (clicks, plays, ...) comes back as an EventSeries of the original items.
+
+  Returns {type: merged} for the types in `new`; `old` is not modified.
+  """
+  capacity = max_len or DEFAULT_CAPACITY
+  names, numeric, objects = [], [], []
+  grp_parts, ts_parts, payload_parts = [], [], []
+  result = {}
+  for name, new_values in new.items():
+    sides = [v for v in (old.get(name), new_values) if v is not None and len(v)]
+    if not sides:
+      result[name] = old.get(name, new_values)
+      continue
+    is_numeric = all(isinstance(v, BehaviorSeries) for v in sides)
+    group = len(names)
+    names.append(name)
+    numeric.append(is_numeric)
+    for values in sides:
+      if is_numeric:
+        ts, payload = values.ts, values.values.astype(np.float64)
+      else:
+        items = values.to_pairs() if isinstance(values, (BehaviorSeries, EventSeries)) else values
+        ts = np.fromiter(map(itemgetter(0), items), dtype=np.int64, count=len(items))
+        # object samples carry their index into `objects` as payload
+        payload = np.arange(len(objects), len(objects) + len(items), dtype=np.float64)
+        objects.extend(items)
+      grp_parts.append(np.full(len(ts), group, dtype=np.int64))
+      ts_parts.append(ts)
+      payload_parts.append(payload)
+  if not names:
+    return result
+
+  grp = np.concatenate(grp_parts)
+  ts = np.concatenate(ts_parts)
+  payload = np.concatenate(payload_parts)
+  span = int(ts.max() - ts.min()) if len(ts) else 0
+  if span.bit_length() + len(names).bit_length() <= 62:
+    # one stable argsort on a packed (type, ts) key is much cheaper than a multi-key lexsort
+    order = np.argsort((grp << span.bit_length()) | (ts - ts.min()), kind="stable")
+  else:
+    order = np.lexsort((ts, grp))
+  grp, ts, payload = grp[order], ts[order], payload[order]
+
+  keep = np.ones(len(ts), dtype=bool)
+  keep[1:] = (grp[1:] != grp[:-1]) | (ts[1:] != ts[:-1])
+  grp, ts, payload = grp[keep], ts[keep], payload[keep]
+
+  counts = np.bincount(grp, minlength=len(names))
+  ends = np.cumsum(counts)
+  if max_len is not None:
+    from_end = ends[grp] - 1 - np.arange(len(grp))
+    keep = from_end < max_len
+    grp, ts, payload = grp[keep], ts[keep], payload[keep]
+    counts = np.minimum(counts, max_len)
+    ends = np.cumsum(counts)
+
+  for group, name in enumerate(names):
+    lo, hi = int(ends[group] - counts[group]), int(ends[group])
+    if numeric[group]:
+      integral = all(v.integral for v in (old.get(name), new[name]) if isinstance(v, BehaviorSeries))
+      result[name] = BehaviorSeries(ts[lo:hi], payload[lo:hi].astype(np.float32), integral, capacity)
+    else:
+      result[name] = EventSeries([objects[i] for i in payload[lo:hi].astype(np.int64).tolist()], capacity)
+  return result
@@ -0,0 +1,42 @@
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+
+class UidLockManager:
+  """按uid加锁的锁管理器
+
+  Hands out one re-entrant lock per uid, so a slow write (or LLM call) for
+  one user never blocks reads and writes of any other user. Entries are
+  reference counted and dropped once nobody holds or waits on them, so the
+  registry only grows with the number of uids that are busy right now.
+  """
+
+  def __init__(self):
+    self._mutex = threading.Lock()
+    # uid -> [lock, holders + waiters]
+    self._locks: Dict[str, List] = {}
+
+  @contextmanager
+  def __call__(self, uid: str) -> Iterator[None]:
+    with self._mutex:
+      entry = self._locks.get(uid)
+      if entry is None:
+        entry = [threading.RLock(), 0]
+        self._locks[uid] = entry
+      entry[1] += 1
+
+    entry[0].acquire()
+    try:
+      yield
+    finally:
+      entry[0].release()
+      with self._mutex:
+        entry[1] -= 1
+        if entry[1] == 0:
+          self._locks.pop(uid, None)
+
+  def active_count(self) -> int:
+    """Number of uids currently holding or waiting on a lock."""
+    with self._mutex:
+      return len(self._locks)
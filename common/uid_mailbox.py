@@ -0,0 +1,90 @@
+import threading
+from typing import Any, Callable, Dict, List
+
+
+class _Pending:
+  __slots__ = ("item", "done", "lead", "result", "error")
+
+  def __init__(self, item: Any):
+    self.item = item
+    self.done = threading.Event()
+    # set with `done` when the caller is handed leadership instead of a result
+    self.lead = False
+    self.result = None
+    self.error = None
+
+
+class UidMailbox:
+  """按uid合并并发请求的信箱
+
+  submit() queues an item for a uid. If nobody is processing that uid, the
+  caller becomes its leader and calls `process(uid, items)` once with
+  everything queued so far; other callers just wait and receive the result
+  of the round that consumed their item. Items that arrive while a round is
+  running are left for the next round, which the oldest of their callers
+  runs when the current leader hands over. Every caller waits for at most
+  the round in progress plus its own, and N concurrent submits for one uid
+  still cost far fewer than N rounds.
+  """
+
+  def __init__(self):
+    self._mutex = threading.Lock()
+    # uid -> items waiting for the next round; present while a leader is active
+    self._boxes: Dict[str, List[_Pending]] = {}
+    self.items = 0
+    self.rounds = 0
+
+  def submit(self, uid: str, item: Any, process: Callable[[str, List[Any]], Any]) -> Any:
+    pending = _Pending(item)
+    with self._mutex:
+      box = self._boxes.get(uid)
+      leader = box is None
+      if leader:
+        box = self._boxes[uid] = []
+      box.append(pending)
+      self.items += 1
+
+    if leader:
+      self._round(uid, process)
+    pending.done.wait()
+    if pending.lead:
+      # the previous leader passed the uid on; our item is in the round we now run
+      pending.lead = False
+      pending.done.clear()
+      self._round(uid, process)
+      pending.done.wait()
+    if pending.error is not None:
+      raise pending.error
+    return pending.result
+
+  def _round(self, uid: str, process: Callable[[str, List[Any]], Any]):
+    """Process everything queued for uid, then hand leadership to the oldest newcomer, if any."""
+    with self._mutex:
+      batch = self._boxes[uid]
+      self._boxes[uid] = []
+      self.rounds += 1
+    try:
+      result, error = process(uid, [p.item for p in batch]), None
+    except Exception as e:
+      result, error = None, e
+    for p in batch:
+      p.result, p.error = result, error
+      p.done.set()
+
+    with self._mutex:
+      box = self._boxes[uid]
+      if not box:
+        del self._boxes[uid]
+        return
+      successor = box[0]
+      successor.lead = True
+    successor.done.set()
+
+  def stats(self) -> dict:
+    with self._mutex:
+      return {
+        "items": self.items,
+        "rounds": self.rounds,
+        "coalesced": self.items - self.rounds,
+        "active_uids": len(self._boxes),
+      }
@@ -5,7 +5,49 @@ class Config:
   AUTH_PORT=9103
   DB_PATH = "data/userprofile_level_db"
   USER_PROFILE_STORAGE_MODE = "leveldb"  # "leveldb" | "txt_json"
-  USER_PROFILE_JSON_PATH = "data/user_profiles.txt"
+  USER_PROFILE_JSON_PATH = "data/user_profiles.txt"  # legacy txt_json file, imported once into the segment log
+  USER_PROFILE_SEGMENT_DIR = "data/user_profile_segments"
+  USER_PROFILE_SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+  USER_PROFILE_SEGMENT_FSYNC = False
+  USER_PROFILE_COMPACT_INTERVAL_SEC = 60
+  USER_PROFILE_COMPACT_GARBAGE_RATIO = 0.5
+  # zlib-compress profile records at least this large, 0 = off (LevelDB already snappy-compresses its blocks)
+  PROFILE_CODEC_COMPRESS_MIN_BYTES = 0
+  # decoded UserProfile LRU budget (estimated in-memory bytes, not record bytes), 0 disables the cache
+  PROFILE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+  PROFILE_CACHE_MAX_ENTRIES = 20000
+  # group commit: saves queued while a batch commits (plus this extra wait) share the next WriteBatch;
+  # max writes <= 1 disables batching
+  PROFILE_WRITE_BATCH_WINDOW_MS = 0
+  PROFILE_WRITE_BATCH_MAX_WRITES = 128
+  PROFILE_STORE_WORKERS = 16  # threads of the async storage facade, separate from the LLM executor
+  EVENT_LOOP_LAG_WARN_MS = 100  # log an event-loop stall longer than this, 0 disables the monitor
+  EVENT_LOOP_LAG_CHECK_INTERVAL_SEC = 0.5
+  PROFILE_WRITE_SYNC = False  # LevelDB only: fsync every group commit (txt_json uses USER_PROFILE_SEGMENT_FSYNC)
+  # buckets kept per behavior type and resolution: 6h of minutes, 8 days of hours, 400 days
+  BEHAVIOR_ROLLUP_RETENTION = {"minute": 360, "hour": 192, "day": 400}
+  SLEEP_DATA_MAX_NIGHTS = 400  # nights of sleep_data kept per user, oldest dropped first
+  # recommendations are ranked locally (reco_scorer) inside the update; the LLM then re-ranks them
+  # on a background pool, once per uid after its updates settle; 0 workers = inline
+  RECO_LOCAL_SCORER = True
+  RECO_LLM_RERANK = True
+  RECO_WORKERS = 4
+  RECO_DEBOUNCE_SEC = 5.0
+  RECO_MAX_DELAY_SEC = 60.0
+  # LLM reco results keyed by a fingerprint of the bucketed reco inputs; 0 entries disables the cache
+  RECO_CACHE_MAX_ENTRIES = 50000
+  RECO_CACHE_TTL_SEC = 7 * 86400
+  RECO_PROMPT_PROFILE_TOKENS = 1500  # estimated-token budget for the profile part of a reco prompt
+  # reco_gate: feature -> (minimum change since the last rerun, minimum seconds since it)
+  RECO_RERUN_RULES = {
+    "sleep_quality_trend": (5.0, 6 * 3600),
+    "new_nights": (3, 12 * 3600),
+    "sop_plays": (5, 12 * 3600),
+    "hr_baseline": (4.0, 12 * 3600),
+    "long_term_profile": (0.3, 3600),
+    "catalog": (1, 0),
+  }
+  RECO_RERUN_MAX_AGE_SEC = 7 * 86400  # rerun anyway once recommendations are this old, 0 = never
   MaxServerConcurrent = 32
   Mode = 0
   RemoteHost="http://121.43.54.25:9001"
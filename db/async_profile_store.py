@@ -0,0 +1,36 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+
+class AsyncProfileStore:
+  """UserProfileServ 的异步门面
+
+  Runs every blocking storage call on a dedicated, bounded thread pool so
+  aiohttp handlers never touch LevelDB / the segment log from the event loop.
+  The pool is separate from the default executor that SleepAnalysisLLM uses,
+  so a burst of slow LLM calls cannot starve profile reads and writes (and
+  vice versa).
+  """
+
+  def __init__(self, serv, max_workers: int = 16):
+    self.serv = serv
+    self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="profile-store")
+
+  async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run `fn(*args, **kwargs)` on the storage pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+  async def get_profile(self, uid: str, fields=None) -> Optional[Any]:
+    return await self.run(self.serv.get_profile, uid, fields)
+
+  async def update_profile(self, uid: str, new_profile, skip_sleep_scenarios_reco_update: bool = False) -> bool:
+    return await self.run(self.serv.update_profile, uid, new_profile, skip_sleep_scenarios_reco_update)
+
+  async def save_profile(self, uid: str, profile, parts=None):
+    return await self.run(self.serv.save_profile, uid, profile, parts)
+
+  def close(self):
+    self._executor.shutdown(wait=True)
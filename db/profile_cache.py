@@ -0,0 +1,79 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+# decoded UserProfile bytes (tracemalloc after model_validate) per byte of its encoded
+# record; 5.1-7.1 on fixture profiles of 3-400 nights, larger for longer sleep_data
+DECODED_SIZE_RATIO = 6.5
+
+
+class ProfileCache:
+  """已解码用户画像的 LRU 缓存（按字节预算淘汰）
+
+  Holds validated UserProfile objects so hot users skip json decoding and
+  model validation. Callers pass the size of the stored record; each entry
+  is charged that size times `decoded_ratio`, an estimate of the decoded
+  object's footprint, so `max_bytes` bounds the memory the cache holds.
+  Cached objects are shared: callers must treat them as read-only and copy
+  before mutating.
+  """
+
+  def __init__(self, max_bytes: int, max_entries: int = 0, decoded_ratio: float = DECODED_SIZE_RATIO):
+    self.max_bytes = max_bytes
+    self.max_entries = max_entries
+    self.decoded_ratio = decoded_ratio
+    self._lock = threading.Lock()
+    self._entries: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+    self._bytes = 0
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+
+  @property
+  def enabled(self) -> bool:
+    return self.max_bytes > 0
+
+  def get(self, uid: str) -> Optional[Any]:
+    with self._lock:
+      entry = self._entries.get(uid)
+      if entry is None:
+        self.misses += 1
+        return None
+      self._entries.move_to_end(uid)
+      self.hits += 1
+      return entry[0]
+
+  def put(self, uid: str, profile: Any, size: Optional[int]):
+    """Insert or replace an entry given its encoded record size; size=None keeps the charge of the entry being replaced."""
+    with self._lock:
+      if size is not None:
+        size = int(size * self.decoded_ratio)
+      old = self._entries.pop(uid, None)
+      if old is not None:
+        self._bytes -= old[1]
+        if size is None:
+          size = old[1]
+      if not self.enabled or size is None or size > self.max_bytes:
+        return
+      self._entries[uid] = (profile, size)
+      self._bytes += size
+      while self._entries and (
+        self._bytes > self.max_bytes
+        or (self.max_entries > 0 and len(self._entries) > self.max_entries)
+      ):
+        _, (_, evicted_size) = self._entries.popitem(last=False)
+        self._bytes -= evicted_size
+        self.evictions += 1
+
+  def stats(self) -> dict:
+    with self._lock:
+      lookups = self.hits + self.misses
+      return {
+        "entries": len(self._entries),
+        "bytes": self._bytes,
+        "max_bytes": self.max_bytes,
+        "hits": self.hits,
+        "misses": self.misses,
+        "evictions": self.evictions,
+        "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+      }
@@ -0,0 +1,76 @@
+import json
+import struct
+import zlib
+from typing import Any
+
+try:
+  import orjson
+except ImportError:
+  orjson = None
+
+# Stored value layout (all versions after the legacy plain-json text):
+#   byte 0   FORMAT_MAGIC, never a valid first byte of a json document
+#   byte 1   format version
+#   byte 2   flags (FLAG_ZLIB: payload is zlib-compressed)
+#   [u32 le] uncompressed payload length, only when FLAG_ZLIB is set
+#   payload  compact utf-8 json (orjson output when available)
+FORMAT_MAGIC = 0xB7
+FORMAT_VERSION = 1
+FLAG_ZLIB = 0x01
+_HEADER = struct.Struct("<BBB")
+_RAW_LEN = struct.Struct("<I")
+
+
+def _dumps(data: Any) -> bytes:
+  if orjson is not None:
+    return orjson.dumps(data)
+  return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _loads(payload: bytes) -> Any:
+  if orjson is not None:
+    return orjson.loads(payload)
+  return json.loads(payload)
+
+
+def is_legacy(raw: bytes) -> bool:
+  """True for records written before the versioned format (plain json.dumps text)."""
+  return not raw or raw[0] != FORMAT_MAGIC
+
+
+def encode_profile(data: Any, compress_min_bytes: int = 0, level: int = 1) -> bytes:
+  """Encode a json-compatible profile dict into a versioned record.
+
+  Payloads of at least `compress_min_bytes` are zlib-compressed when that
+  actually saves space; 0 disables compression.
+  """
+  payload = _dumps(data)
+  if compress_min_bytes and len(payload) >= compress_min_bytes:
+    packed = zlib.compress(payload, level)
+    if len(packed) + _RAW_LEN.size < len(payload):
+      return _HEADER.pack(FORMAT_MAGIC, FORMAT_VERSION, FLAG_ZLIB) + _RAW_LEN.pack(len(payload)) + packed
+  return _HEADER.pack(FORMAT_MAGIC, FORMAT_VERSION, 0) + payload
+
+
+def decode_profile(raw: bytes) -> Any:
+  """Decode a stored record, accepting both the versioned and the legacy json format."""
+  if is_legacy(raw):
+    return json.loads(raw.decode("utf-8"))
+  _, version, flags = _HEADER.unpack_from(raw)
+  if version > FORMAT_VERSION:
+    raise ValueError(f"unsupported profile record version {version}")
+  offset = _HEADER.size
+  if flags & FLAG_ZLIB:
+    offset += _RAW_LEN.size
+    return _loads(zlib.decompress(raw[offset:]))
+  return _loads(raw[offset:])
+
+
+def decoded_size(raw: bytes) -> int:
+  """Size of the json payload a record expands to, used for cache memory accounting."""
+  if is_legacy(raw):
+    return len(raw)
+  _, _, flags = _HEADER.unpack_from(raw)
+  if flags & FLAG_ZLIB:
+    return _RAW_LEN.unpack_from(raw, _HEADER.size)[0]
+  return len(raw) - _HEADER.size
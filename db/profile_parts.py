@@ -0,0 +1,58 @@
+from typing import Dict, Iterable, List, Optional, Set
+
+# UserProfile is stored as one sub-document per part so a handler that needs
+# sleep_data does not also decode behaviors, reco lists or the avatar.
+# "core" lives under the bare uid key (where whole-profile records used to be);
+# every other part lives under "<uid>\x00<part>".
+CORE_PART = "core"
+PROFILE_PARTS: Dict[str, List[str]] = {
+  CORE_PART: ["uid_emb", "basic_info", "long_term_profile", "sleep_analysis"],
+  "behaviors": ["behaviors"],
+  "rollups": ["behavior_rollups"],
+  "sleep_data": ["sleep_data", "sleep_aggregates"],
+  "reco": ["sleep_scenarios_reco", "standard_sop_reco", "reco_baseline"],
+  "mindora_record": ["mindora_record", "scene_usage"],
+  "profile": ["profile"],
+}
+ALL_PARTS = frozenset(PROFILE_PARTS)
+FIELD_TO_PART: Dict[str, str] = {
+  field: part for part, fields in PROFILE_PARTS.items() for field in fields
+}
+# written into the core sub-document; a record without it is a legacy whole profile
+LAYOUT_MARKER = "_layout"
+LAYOUT_VERSION = 2
+
+
+def part_key(uid: str, part: str) -> bytes:
+  if part == CORE_PART:
+    return uid.encode("utf-8")
+  return f"{uid}\x00{part}".encode("utf-8")
+
+
+def parts_for_fields(fields: Iterable[str]) -> Set[str]:
+  """Parts that must be loaded to serve `fields`; core is always included."""
+  parts = {CORE_PART}
+  for field in fields:
+    if field not in FIELD_TO_PART:
+      raise ValueError(f"unknown UserProfile field: {field}")
+    parts.add(FIELD_TO_PART[field])
+  return parts
+
+
+def fields_for_parts(parts: Iterable[str]) -> Set[str]:
+  return {field for part in parts for field in PROFILE_PARTS[part]}
+
+
+def split_profile(data: dict, parts: Optional[Iterable[str]] = None) -> Dict[str, dict]:
+  """Split a json-ready profile dict into {part: sub-document}."""
+  result = {}
+  for part in (ALL_PARTS if parts is None else parts):
+    doc = {field: data[field] for field in PROFILE_PARTS[part] if field in data}
+    if part == CORE_PART:
+      doc[LAYOUT_MARKER] = LAYOUT_VERSION
+    result[part] = doc
+  return result
+
+
+def is_whole_profile(core_doc: dict) -> bool:
+  return LAYOUT_MARKER not in core_doc
@@ -0,0 +1,350 @@
+import logging
+import os
+import struct
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, Iterator, NamedTuple, Optional, Tuple
+
+# record = header + key + value
+# header: crc32(op..value), op, key_len, value_len
+# a batch record has no key; its value is a run of (key_len, value_len, key, value),
+# where value_len == _BATCH_DELETE marks a delete with no value
+_HEADER = struct.Struct("<IBII")
+_BATCH_ENTRY = struct.Struct("<II")
+_BATCH_DELETE = 0xFFFFFFFF
+_OP_PUT = 1
+_OP_BATCH = 2
+_OP_DELETE = 3
+# value_len of the _Location of a delete record (tombstone)
+_TOMBSTONE = -1
+_SEGMENT_PREFIX = "seg-"
+_SEGMENT_SUFFIX = ".log"
+_COMPACT_SUFFIX = ".compact"
+
+
+class _Location(NamedTuple):
+  segment: int
+  value_offset: int
+  value_len: int
+  record_len: int
+
+
+class SegmentLogDB:
+  """追加写的分段日志 KV 存储（txt_json 模式使用）
+
+  Every put appends one record to the active segment and updates an
+  in-memory key -> (segment, offset) index, so a write costs O(record size)
+  regardless of how many keys are stored. Segments roll over at
+  `segment_max_bytes`; a background thread rewrites sealed segments with a
+  high share of overwritten records. On open, segments are replayed in
+  order and a torn tail left by a crash is truncated.
+
+  The get/put/delete/write_batch/close subset mirrors plyvel.DB so
+  UserProfileServ can use either backend through `self.db`.
+  """
+
+  def __init__(
+    self,
+    path: str,
+    segment_max_bytes: int = 64 * 1024 * 1024,
+    fsync: bool = False,
+    compact_interval_sec: float = 60.0,
+    compact_garbage_ratio: float = 0.5,
+  ):
+    self.path = Path(path)
+    self.path.mkdir(parents=True, exist_ok=True)
+    self.segment_max_bytes = segment_max_bytes
+    self.fsync = fsync
+    self.compact_garbage_ratio = compact_garbage_ratio
+
+    self._lock = threading.RLock()
+    self._compact_lock = threading.Lock()
+    self._index: Dict[bytes, _Location] = {}
+    self._fds: Dict[int, int] = {}
+    self._sizes: Dict[int, int] = {}
+    self._dead: Dict[int, int] = {}
+    self._active_id = 0
+    self._active = None
+
+    self._recover()
+
+    self._stop = threading.Event()
+    self._compactor = None
+    if compact_interval_sec and compact_interval_sec > 0:
+      self._compactor = threading.Thread(
+        target=self._compact_loop, args=(compact_interval_sec,),
+        name="segment-log-compactor", daemon=True,
+      )
+      self._compactor.start()
+
+  # ---------------------------------------------------------------- files
+
+  def _segment_path(self, seg_id: int) -> Path:
+    return self.path / f"{_SEGMENT_PREFIX}{seg_id:08d}{_SEGMENT_SUFFIX}"
+
+  def _list_segments(self) -> list[int]:
+    ids = []
+    for p in self.path.glob(f"{_SEGMENT_PREFIX}*{_SEGMENT_SUFFIX}"):
+      try:
+        ids.append(int(p.name[len(_SEGMENT_PREFIX):-len(_SEGMENT_SUFFIX)]))
+      except ValueError:
+        logging.warning("ignore unexpected file in segment dir: %s", p)
+    return sorted(ids)
+
+  def _open_active(self, seg_id: int):
+    self._active_id = seg_id
+    self._active = open(self._segment_path(seg_id), "ab")
+    self._fds[seg_id] = os.open(self._segment_path(seg_id), os.O_RDONLY)
+    self._sizes.setdefault(seg_id, self._active.tell())
+    self._dead.setdefault(seg_id, 0)
+
+  @staticmethod
+  def _encode(key: bytes, value: bytes, op: int = _OP_PUT) -> bytes:
+    body = _HEADER.pack(0, op, len(key), len(value))[4:] + key + value
+    return struct.pack("<I", zlib.crc32(body)) + body
+
+  @staticmethod
+  def _batch_entries(data: bytes, value_offset: int, value_len: int, seg_id: int) -> Iterator[Tuple[bytes, _Location]]:
+    offset = value_offset
+    end = value_offset + value_len
+    while offset < end:
+      key_len, entry_len = _BATCH_ENTRY.unpack_from(data, offset)
+      key_start = offset + _BATCH_ENTRY.size
+      key = bytes(data[key_start:key_start + key_len])
+      if entry_len == _BATCH_DELETE:
+        record_len = _BATCH_ENTRY.size + key_len
+        yield key, _Location(seg_id, key_start + key_len, _TOMBSTONE, record_len)
+      else:
+        record_len = _BATCH_ENTRY.size + key_len + entry_len
+        yield key, _Location(seg_id, key_start + key_len, entry_len, record_len)
+      offset += record_len
+
+  def _scan(self, seg_id: int) -> Iterator[Tuple[bytes, _Location]]:
+    """Yield valid records of one segment; stop at the first torn/corrupt record."""
+    with open(self._segment_path(seg_id), "rb") as f:
+      data = f.read()
+    offset = 0
+    while offset + _HEADER.size <= len(data):
+      crc, op, key_len, value_len = _HEADER.unpack_from(data, offset)
+      end = offset + _HEADER.size + key_len + value_len
+      if op not in (_OP_PUT, _OP_BATCH, _OP_DELETE) or end > len(data) or zlib.crc32(data[offset + 4:end]) != crc:
+        break
+      if op == _OP_BATCH:
+        # the crc covers the whole batch, so a batch is replayed entirely or not at all
+        yield from self._batch_entries(data, offset + _HEADER.size, value_len, seg_id)
+      else:
+        key = data[offset + _HEADER.size:offset + _HEADER.size + key_len]
+        length = _TOMBSTONE if op == _OP_DELETE else value_len
+        yield key, _Location(seg_id, offset + _HEADER.size + key_len, length, end - offset)
+      offset = end
+    self._sizes[seg_id] = offset
+    if offset != len(data):
+      logging.warning(
+        "segment %s has %d trailing bytes that are torn or corrupt, truncating",
+        self._segment_path(seg_id), len(data) - offset,
+      )
+      with open(self._segment_path(seg_id), "r+b") as f:
+        f.truncate(offset)
+
+  def _recover(self):
+    for leftover in self.path.glob(f"*{_COMPACT_SUFFIX}"):
+      logging.warning("remove unfinished compaction output %s", leftover)
+      leftover.unlink()
+
+    segments = self._list_segments()
+    for seg_id in segments:
+      self._dead[seg_id] = 0
+      for key, loc in self._scan(seg_id):
+        self._track(key, loc)
+      # the last segment becomes the active one, which _open_active opens
+      if seg_id != segments[-1]:
+        self._fds[seg_id] = os.open(self._segment_path(seg_id), os.O_RDONLY)
+
+    self._open_active(segments[-1] if segments else 1)
+    logging.info(
+      "segment log %s recovered keys=%d segments=%d", self.path, len(self._index), len(segments),
+    )
+
+  def _track(self, key: bytes, loc: _Location):
+    old = self._index.get(key)
+    if old is not None:
+      self._dead[old.segment] = self._dead.get(old.segment, 0) + old.record_len
+    if loc.value_len == _TOMBSTONE:
+      # a delete leaves nothing live behind, the tombstone itself included
+      self._index.pop(key, None)
+      self._dead[loc.segment] = self._dead.get(loc.segment, 0) + loc.record_len
+    else:
+      self._index[key] = loc
+
+  # ---------------------------------------------------------------- kv api
+
+  def get(self, key: bytes) -> Optional[bytes]:
+    with self._lock:
+      loc = self._index.get(key)
+      if loc is None:
+        return None
+      return os.pread(self._fds[loc.segment], loc.value_len, loc.value_offset)
+
+  def put(self, key: bytes, value: bytes):
+    record = self._encode(key, value)
+    with self._lock:
+      offset = self._append(record)
+      self._track(key, _Location(self._active_id, offset + _HEADER.size + len(key), len(value), len(record)))
+
+  def delete(self, key: bytes):
+    record = self._encode(key, b"", _OP_DELETE)
+    with self._lock:
+      offset = self._append(record)
+      self._track(key, _Location(self._active_id, offset + _HEADER.size + len(key), _TOMBSTONE, len(record)))
+
+  def write_batch(self) -> "_WriteBatch":
+    """Collect puts and append them as one atomic record, like plyvel's write_batch()."""
+    return _WriteBatch(self)
+
+  def _write_batch(self, items: list[Tuple[bytes, Optional[bytes]]]):
+    """Append puts (and deletes, value None) as one batch record."""
+    if not items:
+      return
+    body = b"".join(
+      _BATCH_ENTRY.pack(len(k), _BATCH_DELETE) + k if v is None else _BATCH_ENTRY.pack(len(k), len(v)) + k + v
+      for k, v in items
+    )
+    record = self._encode(b"", body, _OP_BATCH)
+    with self._lock:
+      offset = self._append(record)
+      for key, loc in self._batch_entries(record, _HEADER.size, len(body), self._active_id):
+        self._track(key, loc._replace(value_offset=offset + loc.value_offset))
+
+  def _append(self, record: bytes) -> int:
+    """Append one record to the active segment, rolling over first if it is full. Caller holds the lock."""
+    if self._sizes[self._active_id] > 0 and self._sizes[self._active_id] + len(record) > self.segment_max_bytes:
+      self._roll()
+    offset = self._sizes[self._active_id]
+    self._active.write(record)
+    self._active.flush()
+    if self.fsync:
+      os.fsync(self._active.fileno())
+    self._sizes[self._active_id] = offset + len(record)
+    return offset
+
+  def __len__(self) -> int:
+    return len(self._index)
+
+  def keys(self) -> list[bytes]:
+    with self._lock:
+      return list(self._index.keys())
+
+  def _roll(self):
+    self._active.close()
+    self._open_active(self._active_id + 1)
+
+  # ---------------------------------------------------------------- compaction
+
+  def stats(self) -> dict:
+    with self._lock:
+      return {
+        "keys": len(self._index),
+        "segments": len(self._sizes),
+        "bytes": sum(self._sizes.values()),
+        "dead_bytes": sum(self._dead.values()),
+        "active_segment": self._active_id,
+      }
+
+  def _compact_loop(self, interval: float):
+    while not self._stop.wait(interval):
+      try:
+        self.compact()
+      except Exception as e:
+        logging.exception("segment log compaction failed: %s", e)
+
+  def compact(self, force: bool = False) -> bool:
+    """Rewrite the live records of all sealed segments into one segment.
+
+    Runs when the dead share of sealed segments exceeds
+    `compact_garbage_ratio` (or when `force` is set). Writers keep appending
+    to the active segment meanwhile; only the final index swap takes the lock.
+    """
+    with self._compact_lock:
+      with self._lock:
+        sealed = sorted(seg for seg in self._sizes if seg != self._active_id)
+        if not sealed:
+          return False
+        total = sum(self._sizes[seg] for seg in sealed)
+        dead = sum(self._dead.get(seg, 0) for seg in sealed)
+        if not force and (total == 0 or dead / total < self.compact_garbage_ratio):
+          return False
+        sealed_set = set(sealed)
+        live = [(key, loc) for key, loc in self._index.items() if loc.segment in sealed_set]
+        fds = {seg: self._fds[seg] for seg in sealed}
+
+      # sealed segments are immutable, copy outside the lock
+      target = sealed[-1]
+      tmp_path = self._segment_path(target).with_suffix(_COMPACT_SUFFIX)
+      moved: list[Tuple[bytes, _Location, _Location]] = []
+      offset = 0
+      with open(tmp_path, "wb") as out:
+        for key, loc in live:
+          value = os.pread(fds[loc.segment], loc.value_len, loc.value_offset)
+          record = self._encode(key, value)
+          out.write(record)
+          moved.append((key, loc, _Location(target, offset + _HEADER.size + len(key), len(value), len(record))))
+          offset += len(record)
+        out.flush()
+        os.fsync(out.fileno())
+
+      with self._lock:
+        os.replace(tmp_path, self._segment_path(target))
+        for key, old_loc, new_loc in moved:
+          if self._index.get(key) == old_loc:
+            self._index[key] = new_loc
+        for seg in sealed:
+          os.close(self._fds.pop(seg))
+          self._sizes.pop(seg, None)
+          self._dead.pop(seg, None)
+        for seg in sealed[:-1]:
+          self._segment_path(seg).unlink()
+        self._fds[target] = os.open(self._segment_path(target), os.O_RDONLY)
+        self._sizes[target] = offset
+        # records copied for keys overwritten or deleted while the copy ran are dead on arrival
+        self._dead[target] = sum(new_loc.record_len for key, _, new_loc in moved if self._index.get(key) != new_loc)
+
+      logging.info(
+        "segment log compacted segments=%s live_keys=%d bytes %d -> %d", sealed, len(moved), total, offset,
+      )
+      return True
+
+  def close(self):
+    self._stop.set()
+    if self._compactor is not None:
+      self._compactor.join(timeout=5)
+    with self._lock:
+      if self._active is not None:
+        self._active.close()
+        self._active = None
+      for fd in self._fds.values():
+        os.close(fd)
+      self._fds.clear()
+
+
+class _WriteBatch:
+  def __init__(self, db: SegmentLogDB):
+    self._db = db
+    self._items: list[Tuple[bytes, Optional[bytes]]] = []
+
+  def put(self, key: bytes, value: bytes):
+    self._items.append((key, value))
+
+  def delete(self, key: bytes):
+    self._items.append((key, None))
+
+  def write(self):
+    self._db._write_batch(self._items)
+    self._items = []
+
+  def __enter__(self) -> "_WriteBatch":
+    return self
+
+  def __exit__(self, exc_type, exc, tb):
+    if exc_type is None:
+      self.write()
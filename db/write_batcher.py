@@ -0,0 +1,136 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+Items = List[Tuple[bytes, bytes]]
+
+
+class _PendingWrite:
+  __slots__ = ("items", "done", "error", "enqueued_at")
+
+  def __init__(self, items: Items):
+    self.items = items
+    self.done = threading.Event()
+    self.error: Optional[BaseException] = None
+    self.enqueued_at = time.perf_counter()
+
+
+class WriteBatcher:
+  """组提交写入器：合并并发请求的写入为一个 WriteBatch
+
+  Callers hand over the key/value pairs of one save and block until they are
+  durable in `db`. A committer thread takes the first pending save, waits up
+  to `window_ms` for more (or until `max_writes` saves are queued) and
+  commits all of them through one `db.write_batch()`, then wakes every
+  waiter. Saves of the same uid are already serialized by the uid lock, so
+  queue order is commit order.
+
+  `max_writes <= 1` disables batching: write() commits inline. `sync` asks
+  plyvel to fsync each batch; grouping is what makes that affordable.
+  """
+
+  def __init__(self, db, window_ms: float = 0.0, max_writes: int = 128, sync: bool = False):
+    self.db = db
+    self.sync = sync
+    self.window = max(window_ms, 0) / 1000
+    self.max_writes = max_writes
+    self._cond = threading.Condition()
+    self._queue: Deque[_PendingWrite] = deque()
+    self._closed = False
+    # metrics
+    self._batches = 0
+    self._writes = 0
+    self._max_fill = 0
+    self._commit_sec = 0.0
+    self._max_commit_sec = 0.0
+    self._wait_sec = 0.0
+
+    self._thread = None
+    if self.enabled:
+      self._thread = threading.Thread(target=self._run, name="profile-write-batcher", daemon=True)
+      self._thread.start()
+
+  @property
+  def enabled(self) -> bool:
+    return self.max_writes > 1
+
+  def write(self, items: Items):
+    """Commit `items` atomically (possibly together with other callers' items); raises if the commit failed."""
+    if not items:
+      return
+    pending = _PendingWrite(items)
+    with self._cond:
+      queued = self.enabled and not self._closed
+      if queued:
+        self._queue.append(pending)
+        self._cond.notify()
+    if not queued:
+      self._commit([pending])
+    pending.done.wait()
+    if pending.error is not None:
+      raise pending.error
+
+  def _run(self):
+    while True:
+      with self._cond:
+        while not self._queue and not self._closed:
+          self._cond.wait()
+        if not self._queue:
+          return
+        deadline = time.perf_counter() + self.window
+        while len(self._queue) < self.max_writes and not self._closed:
+          remaining = deadline - time.perf_counter()
+          if remaining <= 0:
+            break
+          self._cond.wait(remaining)
+        batch = [self._queue.popleft() for _ in range(min(len(self._queue), self.max_writes))]
+      self._commit(batch)
+
+  def _commit(self, batch: List[_PendingWrite]):
+    start = time.perf_counter()
+    error = None
+    try:
+      with (self.db.write_batch(sync=True) if self.sync else self.db.write_batch()) as wb:
+        for pending in batch:
+          for key, value in pending.items:
+            wb.put(key, value)
+    except Exception as e:
+      logging.exception("profile write batch of %d saves failed: %s", len(batch), e)
+      error = e
+    end = time.perf_counter()
+
+    with self._cond:
+      self._batches += 1
+      self._writes += len(batch)
+      self._max_fill = max(self._max_fill, len(batch))
+      self._commit_sec += end - start
+      self._max_commit_sec = max(self._max_commit_sec, end - start)
+      self._wait_sec += sum(start - p.enqueued_at for p in batch)
+    for pending in batch:
+      pending.error = error
+      pending.done.set()
+
+  def stats(self) -> dict:
+    with self._cond:
+      batches = self._batches or 1
+      writes = self._writes or 1
+      return {
+        "batches": self._batches,
+        "writes": self._writes,
+        "queued": len(self._queue),
+        "avg_fill": round(self._writes / batches, 2),
+        "max_fill": self._max_fill,
+        "avg_commit_ms": round(self._commit_sec / batches * 1000, 3),
+        "max_commit_ms": round(self._max_commit_sec * 1000, 3),
+        "avg_queue_wait_ms": round(self._wait_sec / writes * 1000, 3),
+      }
+
+  def close(self):
+    """Stop accepting queued writes, flush what is pending and join the committer."""
+    with self._cond:
+      self._closed = True
+      self._cond.notify_all()
+    if self._thread is not None:
+      self._thread.join()
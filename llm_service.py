@@ -3,7 +3,7 @@ llm_service.py — LLM-powered sleep analysis text generation.
 
 Wraps VolcEngineArkChat (doubao_langchain) and generates the TEXT fields
 for each /analysis response type.  Numeric fields (scores, durations, counts)
-are always computed from real sensor data by user_server._build_* methods;
+are always computed from real sensor data by the analysis_modules producers;
 LLM only fills in human-readable titles, descriptions, labels, and advice.
 
 Usage (from user_server.py):
@@ -30,6 +30,7 @@ from typing import Any, Optional
 from langchain_core.messages import HumanMessage, SystemMessage
 
 from tool.doubao_langchain import VolcEngineArkChat
+from user_profile import AGGREGATE_WINDOWS, epoch_day, resolve_timezone, top_scenes
 
 
 _PROFILE_JSON_MAX_CHARS = 12000
@@ -44,10 +45,19 @@ _KNOWLEDGE_BASE_PATH = os.path.join(
 # Public helpers
 # ──────────────────────────────────────────────────────────────
 
-def extract_sleep_context(profile, data) -> dict:
+# UserProfile fields extract_sleep_context reads (besides the full-profile JSON
+# snapshot), as a get_profile(fields=...) projection: the last 7 nights + scene counters
+SLEEP_CONTEXT_FIELDS = {"sleep_data": 7, "sleep_aggregates": None, "scene_usage": None}
+
+
+def extract_sleep_context(profile, data, include_profile_json: bool = True) -> dict:
     """
     Pull key sleep metrics from UserProfile into a flat dict
     that can be embedded in an LLM prompt.
+
+    Only the /sleep_advice prompt embeds the full profile JSON; pass
+    include_profile_json=False to work from a ProfileView holding just
+    SLEEP_CONTEXT_FIELDS.
     """
     ctx: dict[str, Any] = {
         "date":       getattr(data, "date", None) or "",
@@ -59,12 +69,18 @@ def extract_sleep_context(profile, data) -> dict:
     if not profile or not profile.sleep_data:
         return ctx
 
-    recent = profile.sleep_data[-7:]
-    scores = [s.sleep_quality for s in recent if s.sleep_quality is not None]
-    ctx["avg_score"]    = round(sum(scores) / len(scores)) if scores else None
-    ctx["latest_score"] = int(recent[-1].sleep_quality) if recent[-1].sleep_quality else None
-
-    latest = recent[-1]
+    # 7/30/90-day averages ending at the requested day, read from the running aggregates
+    end_day = _request_end_day(ctx["date"] or ctx["end_date"] or None, getattr(data, "timezone", None))
+    rolling = {days: profile.sleep_aggregates.window(days, end_day) for days in AGGREGATE_WINDOWS}
+    for days, key in ((7, "avg_score"), (30, "avg_score_30d"), (90, "avg_score_90d")):
+        quality = rolling[days] and rolling[days]["sleep_quality"]
+        ctx[key] = round(quality) if quality is not None else None
+    if rolling[30]:
+        ctx["deep_pct_30d"] = rolling[30]["deep_pct"]
+        ctx["rem_pct_30d"]  = rolling[30]["rem_pct"]
+
+    latest = profile.sleep_data[-1]
+    ctx["latest_score"] = int(latest.sleep_quality) if latest.sleep_quality else None
     ctx["first_sleep_time"]  = latest.first_sleep_time
     ctx["hr_before_sleep"]   = latest.hr_before_sleep
     ctx["rr_before_sleep"]   = latest.rr_before_sleep
@@ -84,20 +100,30 @@ def extract_sleep_context(profile, data) -> dict:
     ctx["rem_pct"]     = round(summ.get("rem_sleep_duration",  0) / tb * 100, 1)
     ctx["core_pct"]    = round(summ.get("core_sleep_duration", 0) / tb * 100, 1)
 
-    # best scene from mindora_record
-    if profile.mindora_record:
-        best = max(profile.mindora_record.items(), key=lambda x: len(x[1]), default=None)
-        if best and best[1]:
-            ctx["scene_id"]    = best[0].replace("sleep.scene.", "")
-            ctx["scene_name"]  = ctx["scene_id"].replace("_", " ").title()
-            ctx["used_times"]  = len(best[1])
+    # most used scene of the last 7 days (all time if none), from the incremental counters
+    best = top_scenes(profile.scene_usage, end_day, 7) or top_scenes(profile.scene_usage, end_day)
+    if best:
+        ctx["scene_id"]    = best[0][0].replace("sleep.scene.", "")
+        ctx["scene_name"]  = ctx["scene_id"].replace("_", " ").title()
+        ctx["used_times"]  = best[0][1]
 
-    ctx["user_profile_json"] = _serialize_profile_for_prompt(profile)
-    ctx["sleep_knowledge"] = _load_sleep_knowledge()
+    if include_profile_json:
+        ctx["user_profile_json"] = _serialize_profile_for_prompt(profile)
+        ctx["sleep_knowledge"] = _load_sleep_knowledge()
 
     return ctx
 
 
+def _request_end_day(date: Optional[str], timezone: Optional[str]) -> int:
+    """UTC day number ending the request's windows at its local `date`; today if missing or malformed."""
+    tz = resolve_timezone(timezone)
+    try:
+        return epoch_day(date, tz)
+    except ValueError:
+        logging.warning("malformed request date %r, using today", date)
+        return epoch_day(None, tz)
+
+
 def _truncate_text(text: str, max_chars: int) -> str:
     if len(text) <= max_chars:
         return text
@@ -117,8 +143,19 @@ def _summarize_behavior_series(behaviors: dict[str, Any]) -> dict[str, Any]:
     return summarized
 
 
+def _summarize_rollups(rollups: dict[str, Any], days: int = 7) -> dict[str, Any]:
+    # the last few day buckets say more about trends than the raw samples
+    return {
+        key: [
+            {"day_start": row[0], "min": row[1], "max": row[2], "mean": row[3], "count": row[4]}
+            for row in rollup["day"].to_rows()[-days:]
+        ]
+        for key, rollup in (rollups or {}).items()
+    }
+
+
 def _serialize_profile_for_prompt(profile) -> str:
-    profile_dict = profile.model_dump(mode="json", exclude_none=True)
+    profile_dict = profile.model_dump(mode="json", exclude_none=True, exclude={"behavior_rollups", "sleep_aggregates"})
 
     if isinstance(profile_dict.get("profile"), dict):
         # Skip bulky image payloads while keeping the field name visible.
@@ -126,6 +163,10 @@ def _serialize_profile_for_prompt(profile) -> str:
             profile_dict["profile"]["avatar_base64"] = "[omitted base64 image data]"
 
     profile_dict["behaviors"] = _summarize_behavior_series(profile_dict.get("behaviors", {}))
+    profile_dict["behavior_daily"] = _summarize_rollups(profile.behavior_rollups)
+    # compact long-horizon averages go first so truncating a long sleep_data history never drops them
+    rolling = {f"{days}d": profile.sleep_aggregates.window(days) for days in AGGREGATE_WINDOWS}
+    profile_dict = {"sleep_rolling": rolling, **profile_dict}
 
     text = json.dumps(profile_dict, ensure_ascii=False, indent=2)
     return _truncate_text(text, _PROFILE_JSON_MAX_CHARS)
@@ -231,6 +272,7 @@ def _prompt_sleep_week(ctx: dict) -> str:
 
 Weekly sleep summary ({ctx.get('start_date')} – {ctx.get('end_date')}):
 - Average quality score: {score} / 100  (baseline label: {label})
+- 30-day / 90-day average quality: {ctx.get('avg_score_30d','—')} / {ctx.get('avg_score_90d','—')}
 - Most-used scene: {ctx.get('scene_name','—')} × {ctx.get('used_times','—')} times
 - Typical first-sleep time: {ctx.get('first_sleep_time','—')}
 - Deep sleep proportion: {ctx.get('deep_pct')}%  REM: {ctx.get('rem_pct')}%
@@ -254,8 +296,9 @@ def _prompt_sleep_month(ctx: dict) -> str:
 
 Monthly sleep summary ({ctx.get('start_date')} – {ctx.get('end_date')}):
 - Average quality score: {score} / 100
+- 30-day / 90-day average quality: {ctx.get('avg_score_30d','—')} / {ctx.get('avg_score_90d','—')}
 - Top sleep scene: {scene_name}
-- Average deep sleep: {ctx.get('deep_pct')}%  REM: {ctx.get('rem_pct')}%
+- Average deep sleep: {ctx.get('deep_pct_30d', ctx.get('deep_pct'))}%  REM: {ctx.get('rem_pct_30d', ctx.get('rem_pct'))}%
 
 Return JSON with exactly these keys:
 {{
@@ -428,24 +471,18 @@ class SleepAnalysisLLM:
     # ── internal ──────────────────────────────────────────────
 
     async def _call(self, user_prompt: str) -> Optional[str]:
-        """Run a blocking LLM call in a thread pool."""
+        """Await the LLM on the event loop (pooled aiohttp session, no executor thread)."""
         if not self.enabled:
             return None
-        model = self._model
-
-        def _invoke() -> str:
-            resp = model.invoke([
-                SystemMessage(content=_SYSTEM),
-                HumanMessage(content=user_prompt),
-            ])
-            return resp.content
-
         try:
-            loop = asyncio.get_running_loop()
-            return await asyncio.wait_for(
-                loop.run_in_executor(None, _invoke),
+            resp = await asyncio.wait_for(
+                self._model.ainvoke([
+                    SystemMessage(content=_SYSTEM),
+                    HumanMessage(content=user_prompt),
+                ]),
                 timeout=120,
             )
+            return resp.content
         except asyncio.TimeoutError:
             logging.warning("LLM call timed out")
         except Exception as e:
@@ -0,0 +1,155 @@
+"""
+推荐重算的变化检测
+
+Decides, after an update is merged, whether the LLM recommendations are
+worth regenerating. The merged profile is compared with the RecoBaseline
+snapshot taken at the last rerun (not with the profile before this update,
+so changes too small to matter one at a time still add up), one delta per
+feature:
+  sleep_quality_trend  |7-day mean sleep_quality - baseline|, points
+  new_nights           nights newer than the newest one the rerun saw
+  sop_plays            sop_start events since the rerun, all scenes
+  hr_baseline          |30-day mean avg_heart_rate - baseline|, bpm
+  long_term_profile    largest |change| of a long_term_profile value (1 when a key appears or goes)
+  catalog              1 when the candidate catalog changed
+Each feature has a threshold and a minimum time since the last rerun
+(Config.RECO_RERUN_RULES); a rerun happens when some feature reaches its
+threshold and is past its interval, when recommendations are missing, or
+when they are older than Config.RECO_RERUN_MAX_AGE_SEC. Every decision is
+kept with its reason in RecoGate.stats().
+"""
+import threading
+import time
+from bisect import bisect_right
+from collections import deque
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from sleep_reco import _catalog_version
+from user_profile import RecoBaseline, UserProfile
+
+RECO_FEATURES = ("sleep_quality_trend", "new_nights", "sop_plays", "hr_baseline", "long_term_profile", "catalog")
+
+
+def _window_mean(profile: UserProfile, days: int, metric: str, today: int) -> Optional[float]:
+  window = profile.sleep_aggregates.window(days, today)
+  return window.get(metric) if window else None
+
+
+def snapshot(profile: UserProfile, now: Optional[float] = None) -> RecoBaseline:
+  """The baseline to store alongside recommendations generated from `profile`."""
+  now = time.time() if now is None else now
+  today = int(now) // 86400
+  return RecoBaseline(
+    ts=int(now),
+    catalog_version=_catalog_version(),
+    newest_night_ts=profile.sleep_data[-1].timestamp if profile.sleep_data else 0,
+    sleep_quality_7d=_window_mean(profile, 7, "sleep_quality", today),
+    heart_rate_30d=_window_mean(profile, 30, "avg_heart_rate", today),
+    sop_plays=sum(usage.total for usage in profile.scene_usage.values()),
+    long_term_profile=dict(profile.long_term_profile),
+  )
+
+
+def _abs_change(old: Optional[float], new: Optional[float]) -> float:
+  if old is None or new is None:
+    # a mean appearing (first nights) or vanishing (no recent nights) counts as a large move
+    return 0.0 if old is None and new is None else float("inf")
+  return abs(new - old)
+
+
+def feature_deltas(baseline: RecoBaseline, profile: UserProfile, now: Optional[float] = None) -> Dict[str, float]:
+  """How far each RECO_FEATURES value of `profile` has moved from `baseline` as of `now`."""
+  today = int(time.time() if now is None else now) // 86400
+  timestamps = [night.timestamp for night in profile.sleep_data]
+  old_ltp, new_ltp = baseline.long_term_profile, dict(profile.long_term_profile)
+  ltp = max((abs(new_ltp[k] - old_ltp[k]) if k in old_ltp and k in new_ltp else 1.0
+             for k in old_ltp.keys() | new_ltp.keys()), default=0.0)
+  return {
+    "sleep_quality_trend": _abs_change(baseline.sleep_quality_7d, _window_mean(profile, 7, "sleep_quality", today)),
+    "new_nights": float(len(timestamps) - bisect_right(timestamps, baseline.newest_night_ts)),
+    "sop_plays": float(max(0, sum(usage.total for usage in profile.scene_usage.values()) - baseline.sop_plays)),
+    "hr_baseline": _abs_change(baseline.heart_rate_30d, _window_mean(profile, 30, "avg_heart_rate", today)),
+    "long_term_profile": ltp,
+    "catalog": float(baseline.catalog_version != _catalog_version()),
+  }
+
+
+class RecoDecision(NamedTuple):
+  rerun: bool
+  reason: str
+  deltas: Dict[str, float]
+
+
+class RecoGate:
+  """推荐重算闸门
+
+  `rules` maps each of RECO_FEATURES to (threshold, min_interval_sec);
+  features without a rule never trigger. decide() is cheap enough to run
+  inside the update critical section: two aggregate window reads and a
+  pass over sleep_data timestamps.
+  """
+
+  def __init__(self, rules: Dict[str, Tuple[float, float]], max_age_sec: float, history: int = 256):
+    unknown = set(rules) - set(RECO_FEATURES)
+    if unknown:
+      raise ValueError(f"unknown reco rerun features: {sorted(unknown)}")
+    self.rules = dict(rules)
+    self.max_age_sec = max_age_sec
+    self._lock = threading.Lock()
+    self._history: deque = deque(maxlen=history)
+    self._by_reason: Dict[str, int] = {}
+    self.decisions = 0
+    self.reruns = 0
+
+  def decide(self, uid: str, profile: UserProfile, now: Optional[float] = None) -> RecoDecision:
+    now = time.time() if now is None else now
+    baseline = profile.reco_baseline
+    deltas = feature_deltas(baseline, profile, now)
+    age = now - baseline.ts
+
+    if not profile.sleep_scenarios_reco or not profile.standard_sop_reco:
+      decision = RecoDecision(True, "missing", deltas)
+    elif baseline.ts <= 0:
+      decision = RecoDecision(True, "no_baseline", deltas)
+    else:
+      triggered, held = [], []
+      for feature, (threshold, min_interval) in self.rules.items():
+        if deltas[feature] >= threshold:
+          (triggered if age >= min_interval else held).append(feature)
+      if triggered:
+        decision = RecoDecision(True, "changed:" + ",".join(triggered), deltas)
+      elif self.max_age_sec > 0 and age >= self.max_age_sec:
+        decision = RecoDecision(True, "max_age", deltas)
+      elif held:
+        decision = RecoDecision(False, "min_interval:" + ",".join(held), deltas)
+      else:
+        decision = RecoDecision(False, "unchanged", deltas)
+    self._record(uid, now, decision)
+    return decision
+
+  def _record(self, uid: str, now: float, decision: RecoDecision):
+    # per-feature reasons are counted separately so the counters stay a short list
+    kind, _, features = decision.reason.partition(":")
+    keys = [f"{kind}:{feature}" for feature in features.split(",")] if features else [kind]
+    with self._lock:
+      self.decisions += 1
+      self.reruns += decision.rerun
+      for key in keys:
+        self._by_reason[key] = self._by_reason.get(key, 0) + 1
+      self._history.append((int(now), uid, decision.rerun, decision.reason))
+
+  def recent(self, limit: int = 20) -> list:
+    """The last `limit` decisions as (ts, uid, rerun, reason), newest last."""
+    with self._lock:
+      return list(self._history)[-limit:]
+
+  def stats(self) -> dict:
+    with self._lock:
+      decisions = self.decisions or 1
+      return {
+        "decisions": self.decisions,
+        "reruns": self.reruns,
+        "skipped": self.decisions - self.reruns,
+        "rerun_rate": round(self.reruns / decisions, 3),
+        "by_reason": dict(sorted(self._by_reason.items())),
+      }
@@ -0,0 +1,176 @@
+"""
+睡眠结构（hypnogram）分析
+
+Vectorized per-night metrics over SleepResult.sleep_status: every segment of
+every night is flattened into a few numpy arrays once, and each metric is a
+bincount / cumsum over them, so a month of nights costs about as much as a
+handful of numpy calls rather than a Python loop per night per metric.
+
+Definitions (minutes unless noted), per night with segments ordered by
+start_time; "sleep" means a rem, core or deep segment:
+  time_in_bed        sum of all segment durations
+  total_sleep        sum of sleep segment durations
+  efficiency         total_sleep / time_in_bed, %
+  latency            time before the first sleep segment
+  waso               awake time after sleep onset and before the final awakening
+  awakenings         runs of awake segments counted in waso
+  transitions        stage changes between consecutive segments
+  fragmentation      transitions per hour of total_sleep
+  longest_sleep      longest run of consecutive sleep segments
+  deep/rem/core_pct  stage share of total_sleep, %
+Scores are 0-100, higher is better:
+  structure_score    distance of the deep/rem/core shares from 18/22/55 %
+  fluctuation_score  stability: penalizes waso, awakenings and fragmentation
+                     (and night heart-rate variation when vitals are given)
+"""
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from common.rollup import BehaviorRollup
+from user_profile import OTHER_STAGE, STAGE_CODES, SleepResult
+
+_AWAKE = STAGE_CODES["awake"]
+_N_CODES = OTHER_STAGE + 1
+_SLEEP_CODES = np.array([STAGE_CODES["rem"], STAGE_CODES["core"], STAGE_CODES["deep"]])
+# reference stage shares of total sleep for structure_score, and the weight of each % point off
+_STRUCTURE_TARGET = {"deep": (18.0, 2.5), "rem": (22.0, 2.0), "core": (55.0, 0.5)}
+
+_METRICS = (
+  "time_in_bed", "total_sleep", "efficiency", "latency", "waso", "awakenings", "transitions",
+  "fragmentation", "longest_sleep", "deep_pct", "rem_pct", "core_pct", "structure_score", "fluctuation_score",
+)
+
+
+class HypnogramMetrics:
+  """一组夜晚的睡眠结构指标（每项为按夜排列的 numpy 数组）"""
+
+  def __init__(self, nights: Sequence[SleepResult]):
+    n = len(nights)
+    counts = np.fromiter((len(r.sleep_status) for r in nights), dtype=np.int64, count=n)
+    total = int(counts.sum())
+    self.size = n
+    self.timestamp = np.fromiter((r.timestamp for r in nights), dtype=np.int64, count=n)
+    self.valid = counts > 0
+    self.bed_start = np.zeros(n, dtype=np.int64)
+    self.bed_end = np.zeros(n, dtype=np.int64)
+    for name in _METRICS:
+      setattr(self, name, np.zeros(n))
+    if not total:
+      return
+
+    segments = [e for r in nights for e in r.sleep_status]
+    night = np.repeat(np.arange(n), counts)
+    start = np.fromiter((e.start_time for e in segments), dtype=np.int64, count=total)
+    dur = np.fromiter((e.duration for e in segments), dtype=np.float64, count=total)
+    code = np.fromiter((STAGE_CODES.get(e.sleep_type, OTHER_STAGE) for e in segments), dtype=np.intp, count=total)
+    order = np.lexsort((start, night))
+    night, start, dur, code = night[order], start[order], dur[order], code[order]
+
+    first = np.ones(total, dtype=bool)
+    first[1:] = night[1:] != night[:-1]
+    sleep = np.isin(code, _SLEEP_CODES)
+    awake = code == _AWAKE
+    # sleep segments strictly before / after each segment, within its night
+    before = np.cumsum(sleep) - sleep
+    before -= np.repeat(before[first], counts[counts > 0])
+    sleep_count = np.bincount(night, weights=sleep, minlength=n)
+    after = sleep_count[night] - before - sleep
+
+    def per_night(weights):
+      return np.bincount(night, weights=weights, minlength=n)
+
+    self.bed_start[self.valid] = start[first]
+    np.maximum.at(self.bed_end, night, start + (dur * 60).astype(np.int64))
+    self.time_in_bed = per_night(dur)
+    self.total_sleep = per_night(dur * sleep)
+    self.latency = per_night(dur * ((before == 0) & ~sleep))
+    in_waso = awake & (before > 0) & (after > 0)
+    self.waso = per_night(dur * in_waso)
+    prev_awake = np.zeros(total, dtype=bool)
+    prev_awake[1:] = awake[:-1] & ~first[1:]
+    self.awakenings = per_night(in_waso & ~prev_awake)
+    changed = np.zeros(total, dtype=bool)
+    changed[1:] = (code[1:] != code[:-1]) & ~first[1:]
+    self.transitions = per_night(changed)
+
+    stage_minutes = np.bincount(night * _N_CODES + code, weights=dur, minlength=n * _N_CODES).reshape(n, _N_CODES)
+    with np.errstate(divide="ignore", invalid="ignore"):
+      self.efficiency = np.nan_to_num(self.total_sleep / self.time_in_bed * 100)
+      self.fragmentation = np.nan_to_num(self.transitions / (self.total_sleep / 60))
+      share = np.nan_to_num(stage_minutes / self.total_sleep[:, None] * 100)
+    self.deep_pct = share[:, STAGE_CODES["deep"]]
+    self.rem_pct = share[:, STAGE_CODES["rem"]]
+    self.core_pct = share[:, STAGE_CODES["core"]]
+
+    # a run of sleep segments ends at any non-sleep segment or night boundary
+    run = np.cumsum(first | ~sleep)
+    run_minutes = np.bincount(run, weights=dur * sleep)
+    np.maximum.at(self.longest_sleep, night, run_minutes[run])
+
+    penalty = sum(abs(getattr(self, f"{stage}_pct") - target) * weight
+                  for stage, (target, weight) in _STRUCTURE_TARGET.items())
+    self.structure_score = np.where(self.total_sleep > 0, np.clip(100 - penalty, 0, 100), 0)
+    self.fluctuation_score = fluctuation_score(self.waso, self.awakenings, self.fragmentation)
+    self.fluctuation_score[~self.valid] = 0
+
+  def __len__(self) -> int:
+    return self.size
+
+  def night(self, index: int) -> Optional[Dict[str, float]]:
+    """Rounded metrics of one night, None if it has no sleep_status."""
+    if not self.valid[index]:
+      return None
+    return {name: round(float(getattr(self, name)[index]), 1) for name in _METRICS}
+
+  def mean(self, mask: Optional[np.ndarray] = None) -> Optional[Dict[str, float]]:
+    """Rounded means over the nights selected by `mask` that have sleep_status."""
+    selected = self.valid if mask is None else (self.valid & mask)
+    count = int(selected.sum())
+    if not count:
+      return None
+    result = {name: round(float(getattr(self, name)[selected].mean()), 1) for name in _METRICS}
+    result["nights"] = count
+    return result
+
+  def between(self, start_ts: int, end_ts: int) -> np.ndarray:
+    """Mask of the nights whose record timestamp is in [start_ts, end_ts)."""
+    return (self.timestamp >= start_ts) & (self.timestamp < end_ts)
+
+
+def analyze_nights(nights: Sequence[SleepResult]) -> HypnogramMetrics:
+  return HypnogramMetrics(nights)
+
+
+def fluctuation_score(waso, awakenings, fragmentation, hr_cv_pct=0.0):
+  """Night stability 0-100: -0.5/min of WASO, -2/awakening, -1/transition per hour, -1/% heart-rate CV."""
+  penalty = 0.5 * np.asarray(waso) + 2 * np.asarray(awakenings) + np.asarray(fragmentation) + np.asarray(hr_cv_pct)
+  return np.clip(100 - penalty, 0, 100)
+
+
+def night_vitals(rollup: Optional[BehaviorRollup], start_ts: int, end_ts: int) -> Optional[Dict[str, float]]:
+  """min/max/mean and coefficient of variation (%) of a behavior over one night.
+
+  Uses the minute rollup when it still covers the night, otherwise the
+  hour rollup; None when neither has data in the window.
+  """
+  if rollup is None:
+    return None
+  minute = rollup["minute"]
+  level = minute if len(minute) and minute.start[0] <= start_ts else rollup["hour"]
+  window = level.window(start_ts - start_ts % level.step, end_ts)
+  if not len(window):
+    return None
+  means = window.mean
+  center = float(np.average(means, weights=window.count))
+  spread = float(np.sqrt(np.average((means - center) ** 2, weights=window.count)))
+  return {
+    "min": round(float(window.min.min()), 1),
+    "max": round(float(window.max.max()), 1),
+    "mean": round(center, 1),
+    "cv_pct": round(spread / center * 100, 1) if center else 0.0,
+  }
+
+
+def score_label(score: float) -> str:
+  return "Excellent" if score >= 80 else "Good" if score >= 60 else "Average" if score >= 40 else "Poor"
@@ -1,17 +1,22 @@
+import hashlib
 import json
 import logging
 import os
 import random
 import re
+import threading
 import time
+from collections import OrderedDict
 from functools import lru_cache
 from pathlib import Path
-from typing import Any, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from langchain_core.messages import HumanMessage, SystemMessage
 
+from config import Config
+from reco_scorer import LocalScorer, scene_key
 from tool.doubao_langchain import VolcEngineArkChat
-from user_profile import UserProfile, SleepScenario
+from user_profile import UserProfile, SleepScenario, epoch_day
 
 
 _KNOWLEDGE_BASE_PATH = os.path.join(
@@ -34,6 +39,25 @@ _SOP_CANDIDATES_PATH = os.path.join(
 
 _LLM_TRACE_LOG_PATH = Path(__file__).resolve().parent / "llm_request_response.log"
 
+# recommendation kinds, also the tags of a reco refresh job
+RECO_SCENARIOS = "scenarios"
+RECO_SOP = "sop"
+
+# bucket width per 7-day sleep mean; nights whose means stay in the same buckets reuse the cached reco
+_FINGERPRINT_BUCKETS = {
+    "sleep_quality": 5.0,
+    "soe": 5.0,
+    "deep_pct": 5.0,
+    "rem_pct": 5.0,
+    "core_pct": 10.0,
+    "avg_heart_rate": 3.0,
+    "hrv": 5.0,
+}
+_FINGERPRINT_SCENE_DAYS = 30
+_CHARS_PER_TOKEN = 3.0
+# newest nights a prompt may list; the 7/30/90-day means stand in for older ones
+_PROMPT_MAX_NIGHTS = 14
+
 _SCENARIO_CANDIDATES: list[dict[str, Any]] = [
     {
         "scenario_id": "cocos_island_moonlight_v1",
@@ -136,14 +160,7 @@ def _append_llm_trace(entry_type: str, flow: str, prompt: str, response_text: st
         logging.warning("failed to append llm trace log %s: %s", _LLM_TRACE_LOG_PATH, e)
 
 
-def _safe_profile_json(profile: UserProfile) -> str:
-    payload = profile.model_dump(mode="json", exclude_none=True)
-    if isinstance(payload.get("profile"), dict) and payload["profile"].get("avatar_base64"):
-        payload["profile"]["avatar_base64"] = "[omitted base64 image data]"
-    return json.dumps(payload, ensure_ascii=False, indent=2)
-
-
-@lru_cache(maxsize=1)
+@lru_cache(maxsize=8)
 def _load_text(path: str) -> str:
     try:
         with open(path, "r", encoding="utf-8") as f:
@@ -153,92 +170,182 @@ def _load_text(path: str) -> str:
         return ""
 
 
-def _build_prompt(profile: UserProfile) -> str:
-    knowledge = _load_text(_KNOWLEDGE_BASE_PATH)
-    topology = _load_text(_TOPOLOGY_PATH)
-    return f"""
-User profile JSON:
-{_safe_profile_json(profile)}
-
-Sleep intervention knowledge base:
-{knowledge}
-
-Sleep strategy topology:
-{topology}
+def _compact_json(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def _estimate_tokens(text: str) -> int:
+    # no tokenizer at hand; JSON punctuation and CJK text run well under 4 chars per token
+    return int(len(text) / _CHARS_PER_TOKEN) + 1
+
+
+def _prompt_sections(profile: UserProfile) -> List[Tuple[str, Any]]:
+    """Profile content for the prompts, most important first; list values may be cut to a prefix."""
+    today = int(time.time()) // 86400
+    person = {}
+    if profile.profile is not None:
+        person = profile.profile.model_dump(include={"gender", "age", "birthday"}, exclude_none=True)
+    scenes = {
+        cmd: {"7d": usage.count(today, 7), "30d": usage.count(today, 30), "total": usage.total}
+        for cmd, usage in profile.scene_usage.items()
+    }
+    vitals = {}
+    for key, rollup in profile.behavior_rollups.items():
+        rows = rollup["day"].to_rows()[-7:]
+        if rows:
+            vitals[key] = [round(row[3], 1) for row in rows]
+    nights = [
+        night.model_dump(mode="json", exclude_none=True, exclude={"sleep_status", "night_summary", "scene_preference"})
+        for night in reversed(profile.sleep_data[-_PROMPT_MAX_NIGHTS:])
+    ]
+    return [
+        ("sleep_rolling", {f"{days}d": profile.sleep_aggregates.window(days, today) for days in (7, 30, 90)}),
+        ("long_term_profile", dict(profile.long_term_profile)),
+        ("person", {**(profile.basic_info or {}), **person}),
+        ("scene_usage", scenes),
+        ("vitals_daily_mean_7d", vitals),
+        ("current_reco", [item.scenario_id or _extract_sop_cmd_name(item) for item in profile.sleep_scenarios_reco or []]),
+        ("sleep_analysis", profile.sleep_analysis),
+        # last: it takes whatever budget is left
+        ("recent_nights", nights),
+    ]
 
-Scenario candidates:
-{json.dumps(_SCENARIO_CANDIDATES, ensure_ascii=False, indent=2)}
 
-Task:
-1. Read the user profile and infer the most likely sleep issue pattern, preferences, and suitable intervention style.
+def _profile_prompt_json(profile: UserProfile, budget_tokens: int) -> Tuple[str, int]:
+    """画像的限额序列化
+
+    Adds _prompt_sections in priority order, one compact JSON line each,
+    until `budget_tokens` would be exceeded; a list section that does not
+    fit whole (recent_nights, newest first) is cut to the items that do,
+    and everything after the first cut is dropped. Returns the text and
+    the number of sections left out or cut.
+    """
+    lines: List[str] = []
+    used = 0
+    sections = _prompt_sections(profile)
+    for k, (name, value) in enumerate(sections):
+        if value in (None, {}, []):
+            continue
+        line = f"{name}: {_compact_json(value)}"
+        cost = _estimate_tokens(line) + 1
+        if used + cost <= budget_tokens:
+            lines.append(line)
+            used += cost
+            continue
+        if isinstance(value, list):
+            # the longest prefix that fits, by bisection over the item count
+            lo, hi = 0, len(value)
+            while lo < hi:
+                mid = (lo + hi + 1) // 2
+                if used + _estimate_tokens(f"{name}: {_compact_json(value[:mid])}") + 1 <= budget_tokens:
+                    lo = mid
+                else:
+                    hi = mid - 1
+            if lo:
+                lines.append(f"{name}: {_compact_json(value[:lo])}")
+        return "\n".join(lines), len(sections) - k
+    return "\n".join(lines), 0
+
+
+class PromptStats:
+    """推荐 prompt 体积统计（按 flow）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flows: Dict[str, Dict[str, int]] = {}
+
+    def record(self, flow: str, prompt: str, profile_text: str, cut_sections: int):
+        with self._lock:
+            entry = self._flows.setdefault(flow, {"calls": 0, "chars": 0, "max_chars": 0, "profile_chars": 0, "cut": 0})
+            entry["calls"] += 1
+            entry["chars"] += len(prompt)
+            entry["max_chars"] = max(entry["max_chars"], len(prompt))
+            entry["profile_chars"] += len(profile_text)
+            entry["cut"] += cut_sections > 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            result = {}
+            for flow, entry in self._flows.items():
+                calls = entry["calls"] or 1
+                result[flow] = {
+                    "calls": entry["calls"],
+                    "avg_chars": round(entry["chars"] / calls),
+                    "max_chars": entry["max_chars"],
+                    "avg_est_tokens": round(entry["chars"] / calls / _CHARS_PER_TOKEN),
+                    "avg_profile_chars": round(entry["profile_chars"] / calls),
+                    "profiles_cut": entry["cut"],
+                }
+            result["static_prefix_renders"] = _static_prompt.cache_info().misses
+            return result
+
+
+_PROMPT_STATS = PromptStats()
+
+
+_SCENARIO_TASK = """Task:
+1. Read the user profile below and infer the most likely sleep issue pattern, preferences, and suitable intervention style.
 2. Select the best 2 scenario candidates from the provided candidate list.
 3. You may reorder candidates, but every returned scenario and every stage field value must come from the candidate list.
 4. Keep the output schema exactly compatible with this Python model:
-{{
-  "scenarios": [
-    {{
-      "scenario_id": "string",
-      "scenario_name": "string",
-      "stages": [
-        {{
-          "cmd_name": "string",
-          "stage_name": "Relax|Induce|Deep|Waken",
-          "audio_file": "string",
-          "guide_file": "string",
-          "light_scene": "string",
-          "aroma_mode": "string"
-        }}
-      ]
-    }}
-  ]
-}}
-5. Return exactly 2 scenarios.
-"""
-
-
-def _build_sop_reco_prompt(profile: UserProfile, candidates: List[str]) -> str:
-    knowledge = _load_text(_KNOWLEDGE_BASE_PATH)
-    topology = _load_text(_TOPOLOGY_PATH)
-    return f"""
-User profile JSON:
-{_safe_profile_json(profile)}
-
-Sleep intervention knowledge base:
-{knowledge}
+{"scenarios":[{"scenario_id":"string","scenario_name":"string","stages":[{"cmd_name":"string","stage_name":"Relax|Induce|Deep|Waken","audio_file":"string","guide_file":"string","light_scene":"string","aroma_mode":"string"}]}]}
+5. Return exactly 2 scenarios."""
 
-Sleep strategy topology:
-{topology}
-
-Standard SOP process candidates:
-{json.dumps(candidates, ensure_ascii=False, indent=2)}
-
-Task:
-1. Read the user profile and infer the most likely sleep issue pattern, preferences, and suitable intervention style.
+_SOP_TASK = """Task:
+1. Read the user profile below and infer the most likely sleep issue pattern, preferences, and suitable intervention style.
 2. Select the best 3 SOP process candidates from the provided candidate list.
 3. You may reorder candidates, but every returned value must come from the candidate list.
 4. Do not return any `sleep.pure_music.*` candidate. Restrict the result to guided `sleep.scene.*` candidates only.
 5. Keep the output schema exactly compatible with this JSON structure:
-{{
-  "scenarios": [
-    {{
-      "scenario_id": null,
-      "scenario_name": null,
-      "stages": [
-        {{
-          "cmd_name": "string",
-          "stage_name": null,
-          "audio_file": null,
-          "guide_file": null,
-          "light_scene": null,
-          "aroma_mode": null
-        }}
-      ]
-    }}
-  ]
-}}
+{"scenarios":[{"scenario_id":null,"scenario_name":null,"stages":[{"cmd_name":"string","stage_name":null,"audio_file":null,"guide_file":null,"light_scene":null,"aroma_mode":null}]}]}
 6. Only set `cmd_name`; all other fields should be null.
-7. Return exactly 3 SOP process ids.
-"""
+7. Return exactly 3 SOP process ids."""
+
+
+@lru_cache(maxsize=8)
+def _static_prompt(kind: str, catalog_version: str, candidates: Tuple[str, ...] = ()) -> str:
+    """Everything before the user profile, rendered once per catalog version (and SOP candidate list).
+
+    The static text leads the prompt so it is also a stable prefix for
+    server-side prompt caching.
+    """
+    if kind == RECO_SCENARIOS:
+        title, items, task = "Scenario candidates", _SCENARIO_CANDIDATES, _SCENARIO_TASK
+    else:
+        title, items, task = "Standard SOP process candidates", list(candidates), _SOP_TASK
+    return "\n\n".join([
+        f"Sleep intervention knowledge base:\n{_load_text(_KNOWLEDGE_BASE_PATH)}",
+        f"Sleep strategy topology:\n{_load_text(_TOPOLOGY_PATH)}",
+        f"{title} (one JSON per line):\n" + "\n".join(_compact_json(item) for item in items),
+        task,
+    ])
+
+
+def _render_prompt(flow: str, static: str, profile: UserProfile) -> str:
+    profile_text, cut = _profile_prompt_json(profile, Config.RECO_PROMPT_PROFILE_TOKENS)
+    prompt = f"{static}\n\nUser profile (one JSON section per line, most important first):\n{profile_text}\n"
+    _PROMPT_STATS.record(flow, prompt, profile_text, cut)
+    return prompt
+
+
+def _build_prompt(profile: UserProfile) -> str:
+    return _render_prompt("sleep_scenario_reco", _static_prompt(RECO_SCENARIOS, _catalog_version()), profile)
+
+
+def _build_sop_reco_prompt(profile: UserProfile, candidates: List[str]) -> str:
+    static = _static_prompt(RECO_SOP, _catalog_version(), tuple(candidates))
+    return _render_prompt("sleep_sop_reco", static, profile)
+
+
+@lru_cache(maxsize=4)
+def _build_model(api_key: str, endpoint_id: str, model: str) -> VolcEngineArkChat:
+    # one client per configuration, reused by every recommendation; a failed init is not cached
+    return VolcEngineArkChat(
+        ark_api_key=api_key,
+        endpoint_id=endpoint_id,
+        model=model,
+        temperature=0.3,
+    )
 
 
 def _get_model() -> Optional[VolcEngineArkChat]:
@@ -248,12 +355,7 @@ def _get_model() -> Optional[VolcEngineArkChat]:
     if not api_key:
         return None
     try:
-        return VolcEngineArkChat(
-            ark_api_key=api_key,
-            endpoint_id=endpoint_id,
-            model=model,
-            temperature=0.3,
-        )
+        return _build_model(api_key, endpoint_id, model)
     except Exception as e:
         logging.error("sleep recommendation llm init failed: %s", e)
         return None
@@ -294,10 +396,6 @@ def _validate_scenarios(payload: Any) -> List[SleepScenario]:
     return scenarios
 
 
-def _fallback_scenarios() -> List[SleepScenario]:
-    return [SleepScenario.model_validate(item) for item in _SCENARIO_CANDIDATES[:2]]
-
-
 def _default_sop_candidates() -> List[str]:
     profile_candidates = [
         key.replace("sleep.scene.", "")
@@ -405,50 +503,193 @@ def _validate_sop_reco(payload: Any, candidates: List[SleepScenario]) -> List[Sl
     return reco
 
 
-def _fallback_sop_reco(candidates: List[SleepScenario]) -> List[SleepScenario]:
-    if candidates:
-        return [_clone_sleep_scenario(item) for item in candidates[:3]]
-    return [_build_sop_reco_scenario(item) for item in _default_sop_candidates()[:3]]
-
-
 def _pick_random_sop_reco(scenarios: List[SleepScenario]) -> List[SleepScenario]:
     if not scenarios:
         return []
     return [random.choice(scenarios)]
 
 
+@lru_cache(maxsize=1)
+def _catalog_version() -> str:
+    """Hash of everything the prompts carry besides the profile: candidates, knowledge base, topology."""
+    digest = hashlib.sha1()
+    for part in (
+        json.dumps(_SCENARIO_CANDIDATES, ensure_ascii=False, sort_keys=True),
+        json.dumps([item.model_dump(mode="json") for item in _load_sop_candidate_scenarios()], ensure_ascii=False, sort_keys=True),
+        _load_text(_KNOWLEDGE_BASE_PATH),
+        _load_text(_TOPOLOGY_PATH),
+        _SYSTEM_PROMPT,
+        _SOP_SYSTEM_PROMPT,
+    ):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()[:16]
+
+
+def _bucket(value: Optional[float], width: float) -> Optional[int]:
+    return None if value is None else int(value // width)
+
+
+def reco_features(profile: UserProfile, today: Optional[int] = None) -> Dict[str, Any]:
+    """推荐相关特征（已分桶）
+
+    The part of a profile the recommendation depends on, coarsened so that
+    noise (another heartbeat sample, a night scoring 71 instead of 72) does
+    not change it: 7-day sleep means in _FINGERPRINT_BUCKETS buckets,
+    long_term_profile to one decimal, per-scene 30-day plays on a log2
+    scale, and the static user attributes.
+    """
+    today = epoch_day() if today is None else today
+    recent = profile.sleep_aggregates.window(7, today) or {}
+    sleep = {name: _bucket(recent.get(name), width) for name, width in _FINGERPRINT_BUCKETS.items()}
+    sleep["nights"] = min(recent.get("nights", 0), 7)
+
+    scenes = {}
+    for cmd, usage in profile.scene_usage.items():
+        count = usage.count(today, _FINGERPRINT_SCENE_DAYS)
+        if count:
+            scenes[cmd] = count.bit_length()
+
+    person = {}
+    if profile.profile is not None:
+        person = {"gender": profile.profile.gender or "", "age": profile.profile.age or "", "birthday": profile.profile.birthday or ""}
+    return {
+        "sleep": sleep,
+        "long_term": sorted((key, round(value, 1)) for key, value in profile.long_term_profile),
+        "scenes": scenes,
+        "basic_info": sorted((profile.basic_info or {}).items()),
+        "person": person,
+        "emb": [round(value, 2) for value in profile.uid_emb],
+    }
+
+
+def reco_fingerprint(
+    profile: UserProfile, kind: str, today: Optional[int] = None, candidates: Optional[List[str]] = None,
+) -> str:
+    """Stable key of `kind` recommendations for this profile under the current catalog and the offered candidate cmds."""
+    payload = json.dumps(
+        [kind, _catalog_version(), sorted(candidates or []), reco_features(profile, today)],
+        ensure_ascii=False, sort_keys=True,
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class RecoCache:
+    """推荐结果缓存（按特征指纹）
+
+    Maps a reco_fingerprint to the validated LLM result it produced, so a
+    profile whose reco-relevant features have not moved out of their
+    buckets gets the stored result without an LLM call. Keys do not
+    include the uid: users with identical features share an entry. Only
+    LLM answers are stored, never fallbacks. Entries expire after
+    `ttl_sec` (0 = never) so recommendations still refresh now and then.
+    """
+
+    def __init__(self, max_entries: int, ttl_sec: float = 0):
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, List[dict]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.llm_calls = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[List[SleepScenario]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_sec > 0 and time.monotonic() - entry[0] > self.ttl_sec:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            items = entry[1]
+        return [SleepScenario.model_validate(item) for item in items]
+
+    def put(self, key: str, scenarios: List[SleepScenario]):
+        if self.max_entries <= 0:
+            return
+        items = [item.model_dump() for item in scenarios]
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.monotonic(), items)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def record_llm_call(self):
+        with self._lock:
+            self.llm_calls += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "llm_calls": self.llm_calls,
+                "llm_calls_saved": self.hits,
+                "evictions": self.evictions,
+            }
+
+
+_RECO_CACHE = RecoCache(Config.RECO_CACHE_MAX_ENTRIES, Config.RECO_CACHE_TTL_SEC)
+
+
+def _local_scorer(candidates: List[SleepScenario]) -> LocalScorer:
+    return LocalScorer(candidates, [scene_key(_extract_sop_cmd_name(item) or "") for item in candidates])
+
+
+@lru_cache(maxsize=1)
+def _scenario_scorer() -> LocalScorer:
+    return _local_scorer([SleepScenario.model_validate(item) for item in _SCENARIO_CANDIDATES])
+
+
+@lru_cache(maxsize=1)
+def _sop_scorer() -> LocalScorer:
+    return _local_scorer(_load_sop_candidate_scenarios())
+
+
+def _today() -> int:
+    return int(time.time()) // 86400
+
+
 class RecommendationEngine:
     """根据用户画像生成 Sleep Scenarios 的引擎"""
 
-    @staticmethod
-    def should_rerun_recommendation(old_profile: Optional[UserProfile], new_profile: UserProfile) -> bool:
-        """层级判断逻辑"""
-        if not old_profile or not old_profile.sleep_scenarios_reco:
-            return True
-
-        def get_metric(profile, key):
-            for k, v in profile.long_term_profile:
-                if k == key:
-                    return v
-            return None
+    cache = _RECO_CACHE
+    prompt_stats = _PROMPT_STATS
 
-        old_stress = get_metric(old_profile, "stress_index")
-        new_stress = get_metric(new_profile, "stress_index")
-        if old_stress is not None and new_stress is not None:
-            if abs(old_stress - new_stress) > 0.3:
-                return True
+    @staticmethod
+    def local_scenarios(profile: UserProfile) -> List[SleepScenario]:
+        """The 2 best scenario candidates by the local scorer, no LLM call."""
+        return _scenario_scorer().rank(profile, 2, _today())
 
-        return False
+    @staticmethod
+    def local_sop_reco(profile: UserProfile) -> List[SleepScenario]:
+        """One of the 3 best SOP candidates by the local scorer, no LLM call."""
+        return _pick_random_sop_reco(_sop_scorer().rank(profile, 3, _today()))
 
     @staticmethod
     def generate(profile: UserProfile) -> List[SleepScenario]:
+        key = reco_fingerprint(profile, RECO_SCENARIOS)
+        cached = _RECO_CACHE.get(key)
+        if cached is not None:
+            return cached
+
         model = _get_model()
         if model is None:
-            logging.warning("ARK_API_KEY not set, using fallback sleep scenario candidates")
-            return _fallback_scenarios()
+            logging.warning("ARK_API_KEY not set, using locally ranked sleep scenario candidates")
+            return RecommendationEngine.local_scenarios(profile)
 
         prompt = _build_prompt(profile)
         _append_llm_trace("request", "sleep_scenario_reco", prompt)
+        _RECO_CACHE.record_llm_call()
         try:
             response = model.invoke([
                 SystemMessage(content=_SYSTEM_PROMPT),
@@ -459,13 +700,14 @@ class RecommendationEngine:
             parsed = _extract_json(response.content)
             scenarios = _validate_scenarios(parsed)
             if len(scenarios) == 2:
+                _RECO_CACHE.put(key, scenarios)
                 return scenarios
-            logging.warning("sleep recommendation llm returned %s valid scenarios, using fallback", len(scenarios))
+            logging.warning("sleep recommendation llm returned %s valid scenarios, using local ranking", len(scenarios))
         except Exception as e:
             _append_llm_trace("error", "sleep_scenario_reco", prompt, error_text=str(e))
             logging.error("sleep recommendation llm call failed: %s", e)
 
-        return _fallback_scenarios()
+        return RecommendationEngine.local_scenarios(profile)
 
     @staticmethod
     def generate_sop_reco(profile: UserProfile, candidates: Optional[List[str]] = None) -> List[SleepScenario]:
@@ -483,17 +725,25 @@ class RecommendationEngine:
             if (cmd_name := _extract_sop_cmd_name(scenario)) is not None
         ]
 
-        fallback = _fallback_sop_reco(candidate_scenarios)
-        if not fallback:
+        if not candidate_scenarios:
             return []
+        scorer = _sop_scorer() if candidate_scenarios is file_candidates else _local_scorer(candidate_scenarios)
+        fallback = scorer.rank(profile, 3, _today())
+
+        # the LLM's top 3 are cached; each hit still draws its own pick from them
+        key = reco_fingerprint(profile, RECO_SOP, candidates=normalized_candidates)
+        cached = _RECO_CACHE.get(key)
+        if cached is not None:
+            return _pick_random_sop_reco(cached)
 
         model = _get_model()
         if model is None:
-            logging.warning("ARK_API_KEY not set, using fallback SOP candidates")
+            logging.warning("ARK_API_KEY not set, using locally ranked SOP candidates")
             return _pick_random_sop_reco(fallback)
 
         prompt = _build_sop_reco_prompt(profile, normalized_candidates)
         _append_llm_trace("request", "sleep_sop_reco", prompt)
+        _RECO_CACHE.record_llm_call()
         try:
             response = model.invoke([
                 SystemMessage(content=_SOP_SYSTEM_PROMPT),
@@ -504,8 +754,9 @@ class RecommendationEngine:
             parsed = _extract_json(response.content)
             reco = _validate_sop_reco(parsed, candidate_scenarios)
             if len(reco) == min(3, len(normalized_candidates)):
+                _RECO_CACHE.put(key, reco)
                 return _pick_random_sop_reco(reco)
-            logging.warning("sleep sop recommendation llm returned %s valid candidates, using fallback", len(reco))
+            logging.warning("sleep sop recommendation llm returned %s valid candidates, using local ranking", len(reco))
         except Exception as e:
             _append_llm_trace("error", "sleep_sop_reco", prompt, error_text=str(e))
             logging.error("sleep sop recommendation llm call failed: %s", e)
@@ -0,0 +1,25 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# user_server reads RUN_DIR (logs, store) at import time
+os.environ.setdefault("RUN_DIR", tempfile.mkdtemp(prefix="mindora_user_test_"))
+
+from config import Config
+
+
+@pytest.fixture
+def profile_serv(tmp_path, monkeypatch):
+  """A UserProfileServ on a fresh txt_json store, with no background reco worker."""
+  import user_server
+
+  monkeypatch.setattr(user_server, "run_dir", str(tmp_path))
+  monkeypatch.setattr(Config, "USER_PROFILE_STORAGE_MODE", "txt_json")
+  monkeypatch.setattr(Config, "RECO_WORKERS", 0)
+  (tmp_path / "data").mkdir(exist_ok=True)
+  serv = user_server.UserProfileServ()
+  yield serv
+  serv.close()
@@ -0,0 +1,96 @@
+import threading
+import time
+
+from common.debounced_worker import DebouncedWorker
+
+
+class _Recorder:
+  """A run callback recording (uid, tags) calls; optionally blocks until `release` is set."""
+
+  def __init__(self, block=False, fail_uids=()):
+    self.calls = []
+    self.started = threading.Event()
+    self.release = threading.Event()
+    if not block:
+      self.release.set()
+    self.fail_uids = set(fail_uids)
+    self.active = 0
+    self.max_active = 0
+    self._lock = threading.Lock()
+
+  def __call__(self, uid, tags):
+    with self._lock:
+      self.active += 1
+      self.max_active = max(self.max_active, self.active)
+    self.started.set()
+    self.release.wait(5)
+    with self._lock:
+      self.active -= 1
+      self.calls.append((uid, set(tags)))
+    if uid in self.fail_uids:
+      raise RuntimeError("llm down")
+
+
+def test_requests_for_a_uid_are_coalesced():
+  run = _Recorder()
+  worker = DebouncedWorker(run, workers=2, debounce_sec=0.05, max_delay_sec=5)
+  for tags in (["scenarios"], ["sop"], ["scenarios"]):
+    assert worker.schedule("u1", tags)
+  worker.schedule("u2", ["sop"])
+  assert worker.wait_idle(5)
+  assert sorted(run.calls) == [("u1", {"scenarios", "sop"}), ("u2", {"sop"})]
+  stats = worker.stats()
+  assert (stats["scheduled"], stats["coalesced"], stats["runs"]) == (4, 2, 2)
+  worker.close()
+
+
+def test_max_delay_bounds_a_steady_stream():
+  run = _Recorder()
+  worker = DebouncedWorker(run, workers=1, debounce_sec=0.2, max_delay_sec=0.25)
+  deadline = time.monotonic() + 0.8
+  while time.monotonic() < deadline:
+    worker.schedule("u1", ["scenarios"])
+    time.sleep(0.02)
+  # requests 20 ms apart never leave the 200 ms debounce quiet, so only max_delay ran it
+  assert run.calls
+  worker.close()
+
+
+def test_a_uid_never_runs_twice_at_once():
+  run = _Recorder(block=True)
+  worker = DebouncedWorker(run, workers=4, debounce_sec=0, max_delay_sec=0)
+  worker.schedule("u1", ["scenarios"])
+  assert run.started.wait(5)
+  # arrives while the first job runs: queued behind it, not started on another thread
+  worker.schedule("u1", ["sop"])
+  time.sleep(0.05)
+  assert run.max_active == 1
+  run.release.set()
+  assert worker.wait_idle(5)
+  assert run.calls == [("u1", {"scenarios"}), ("u1", {"sop"})]
+  assert run.max_active == 1
+  worker.close()
+
+
+def test_failures_are_counted_and_the_worker_keeps_going():
+  run = _Recorder(fail_uids={"bad"})
+  worker = DebouncedWorker(run, workers=1, debounce_sec=0, max_delay_sec=0)
+  worker.schedule("bad", ["sop"])
+  assert worker.wait_idle(5)
+  worker.schedule("good", ["sop"])
+  assert worker.wait_idle(5)
+  assert [uid for uid, _ in run.calls] == ["bad", "good"]
+  assert (worker.stats()["runs"], worker.stats()["failed"]) == (2, 1)
+  worker.close()
+
+
+def test_close_drops_queued_jobs():
+  run = _Recorder()
+  worker = DebouncedWorker(run, workers=2, debounce_sec=10, max_delay_sec=10)
+  worker.schedule("u1", ["sop"])
+  worker.schedule("u2", ["sop"])
+  worker.close()
+  assert run.calls == []
+  assert worker.stats()["dropped"] == 2 and worker.stats()["queued"] == 0
+  assert not worker.schedule("u3", ["sop"])
+  assert all(not thread.is_alive() for thread in worker._threads)
@@ -0,0 +1,31 @@
+import datetime
+from types import SimpleNamespace
+
+from llm_service import extract_sleep_context
+from user_profile import UserProfile
+
+# 2025-03-10 22:00 in Los Angeles, already 2025-03-11 in UTC
+LATE_NIGHT = int(datetime.datetime(2025, 3, 11, 5, tzinfo=datetime.timezone.utc).timestamp())
+
+
+def _data(**kwargs):
+  return SimpleNamespace(**{"date": None, "end_date": None, "timezone": "UTC", "language": "en", **kwargs})
+
+
+def _profile():
+  return UserProfile.model_validate({"sleep_data": [{"timestamp": LATE_NIGHT, "sleep_quality": 80}]})
+
+
+def test_requested_date_is_read_in_the_request_timezone():
+  profile = _profile()
+  local = extract_sleep_context(profile, _data(date="2025-03-10", timezone="America/Los_Angeles"), False)
+  assert local["avg_score"] == 80
+  utc = extract_sleep_context(profile, _data(date="2025-03-10"), False)
+  assert utc["avg_score"] is None
+
+
+def test_malformed_date_falls_back_to_today():
+  ctx = extract_sleep_context(_profile(), _data(date="10/03/2025"), False)
+  assert ctx["date"] == "10/03/2025"
+  # the night is long past the 90-day window ending today
+  assert (ctx["avg_score"], ctx["avg_score_90d"], ctx["latest_score"]) == (None, None, 80)
@@ -0,0 +1,77 @@
+import pytest
+
+from reco_gate import RecoGate, snapshot
+from sleep_reco import RecommendationEngine
+from user_profile import SleepResult, UserProfile
+
+NOW = 1_700_000_000.0
+DAY = 86400
+RULES = {"new_nights": (2, 3600), "sleep_quality_trend": (5.0, 0)}
+
+
+def _profile(nights=3, quality=80.0):
+  profile = UserProfile.model_validate({
+    "sleep_data": [{"timestamp": int(NOW) - k * DAY, "sleep_quality": quality} for k in range(nights)],
+  })
+  profile.sleep_scenarios_reco = RecommendationEngine.local_scenarios(profile)
+  profile.standard_sop_reco = RecommendationEngine.local_sop_reco(profile)
+  profile.reco_baseline = snapshot(profile, NOW)
+  return profile
+
+
+def _add_night(profile, ts, quality=80.0):
+  night = SleepResult.model_validate({"timestamp": ts, "sleep_quality": quality})
+  profile.sleep_data.append(night)
+  profile.sleep_aggregates.add(night)
+
+
+def test_unchanged_profile_is_not_rerun():
+  gate = RecoGate(RULES, max_age_sec=7 * DAY)
+  decision = gate.decide("u1", _profile(), NOW + 2 * 3600)
+  assert (decision.rerun, decision.reason) == (False, "unchanged")
+  assert decision.deltas["new_nights"] == 0
+
+
+def test_new_nights_rerun_once_past_threshold_and_interval():
+  gate = RecoGate(RULES, max_age_sec=7 * DAY)
+  profile = _profile()
+  _add_night(profile, int(NOW) + 600)
+  # one new night is below the threshold of two
+  assert gate.decide("u1", profile, NOW + 1200).reason == "unchanged"
+  _add_night(profile, int(NOW) + 900)
+  held = gate.decide("u1", profile, NOW + 1200)
+  assert (held.rerun, held.reason) == (False, "min_interval:new_nights")
+  decision = gate.decide("u1", profile, NOW + 3600)
+  assert (decision.rerun, decision.reason, decision.deltas["new_nights"]) == (True, "changed:new_nights", 2)
+
+
+def test_small_changes_add_up_against_the_baseline():
+  gate = RecoGate({"sleep_quality_trend": (5.0, 0)}, max_age_sec=0)
+  profile = _profile(nights=1)
+  # each night moves the 7-day mean 2.5 points from the one before, the second 5 from the baseline
+  reasons = []
+  for k, quality in enumerate((75.0, 70.0), start=1):
+    _add_night(profile, int(NOW) + k * 60, quality)
+    reasons.append(gate.decide("u1", profile, NOW + k * 60).reason)
+  assert reasons == ["unchanged", "changed:sleep_quality_trend"]
+
+
+def test_missing_and_stale_recommendations_rerun():
+  gate = RecoGate({"new_nights": (2, 3600)}, max_age_sec=7 * DAY)
+  profile = _profile()
+  assert gate.decide("u1", profile, NOW + 7 * DAY).reason == "max_age"
+  profile.standard_sop_reco = []
+  assert gate.decide("u1", profile, NOW + 60).reason == "missing"
+  fresh = _profile()
+  fresh.reco_baseline.ts = 0
+  assert gate.decide("u2", fresh, NOW).reason == "no_baseline"
+
+  stats = gate.stats()
+  assert (stats["decisions"], stats["reruns"]) == (3, 3)
+  assert stats["by_reason"] == {"max_age": 1, "missing": 1, "no_baseline": 1}
+  assert [reason for _, _, _, reason in gate.recent()] == ["max_age", "missing", "no_baseline"]
+
+
+def test_unknown_feature_is_rejected():
+  with pytest.raises(ValueError):
+    RecoGate({"moon_phase": (1, 0)}, max_age_sec=0)
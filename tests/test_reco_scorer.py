@@ -0,0 +1,68 @@
+import numpy as np
+
+from reco_scorer import LocalScorer, scene_key
+from user_profile import SceneUsage, SleepScenario, UserProfile
+
+NOW = 1_700_000_000
+TODAY = NOW // 86400
+CMDS = ("sleep.breath.box_breathing", "sleep.countdown.sheep_countdown", "sleep.scene.kyoto_forest", "sleep.scene.amalfi_breeze")
+
+
+def _scorer(cmds=CMDS):
+  candidates = [SleepScenario.model_validate({"stages": [{"cmd_name": cmd}]}) for cmd in cmds]
+  return LocalScorer(candidates, [scene_key(cmd) for cmd in cmds])
+
+
+def _top(scorer, profile, k=1):
+  return [c.stages[0].cmd_name for c in scorer.rank(profile, k, TODAY)]
+
+
+def _profile(**night):
+  return UserProfile.model_validate({"sleep_data": [{"timestamp": NOW, **night}]} if night else {})
+
+
+def test_needs_pick_the_matching_candidate():
+  scorer = _scorer()
+  # low sleep-onset efficiency asks for a countdown, a racing heart for breathing
+  assert _top(scorer, _profile(soe=65.0, avg_heart_rate=55.0, hrv=60.0)) == ["sleep.countdown.sheep_countdown"]
+  assert _top(scorer, _profile(soe=95.0, avg_heart_rate=80.0, hrv=60.0)) == ["sleep.breath.box_breathing"]
+
+
+def test_usage_pulls_played_scenes_up():
+  scorer = _scorer()
+  profile = _profile()
+  before = scorer.scores(profile, TODAY)
+  usage = SceneUsage()
+  for k in range(5):
+    usage.record(NOW - k * 86400)
+  profile.scene_usage = {"sleep.scene.amalfi_breeze": usage}
+  after = scorer.scores(profile, TODAY)
+  assert _top(scorer, profile) == ["sleep.scene.amalfi_breeze"]
+  gain = after - before
+  assert gain[3] > 0 and gain[3] > gain[:3].max()
+  # plays older than the 30-day window no longer count
+  assert np.allclose(scorer.scores(profile, TODAY + 60), before)
+
+
+def test_ranking_is_deterministic():
+  profile = _profile(soe=80.0, deep_pct=15.0)
+  profile.uid_emb = [0.3, -0.1, 0.7, 0.2]
+  first = _scorer().scores(profile, TODAY)
+  # a fresh scorer draws the same candidate vectors for uid_emb
+  assert np.array_equal(first, _scorer().scores(profile, TODAY))
+  scorer = _scorer()
+  assert _top(scorer, profile, 4) == _top(scorer, profile, 4)
+  assert sorted(_top(scorer, profile, 4)) == sorted(CMDS)
+
+
+def test_rank_returns_copies():
+  scorer = _scorer()
+  top = scorer.rank(_profile(), 1, TODAY)[0]
+  top.stages[0].cmd_name = "changed"
+  assert "changed" not in [c.stages[0].cmd_name for c in scorer.candidates]
+
+
+def test_empty_candidates():
+  scorer = _scorer(())
+  assert scorer.scores(_profile(soe=65.0), TODAY).size == 0
+  assert scorer.rank(_profile(soe=65.0), 3, TODAY) == []
@@ -0,0 +1,80 @@
+from common.rollup import BehaviorRollup, fold_behavior_rollups
+from common.series import BehaviorSeries
+from user_profile import UserProfile
+
+T0 = 1_700_006_400  # 2023-11-15 00:00:00 UTC, aligned to every resolution
+
+
+def _series(pairs):
+  return BehaviorSeries.from_pairs(pairs)
+
+
+def test_buckets_keep_min_max_mean_count():
+  rollups = {}
+  new = {"heart_rate": _series([[T0, 60], [T0 + 30, 80], [T0 + 60, 70], [T0 + 3600, 90]])}
+  assert fold_behavior_rollups(rollups, {}, new) == ["heart_rate"]
+
+  rollup = rollups["heart_rate"]
+  assert rollup["minute"].to_rows() == [
+    [T0, 60.0, 80.0, 70.0, 2], [T0 + 60, 70.0, 70.0, 70.0, 1], [T0 + 3600, 90.0, 90.0, 90.0, 1],
+  ]
+  assert rollup["hour"].to_rows() == [[T0, 60.0, 80.0, 70.0, 3], [T0 + 3600, 90.0, 90.0, 90.0, 1]]
+  assert rollup["day"].summary() == {"min": 60.0, "max": 90.0, "mean": 75.0, "count": 4}
+  assert rollup.watermark == T0 + 3600
+
+
+def test_resent_samples_are_not_counted_twice():
+  rollups = {}
+  first = _series([[T0 + i * 60, 60 + i] for i in range(5)])
+  fold_behavior_rollups(rollups, {}, {"heart_rate": first})
+  # the device re-sends the whole window plus one new sample
+  again = _series([[T0 + i * 60, 60 + i] for i in range(6)])
+  assert fold_behavior_rollups(rollups, {"heart_rate": first}, {"heart_rate": again}) == ["heart_rate"]
+  assert rollups["heart_rate"]["day"].summary()["count"] == 6
+  # a pure re-send updates nothing
+  assert fold_behavior_rollups(rollups, {"heart_rate": again}, {"heart_rate": again}) == []
+  assert rollups["heart_rate"]["day"].summary()["count"] == 6
+
+
+def test_evicted_samples_are_not_counted_twice():
+  rollups = {}
+  fold_behavior_rollups(rollups, {}, {"heart_rate": _series([[T0 + i * 60, 70] for i in range(10)])})
+  # the raw ring only kept the last two samples; older re-sends are below the watermark
+  raw = _series([[T0 + 8 * 60, 70], [T0 + 9 * 60, 70]])
+  resend = _series([[T0 + i * 60, 70] for i in range(3)])
+  assert fold_behavior_rollups(rollups, {"heart_rate": raw}, {"heart_rate": resend}) == []
+  assert rollups["heart_rate"]["minute"].summary()["count"] == 10
+
+
+def test_first_fold_seeds_with_raw_samples():
+  rollups = {}
+  raw = _series([[T0, 50], [T0 + 60, 52]])
+  fold_behavior_rollups(rollups, {"heart_rate": raw}, {"heart_rate": _series([[T0 + 120, 54]])})
+  assert rollups["heart_rate"]["minute"].summary() == {"min": 50.0, "max": 54.0, "mean": 52.0, "count": 3}
+
+
+def test_retention_is_counted_back_from_the_newest_bucket():
+  rollups = {}
+  samples = _series([[T0 + i * 60, i] for i in range(30)])
+  fold_behavior_rollups(rollups, {}, {"heart_rate": samples}, {"minute": 10, "hour": 2})
+  rollup = rollups["heart_rate"]
+  assert rollup.bucket_counts() == {"minute": 10, "hour": 1, "day": 1}
+  assert rollup["minute"].start[0] == T0 + 20 * 60
+  # coarser resolutions still cover every sample
+  assert rollup["hour"].summary()["count"] == 30
+
+
+def test_non_numeric_behaviors_are_skipped():
+  rollups = {}
+  plays = UserProfile.model_validate({"behaviors": {"plays": [[T0, {"cmd": "x"}]]}}).behaviors
+  assert fold_behavior_rollups(rollups, {}, plays) == []
+  assert rollups == {}
+
+
+def test_packed_round_trip():
+  samples = _series([[T0, 1.5], [T0 + 90, 2.5]])
+  rollup = BehaviorRollup()
+  rollup.add(samples.ts, samples.values)
+  assert BehaviorRollup._validate(rollup.pack()) == rollup
+  wire = {"watermark": rollup.watermark, **{name: rollup[name].to_rows() for name in ("minute", "hour", "day")}}
+  assert BehaviorRollup._validate(wire) == rollup
@@ -0,0 +1,51 @@
+from common.series import DEFAULT_CAPACITY, PACKED_CONTEXT, BehaviorSeries, EventSeries
+from user_profile import ProfileView, UserProfile
+
+
+def _plays(n, start=1_700_000_000, cmd="sleep.scene.kyoto_forest"):
+  return [[start + i * 60, {"cmd": cmd, "event": "sop_start"}] for i in range(n)]
+
+
+def test_event_series_payload_keeps_every_item():
+  series = EventSeries._validate(_plays(150))
+  assert len(series) == 150
+  assert len(series.trim(DEFAULT_CAPACITY)) == DEFAULT_CAPACITY
+  assert series.trim(DEFAULT_CAPACITY)[0] == series[50]
+
+
+def test_update_with_more_plays_than_capacity(profile_serv):
+  uid = "u_plays"
+  profile_serv.update_profile(uid, UserProfile(), skip_sleep_scenarios_reco_update=True)
+  payload = UserProfile.model_validate({"behaviors": {"plays": _plays(150)}})
+  assert profile_serv.update_profile(uid, payload, skip_sleep_scenarios_reco_update=True)
+
+  profile = profile_serv.get_profile(uid)
+  cmd = "sleep.scene.kyoto_forest"
+  assert profile.scene_usage[cmd].total == 150
+  # every play reached mindora_record before it was bounded to the stored capacity
+  assert len(profile.mindora_record[cmd]) == DEFAULT_CAPACITY
+  assert profile.mindora_record[cmd][-1][0] == 1_700_000_000 + 149 * 60
+  assert len(profile.behaviors["plays"]) == DEFAULT_CAPACITY
+
+
+def test_numeric_wire_format():
+  ints = UserProfile.model_validate({"behaviors": {"heart_rate": [[1, 70], [2, 72]]}})
+  assert ints.model_dump(mode="json")["behaviors"]["heart_rate"] == [[1, 70], [2, 72]]
+  # int-ness is kept per series: one float makes every value of the series a float
+  mixed = UserProfile.model_validate({"behaviors": {"heart_rate": [[1, 70], [2, 70.5]]}})
+  assert mixed.model_dump(mode="json")["behaviors"]["heart_rate"] == [[1, 70.0], [2, 70.5]]
+
+
+def test_empty_numeric_behavior_is_a_behavior_series():
+  profile = UserProfile.model_validate({"behaviors": {"heart_rate": [], "clicks": []}})
+  assert isinstance(profile.behaviors["heart_rate"], BehaviorSeries)
+  assert isinstance(profile.behaviors["clicks"], EventSeries)
+  assert isinstance(UserProfile().behaviors["blood_oxygen"], BehaviorSeries)
+
+  stored = UserProfile().model_dump(mode="json")
+  assert stored["behaviors"]["heart_rate"] == []
+  assert isinstance(UserProfile.model_validate(stored).behaviors["heart_rate"], BehaviorSeries)
+  view = ProfileView.from_data(UserProfile().model_dump(mode="json", context=PACKED_CONTEXT), ["behaviors"])
+  assert isinstance(view.behaviors["heart_rate"], BehaviorSeries)
+  view = ProfileView.from_data(stored, ["behaviors"])
+  assert isinstance(view.behaviors["heart_rate"], BehaviorSeries)
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from sleep_analytics import analyze_nights, fluctuation_score
+from user_profile import SleepResult
+
+T0 = 1_700_000_000
+
+
+def _night(stages, start=T0, shuffle=False):
+  """A SleepResult from [(sleep_type, minutes), ...] played back to back from `start`."""
+  status, t = [], start
+  for sleep_type, minutes in stages:
+    status.append({"start_time": t, "duration": minutes, "sleep_type": sleep_type})
+    t += int(minutes * 60)
+  if shuffle:
+    status.reverse()
+  return SleepResult.model_validate({"timestamp": t, "sleep_status": status})
+
+
+_STAGES = [
+  ("awake", 10), ("core", 60), ("deep", 30), ("awake", 5), ("awake", 5), ("rem", 20), ("core", 40), ("awake", 10),
+]
+
+
+def test_night_metrics_follow_the_definitions():
+  metrics = analyze_nights([_night(_STAGES, shuffle=True)])
+  assert metrics.night(0) == {
+    "time_in_bed": 180.0,
+    "total_sleep": 150.0,
+    "efficiency": 83.3,
+    "latency": 10.0,
+    # the final awakening is not waso, and two awake segments in a row are one awakening
+    "waso": 10.0,
+    "awakenings": 1.0,
+    "transitions": 6.0,
+    "fragmentation": 2.4,
+    "longest_sleep": 90.0,
+    "deep_pct": 20.0,
+    "rem_pct": 13.3,
+    "core_pct": 66.7,
+    "structure_score": 71.8,
+    "fluctuation_score": 90.6,
+  }
+  assert metrics.bed_start[0] == T0 and metrics.bed_end[0] == T0 + 180 * 60
+
+
+def test_nights_are_independent():
+  first = _night(_STAGES)
+  second = _night([("core", 30), ("awake", 15), ("deep", 45)], start=T0 + 86400)
+  both = analyze_nights([first, second])
+  assert both.night(0) == analyze_nights([first]).night(0)
+  assert both.night(1) == analyze_nights([second]).night(0)
+  # runs of sleep do not continue across a night boundary
+  assert both.longest_sleep.tolist() == [90.0, 45.0]
+  assert both.latency[1] == 0 and both.waso[1] == 15 and both.awakenings[1] == 1
+
+
+def test_nights_without_sleep_status_are_skipped():
+  empty = SleepResult.model_validate({"timestamp": T0})
+  metrics = analyze_nights([empty, _night(_STAGES, start=T0 + 86400), empty])
+  assert len(metrics) == 3 and metrics.valid.tolist() == [False, True, False]
+  assert metrics.night(0) is None
+  assert metrics.mean()["nights"] == 1
+  assert metrics.mean()["total_sleep"] == 150.0
+  assert analyze_nights([empty]).mean() is None
+  assert analyze_nights([]).mean() is None
+
+
+def test_mean_and_between():
+  nights = [_night([("core", 60 + 30 * k)], start=T0 + k * 86400) for k in range(3)]
+  metrics = analyze_nights(nights)
+  mask = metrics.between(nights[1].timestamp, nights[2].timestamp + 1)
+  assert mask.tolist() == [False, True, True]
+  assert metrics.mean(mask)["total_sleep"] == 105.0
+  assert metrics.mean()["total_sleep"] == 90.0
+
+
+def test_fluctuation_score_is_clipped():
+  assert fluctuation_score(0, 0, 0) == 100
+  assert fluctuation_score(400, 10, 5) == 0
+  assert fluctuation_score(10, 1, 2.4, hr_cv_pct=5) == pytest.approx(85.6)
+  assert np.array_equal(fluctuation_score(np.array([0, 20]), np.array([0, 1]), np.array([0, 0])), [100, 88])
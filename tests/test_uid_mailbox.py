@@ -0,0 +1,36 @@
+import threading
+
+from common.uid_mailbox import UidMailbox
+
+
+def test_leader_runs_only_its_own_round():
+  mailbox = UidMailbox()
+  started, release = threading.Event(), threading.Event()
+  rounds = []
+
+  def process(uid, items):
+    rounds.append((threading.current_thread().name, items))
+    if items == ["first"]:
+      started.set()
+      release.wait(5)
+    return len(items)
+
+  leader = threading.Thread(target=lambda: mailbox.submit("u", "first", process), name="leader")
+  leader.start()
+  started.wait(5)
+  followers = [
+    threading.Thread(target=lambda item=item: mailbox.submit("u", item, process), name=f"follower-{item}")
+    for item in ("a", "b")
+  ]
+  for n, t in enumerate(followers, 2):
+    t.start()
+    while mailbox.stats()["items"] < n:
+      pass
+  release.set()
+  for t in [leader] + followers:
+    t.join(5)
+
+  # the queued items ran as one round, led by the oldest follower, not by the first leader
+  assert [items for _, items in rounds] == [["first"], ["a", "b"]]
+  assert rounds[1][0] == "follower-a"
+  assert mailbox.stats() == {"items": 3, "rounds": 2, "coalesced": 1, "active_uids": 0}
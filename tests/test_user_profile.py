@@ -0,0 +1,66 @@
+import datetime
+import time
+
+import user_profile
+from user_profile import (
+  STORED_CONTEXT, ProfileView, SceneUsage, SleepResult, TsRange, UserProfile, epoch_day, resolve_timezone, top_scenes,
+)
+
+SHANGHAI = resolve_timezone("Asia/Shanghai")
+
+
+def _utc(*args) -> int:
+  return int(datetime.datetime(*args, tzinfo=datetime.timezone.utc).timestamp())
+
+
+def test_epoch_day_near_local_midnight(monkeypatch):
+  # 2026-10-17 02:30 in Shanghai is still 2026-10-16 in UTC
+  monkeypatch.setattr(user_profile.time, "time", lambda: _utc(2026, 10, 16, 18, 30))
+  utc_today = _utc(2026, 10, 16) // 86400
+  assert epoch_day() == utc_today
+  assert epoch_day("2026-10-17", SHANGHAI) == utc_today
+  assert epoch_day("2026-10-16", SHANGHAI) == utc_today
+  assert epoch_day("2026-10-15", SHANGHAI) == utc_today - 1
+  assert epoch_day("2026-10-15") == utc_today - 1
+
+  # one play every night at 01:00 Shanghai, for the local week 2026-10-11 .. 2026-10-17
+  usage = SceneUsage()
+  for k in range(7):
+    usage.record(_utc(2026, 10, 10 + k, 17))
+  scenes = {"sleep.scene.kyoto_forest": usage}
+  assert top_scenes(scenes, epoch_day("2026-10-17", SHANGHAI), 7) == [("sleep.scene.kyoto_forest", 7)]
+
+
+def test_epoch_day_matches_utc_date_for_past_days():
+  today = datetime.datetime.fromtimestamp(time.time(), datetime.timezone.utc).date()
+  past = today - datetime.timedelta(days=3)
+  assert epoch_day(past) == epoch_day(past.isoformat(), datetime.timezone.utc) == epoch_day() - 3
+
+
+def test_client_night_summary_is_recomputed():
+  status = [
+    {"start_time": 1_700_000_000, "duration": 30, "sleep_type": "core"},
+    {"start_time": 1_700_001_800, "duration": 20, "sleep_type": "deep"},
+  ]
+  forged = {"deep_sleep_duration": 600.0, "time_in_bed": 600.0, "segments": 2}
+  night = {"timestamp": 1_700_000_000, "sleep_status": status, "night_summary": forged}
+
+  assert SleepResult.model_validate(night).night_summary.deep_sleep_duration == 20.0
+  # a stored record keeps the summary computed when it was ingested
+  assert SleepResult.model_validate(night, context=STORED_CONTEXT).night_summary.deep_sleep_duration == 600.0
+
+
+def test_projection_of_unsorted_legacy_sleep_data():
+  # stored before sleep_data was kept sorted: out of order, with a re-sent night
+  stamps = [1_700_300_000, 1_700_100_000, 1_700_400_000, 1_700_200_000, 1_700_100_000]
+  nights = [{"timestamp": ts, "sleep_quality": float(k)} for k, ts in enumerate(stamps)]
+
+  tail = ProfileView.from_data({"sleep_data": list(nights)}, {"sleep_data": 2})
+  assert [n.timestamp for n in tail.sleep_data] == [1_700_300_000, 1_700_400_000]
+
+  window = ProfileView.from_data({"sleep_data": list(nights)}, {"sleep_data": TsRange(1_700_100_000, 1_700_300_001)})
+  assert [n.timestamp for n in window.sleep_data] == [1_700_100_000, 1_700_200_000, 1_700_300_000]
+  # the later record for a timestamp wins, as in a full UserProfile
+  assert window.sleep_data[0].sleep_quality == 4.0
+  full = UserProfile.model_validate({"sleep_data": list(nights)}, context=STORED_CONTEXT)
+  assert full.sleep_data[:3] == window.sleep_data
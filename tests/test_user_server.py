@@ -0,0 +1,64 @@
+from config import Config
+from user_profile import AGGREGATE_WINDOWS, SleepAggregates, UserProfile
+
+DAY = 86400
+T0 = 1_700_000_000
+
+
+def _update(profile_serv, uid, nights):
+  payload = UserProfile.model_validate({"sleep_data": nights})
+  assert profile_serv.update_profile(uid, payload, skip_sleep_scenarios_reco_update=True)
+  return profile_serv.get_profile(uid)
+
+
+def _night(day, quality):
+  return {"timestamp": T0 + day * DAY, "sleep_quality": quality}
+
+
+def _assert_aggregates_match(profile):
+  rebuilt = SleepAggregates.from_nights(profile.sleep_data)
+  for days in AGGREGATE_WINDOWS:
+    assert profile.sleep_aggregates.window(days) == rebuilt.window(days)
+
+
+def test_later_nights_are_merged_in_order(profile_serv):
+  uid = "u_nights"
+  profile = _update(profile_serv, uid, [_night(3, 60.0), _night(1, 70.0)])
+  assert [n.timestamp for n in profile.sleep_data] == [T0 + DAY, T0 + 3 * DAY]
+
+  # an existing user's nights are merged: a late night, a re-sent night and a new one
+  profile = _update(profile_serv, uid, [_night(5, 90.0), _night(2, 80.0), _night(3, 65.0)])
+  assert [n.timestamp for n in profile.sleep_data] == [T0 + d * DAY for d in (1, 2, 3, 5)]
+  # the re-sent timestamp replaces the stored night instead of adding a duplicate
+  assert [n.sleep_quality for n in profile.sleep_data] == [70.0, 80.0, 65.0, 90.0]
+  week = profile.sleep_aggregates.window(7)
+  assert (week["nights"], week["sleep_quality"]) == (4, 76.2)
+  _assert_aggregates_match(profile)
+
+  # an update without nights leaves them alone
+  profile = _update(profile_serv, uid, [])
+  assert len(profile.sleep_data) == 4
+
+
+def test_merged_nights_are_trimmed_oldest_first(profile_serv, monkeypatch):
+  monkeypatch.setattr(Config, "SLEEP_DATA_MAX_NIGHTS", 3)
+  uid = "u_trim"
+  _update(profile_serv, uid, [_night(1, 50.0), _night(2, 60.0)])
+  profile = _update(profile_serv, uid, [_night(4, 80.0), _night(3, 70.0)])
+  assert [n.sleep_quality for n in profile.sleep_data] == [60.0, 70.0, 80.0]
+  assert profile.sleep_aggregates.window(7)["nights"] == 3
+  _assert_aggregates_match(profile)
+
+
+def test_sop_reco_candidates_are_the_played_scenes(profile_serv, monkeypatch):
+  import user_server
+
+  seen = []
+  monkeypatch.setattr(user_server.RecommendationEngine, "generate_sop_reco",
+                      staticmethod(lambda profile, candidates=None: seen.append(candidates) or []))
+  profile = UserProfile.model_validate({"mindora_record": {
+    "sleep.scene.kyoto_forest": [[T0, {"cmd": "sleep.scene.kyoto_forest", "event": "sop_start"}]],
+    "sleep.breath.box": [[T0, {"cmd": "sleep.breath.box", "event": "sop_start"}]],
+  }})
+  profile_serv.calc_standard_sop_reco("u_sop", profile, profile)
+  assert seen == [["sleep.scene.kyoto_forest"]]
@@ -0,0 +1,95 @@
+import threading
+
+import pytest
+
+from db.write_batcher import WriteBatcher
+
+
+class _FakeDB:
+  """Records every committed batch; fails batches holding a key in `fail_keys`."""
+
+  def __init__(self, fail_keys=()):
+    self.batches = []
+    self.fail_keys = set(fail_keys)
+
+  def write_batch(self, sync=False):
+    return _FakeBatch(self)
+
+
+class _FakeBatch:
+  def __init__(self, db):
+    self.db = db
+    self.items = []
+
+  def put(self, key, value):
+    self.items.append((key, value))
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc, tb):
+    if exc_type is None:
+      if self.db.fail_keys & {key for key, _ in self.items}:
+        raise IOError("disk full")
+      self.db.batches.append(self.items)
+
+
+def _write_concurrently(batcher, n):
+  errors = []
+
+  def save(i):
+    try:
+      batcher.write([(b"k%d" % i, b"v%d" % i)])
+    except Exception as e:
+      errors.append(e)
+
+  threads = [threading.Thread(target=save, args=(i,)) for i in range(n)]
+  for t in threads:
+    t.start()
+  for t in threads:
+    t.join(5)
+  return errors
+
+
+def test_concurrent_saves_share_batches():
+  db = _FakeDB()
+  batcher = WriteBatcher(db, window_ms=50, max_writes=64)
+  assert _write_concurrently(batcher, 16) == []
+  batcher.close()
+
+  committed = sorted(item for batch in db.batches for item in batch)
+  assert committed == sorted((b"k%d" % i, b"v%d" % i) for i in range(16))
+  assert len(db.batches) < 16
+  stats = batcher.stats()
+  assert stats["writes"] == 16 and stats["batches"] == len(db.batches) and stats["queued"] == 0
+
+
+def test_max_writes_caps_a_batch():
+  db = _FakeDB()
+  batcher = WriteBatcher(db, window_ms=50, max_writes=4)
+  assert _write_concurrently(batcher, 12) == []
+  batcher.close()
+  assert max(len(batch) for batch in db.batches) <= 4
+
+
+def test_failed_commit_raises_in_the_caller():
+  db = _FakeDB(fail_keys={b"k0"})
+  batcher = WriteBatcher(db, window_ms=0, max_writes=1)
+  with pytest.raises(IOError):
+    batcher.write([(b"k0", b"v")])
+  batcher.write([(b"k1", b"v")])
+  assert db.batches == [[(b"k1", b"v")]]
+
+
+def test_disabled_batcher_commits_inline():
+  db = _FakeDB()
+  batcher = WriteBatcher(db, max_writes=1)
+  assert not batcher.enabled
+  batcher.write([(b"a", b"1"), (b"b", b"2")])
+  assert db.batches == [[(b"a", b"1"), (b"b", b"2")]]
+  batcher.close()
+  # after close a batcher commits inline as well
+  queued = WriteBatcher(db, window_ms=10, max_writes=8)
+  queued.close()
+  queued.write([(b"c", b"3")])
+  assert db.batches[-1] == [(b"c", b"3")]
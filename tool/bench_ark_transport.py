@@ -0,0 +1,135 @@
+"""
+VolcEngineArkChat transport: bare requests.post vs the pooled session vs native async.
+
+Starts a local stand-in for the Ark chat-completions endpoint (answers
+after --latency-ms) and sends --calls calls from --concurrency callers
+three ways: a fresh requests.post per call (the old transport), invoke()
+on the shared keep-alive session, and ainvoke() on the pooled aiohttp
+session. Reports wall time, per-call latency and how many TCP connections
+the server saw. Plain HTTP on localhost, so a real TLS handshake to the
+remote endpoint makes the difference larger in production.
+
+Usage (from the repo root):
+    python -m tool.bench_ark_transport
+    python -m tool.bench_ark_transport --calls 400 --concurrency 16 --latency-ms 20
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from aiohttp import web
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from tool import doubao_langchain
+from tool.doubao_langchain import VolcEngineArkChat
+
+_ANSWER = json.dumps({"choices": [{"message": {"content": "{\"ok\": true}"}}]})
+
+
+class _FakeArk:
+  def __init__(self, latency_sec: float):
+    self.latency_sec = latency_sec
+    # client (host, port) pairs seen: one per TCP connection
+    self.peers = set()
+    self.port = None
+    self._ready = threading.Event()
+
+  @property
+  def connections(self) -> int:
+    return len(self.peers)
+
+  async def _handle(self, request):
+    self.peers.add(request.transport.get_extra_info("peername"))
+    await request.read()
+    await asyncio.sleep(self.latency_sec)
+    return web.Response(text=_ANSWER, content_type="application/json")
+
+  def start(self):
+    threading.Thread(target=lambda: asyncio.run(self._serve()), daemon=True).start()
+    self._ready.wait()
+
+  async def _serve(self):
+    app = web.Application()
+    app.router.add_post("/chat/completions", self._handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    self.port = runner.addresses[0][1]
+    self._ready.set()
+    await asyncio.get_running_loop().create_future()
+
+
+def _legacy_post(model: VolcEngineArkChat, messages):
+  body, headers = model._build_request(messages, None)
+  response = requests.post(model.api_base, json=body, headers=headers, timeout=30)
+  response.raise_for_status()
+  return model._parse_answer(response.status_code, response.content, response.encoding)
+
+
+def _run_threads(fn, calls, concurrency):
+  latencies = []
+
+  def one(_):
+    start = time.perf_counter()
+    fn()
+    latencies.append(time.perf_counter() - start)
+
+  start = time.perf_counter()
+  with ThreadPoolExecutor(concurrency) as pool:
+    list(pool.map(one, range(calls)))
+  return time.perf_counter() - start, latencies
+
+
+async def _run_async(model, messages, calls, concurrency):
+  latencies = []
+  gate = asyncio.Semaphore(concurrency)
+
+  async def one():
+    async with gate:
+      start = time.perf_counter()
+      await model.ainvoke(messages)
+      latencies.append(time.perf_counter() - start)
+
+  start = time.perf_counter()
+  await asyncio.gather(*(one() for _ in range(calls)))
+  wall = time.perf_counter() - start
+  await doubao_langchain.close_async_http_session()
+  return wall, latencies
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--calls", type=int, default=200)
+  parser.add_argument("--concurrency", type=int, default=8)
+  parser.add_argument("--latency-ms", type=float, default=10)
+  args = parser.parse_args()
+
+  server = _FakeArk(args.latency_ms / 1000)
+  server.start()
+  model = VolcEngineArkChat(
+    ark_api_key="bench", endpoint_id="bench", api_base=f"http://127.0.0.1:{server.port}/chat/completions",
+  )
+  messages = [SystemMessage(content="system"), HumanMessage(content="x" * 4000)]
+
+  runs = [
+    ("requests.post", lambda: _run_threads(lambda: _legacy_post(model, messages), args.calls, args.concurrency)),
+    ("pooled invoke", lambda: _run_threads(lambda: model.invoke(messages), args.calls, args.concurrency)),
+    ("ainvoke", lambda: asyncio.run(_run_async(model, messages, args.calls, args.concurrency))),
+  ]
+  print(f"{'transport':>14} {'wall s':>7} {'p50 ms':>7} {'p99 ms':>7} {'connections':>12}")
+  for name, run in runs:
+    before = server.connections
+    wall, latencies = run()
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    print(f"{name:>14} {wall:>7.2f} {p50:>7.1f} {p99:>7.1f} {server.connections - before:>12}")
+
+
+if __name__ == "__main__":
+  main()
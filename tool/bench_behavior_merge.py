@@ -0,0 +1,90 @@
+"""
+_merge_behavior cost: per-type sort + merge_two_sorted_dedup (the old path)
+vs one vectorized merge_behavior_groups pass over every behavior type.
+
+Each update merges a batch of new samples (overlapping the stored tail)
+into six numeric signals plus clicks and plays, keeping `samples` per type.
+
+Usage (from the repo root):
+    python -m tool.bench_behavior_merge
+    python -m tool.bench_behavior_merge --samples 100 1000 10000 100000 --batch 60
+"""
+import argparse
+import copy
+import random
+import time
+
+from common import util
+from common.series import BehaviorSeries, EventSeries, merge_behavior_groups
+
+_NUMERIC = ["heart_rate", "blood_oxygen", "resting_heart_rate", "heart_rate_variability_sdnn",
+            "respiratory_rate", "sleeping_wrist_temperature"]
+
+
+def _timeit(fn, rounds: int) -> float:
+  fn()
+  t0 = time.perf_counter()
+  for _ in range(rounds):
+    fn()
+  return (time.perf_counter() - t0) / rounds * 1000
+
+
+def _behaviors(rng: random.Random, end: int, n: int) -> dict:
+  behaviors = {}
+  for name in _NUMERIC:
+    behaviors[name] = [(end - k * 5, rng.randint(50, 99)) for k in range(n)][::-1]
+  behaviors["clicks"] = [(end - k * 7, f"page_{k % 9}") for k in range(n)][::-1]
+  behaviors["plays"] = [(end - k * 11, {"cmd": "sleep.scene.kyoto_forest", "event": "play"}) for k in range(n)][::-1]
+  return behaviors
+
+
+def _series(values: list, capacity: int):
+  try:
+    return BehaviorSeries.from_pairs(values, capacity=capacity)
+  except ValueError:
+    return EventSeries(values, capacity=capacity)
+
+
+def _legacy_merge(old: dict, new: dict, max_len: int) -> dict:
+  for behavior_type, values in new.items():
+    values.sort(key=lambda x: x[0])
+    if behavior_type in old and isinstance(values, list):
+      old[behavior_type].sort(key=lambda x: x[0])
+      old[behavior_type] = util.merge_two_sorted_dedup(old[behavior_type], values)
+    else:
+      old[behavior_type] = values
+    if len(old[behavior_type]) > max_len:
+      old[behavior_type] = old[behavior_type][-max_len:]
+  return old
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--samples", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+  parser.add_argument("--batch", type=int, default=60)
+  parser.add_argument("--rounds", type=int, default=10)
+  args = parser.parse_args()
+
+  print(f"{'samples':>8} {'legacy ms':>10} {'one-pass ms':>12} {'speedup':>8}")
+  for n in args.samples:
+    rng = random.Random(n)
+    now = int(time.time())
+    old_raw = _behaviors(rng, now - args.batch * 5, n)
+    new_raw = _behaviors(rng, now + args.batch * 5, args.batch * 2)
+    old = {name: _series(values, n) for name, values in old_raw.items()}
+    new = {name: _series(values, n) for name, values in new_raw.items()}
+
+    legacy_ms = _timeit(lambda: _legacy_merge(copy.copy(old_raw), {k: list(v) for k, v in new_raw.items()}, n), args.rounds)
+
+    one_pass_ms = _timeit(lambda: merge_behavior_groups(old, new, n), args.rounds)
+
+    expected = _legacy_merge(copy.copy(old_raw), {k: list(v) for k, v in new_raw.items()}, n)
+    merged = merge_behavior_groups(old, new, n)
+    for name, values in expected.items():
+      got = merged[name].to_pairs() if isinstance(merged[name], BehaviorSeries) else merged[name]
+      assert [tuple(v) for v in got] == [tuple(v) for v in values], name
+    print(f"{n:>8} {legacy_ms:>10.3f} {one_pass_ms:>12.3f} {legacy_ms / one_pass_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,64 @@
+"""
+Cost and footprint of folding behavior pushes into minute/hour/day rollups.
+
+Replays a device pushing one heart_rate batch every --push-sec seconds
+(5 s sampling) for --days days through fold_behavior_rollups + the raw
+merge, as _merge_update does. Reports the per-push fold and merge time,
+the samples the profile still describes (raw ring vs rollups), and the
+packed size of the behaviors and rollups parts.
+
+Usage (from the repo root):
+    python -m tool.bench_behavior_rollup
+    python -m tool.bench_behavior_rollup --days 60 --push-sec 300
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from common.rollup import DEFAULT_RETENTION, fold_behavior_rollups
+from common.series import PACKED_CONTEXT, BehaviorSeries, merge_behavior_groups
+from user_profile import UserProfile
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--days", type=int, default=30)
+  parser.add_argument("--push-sec", type=int, default=600, help="seconds of samples per push")
+  parser.add_argument("--capacity", type=int, default=100, help="raw samples kept per type")
+  args = parser.parse_args()
+
+  rng = np.random.default_rng(0)
+  t0 = 1_700_000_000
+  per_push = args.push_sec // 5
+  pushes = args.days * 86400 // args.push_sec
+  profile = UserProfile()
+  fold_sec = merge_sec = 0.0
+  for k in range(pushes):
+    ts = t0 + k * args.push_sec + np.arange(per_push, dtype=np.int64) * 5
+    new = {"heart_rate": BehaviorSeries(ts, rng.integers(50, 110, per_push), True, per_push)}
+    start = time.perf_counter()
+    fold_behavior_rollups(profile.behavior_rollups, profile.behaviors, new, DEFAULT_RETENTION)
+    mid = time.perf_counter()
+    old = profile.behaviors.get("heart_rate")
+    if not (isinstance(old, BehaviorSeries) and old.extend(new["heart_rate"])):
+      profile.behaviors.update(merge_behavior_groups(profile.behaviors, new, args.capacity))
+    end = time.perf_counter()
+    fold_sec += mid - start
+    merge_sec += end - mid
+
+  rollup = profile.behavior_rollups["heart_rate"]
+  raw = profile.behaviors["heart_rate"]
+  data = profile.model_dump(mode="json", include={"behaviors", "behavior_rollups"}, context=PACKED_CONTEXT)
+  print(f"pushes={pushes} samples/push={per_push} total samples={pushes * per_push}")
+  print(f"fold us/push={fold_sec / pushes * 1e6:.1f}  raw merge us/push={merge_sec / pushes * 1e6:.1f}")
+  print(f"raw ring: {len(raw)} samples covering {(raw.ts[-1] - raw.ts[0]) / 60:.0f} min")
+  for name, level in rollup.levels.items():
+    span = (level.start[-1] - level.start[0] + level.step) / 3600
+    print(f"{name:>7} rollup: {len(level):>4} buckets covering {span:>7.1f} h, {int(level.count.sum())} samples")
+  print(f"packed bytes: behaviors={len(json.dumps(data['behaviors']))} rollups={len(json.dumps(data['behavior_rollups']))}")
+
+
+if __name__ == "__main__":
+  main()
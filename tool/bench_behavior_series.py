@@ -0,0 +1,93 @@
+"""
+List-of-tuples behavior samples vs common.series.BehaviorSeries.
+
+For each series length reports the memory held by one heart_rate series
+(the ring buffer keeps a mirrored copy, so it holds 2x the sample bytes),
+the cost of merging a batch of new samples into it (sort +
+merge_two_sorted_dedup vs BehaviorSeries.merge), and the stored size and
+decode+validate time of the json list form vs the packed form.
+
+Usage (from the repo root):
+    python -m tool.bench_behavior_series
+    python -m tool.bench_behavior_series --samples 100 10000 100000 --rounds 50
+"""
+import argparse
+import json
+import random
+import time
+import tracemalloc
+
+from typing import Any, List, Tuple
+
+from pydantic import TypeAdapter
+
+from common import util
+from common.series import BehaviorSeries, PACKED_CONTEXT
+from user_profile import UserProfile
+
+
+def _timeit(fn, rounds: int) -> float:
+  fn()
+  t0 = time.perf_counter()
+  for _ in range(rounds):
+    fn()
+  return (time.perf_counter() - t0) / rounds * 1000
+
+
+def _held_bytes(build) -> int:
+  tracemalloc.start()
+  obj = build()
+  held, _ = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  del obj
+  return held
+
+
+def _pairs(rng: random.Random, start: int, n: int) -> list:
+  return [(start + k * 5, rng.randint(50, 90)) for k in range(n)]
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--samples", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+  parser.add_argument("--batch", type=int, default=60, help="new samples merged per update")
+  parser.add_argument("--rounds", type=int, default=20)
+  args = parser.parse_args()
+
+  print(f"{'samples':>8} {'list KiB':>9} {'series KiB':>11} {'list merge ms':>14} {'series merge ms':>16}"
+        f" {'json KiB':>9} {'packed KiB':>11} {'json load ms':>13} {'packed load ms':>15}")
+  for n in args.samples:
+    rng = random.Random(n)
+    now = int(time.time())
+    old = _pairs(rng, now - n * 5, n)
+    new = _pairs(rng, now - args.batch * 2 * 5, args.batch * 2)[::2]
+
+    # what a validated series holds after loading it from its stored json
+    raw = json.dumps(old)
+    pairs_adapter = TypeAdapter(List[Tuple[int, Any]])
+    list_kib = _held_bytes(lambda: pairs_adapter.validate_python(json.loads(raw))) / 1024
+    series = BehaviorSeries.from_pairs(old, capacity=n)
+    series_kib = _held_bytes(lambda: BehaviorSeries.from_pairs(json.loads(raw), capacity=n)) / 1024
+
+    def _list_merge():
+      a, b = list(old), list(new)
+      b.sort(key=lambda x: x[0])
+      a.sort(key=lambda x: x[0])
+      return util.merge_two_sorted_dedup(a, b)[-n:]
+    batch = BehaviorSeries.from_pairs(new, capacity=n)
+    list_ms = _timeit(_list_merge, args.rounds)
+    series_ms = _timeit(lambda: series.merge(batch, n), args.rounds)
+
+    profile = UserProfile(behaviors={"heart_rate": series})
+    as_json = json.dumps(profile.model_dump(mode="json", include={"behaviors"}))
+    as_packed = json.dumps(profile.model_dump(mode="json", include={"behaviors"}, context=PACKED_CONTEXT))
+    legacy = json.dumps({"behaviors": {"heart_rate": old}})
+    json_load = _timeit(lambda: pairs_adapter.validate_python(json.loads(legacy)["behaviors"]["heart_rate"]), args.rounds)
+    packed_load = _timeit(lambda: BehaviorSeries.unpack(json.loads(as_packed)["behaviors"]["heart_rate"]), args.rounds)
+    assert BehaviorSeries.unpack(json.loads(as_packed)["behaviors"]["heart_rate"]) == series
+    print(f"{n:>8} {list_kib:>9.1f} {series_kib:>11.1f} {list_ms:>14.3f} {series_ms:>16.3f}"
+          f" {len(as_json) / 1024:>9.1f} {len(as_packed) / 1024:>11.1f} {json_load:>13.3f} {packed_load:>15.3f}")
+
+
+if __name__ == "__main__":
+  main()
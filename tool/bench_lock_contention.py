@@ -0,0 +1,124 @@
+"""
+Lock contention benchmark for UserProfileServ.
+
+Runs 32 concurrent update_profile calls (with a simulated slow LLM
+recommendation) and measures query_profile latency for *other* uids at the
+same time. The run is repeated with one shared RLock for every uid, which is
+how UserProfileServ used to lock, so both numbers can be compared side by side.
+
+Usage (from the repo root):
+    python -m tool.bench_lock_contention
+    python -m tool.bench_lock_contention --updaters 32 --llm-ms 50 --queries 200
+"""
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+os.environ.setdefault("RUN_DIR", tempfile.mkdtemp(prefix="bench_lock_"))
+
+import user_server  # noqa: E402
+from config import Config  # noqa: E402
+from user_profile import UserProfile  # noqa: E402
+
+
+class _GlobalLock:
+  """The old behaviour: one RLock shared by every uid."""
+
+  def __init__(self):
+    self._lock = threading.RLock()
+
+  @contextmanager
+  def __call__(self, uid: str):
+    with self._lock:
+      yield
+
+
+def _fake_reco(llm_ms: int):
+  def _generate(profile, *args, **kwargs):
+    time.sleep(llm_ms / 1000.0)
+    return []
+  return _generate
+
+
+def _percentile(values, pct):
+  ordered = sorted(values)
+  idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+  return ordered[idx]
+
+
+def _sample_profile(i: int) -> UserProfile:
+  now = int(time.time())
+  heart_rate = [(now - k * 5, 60 + (k + i) % 20) for k in range(100)]
+  return UserProfile.model_validate({"behaviors": {"heart_rate": heart_rate}})
+
+
+def run(global_lock: bool, updaters: int, llm_ms: int, queries: int) -> dict:
+  serv = user_server.UserProfileServ()
+  if global_lock:
+    serv.locks = _GlobalLock()
+
+  reader_uids = [f"bench_reader_{i}" for i in range(64)]
+  for i, uid in enumerate(reader_uids):
+    serv.save_profile(uid, _sample_profile(i))
+  writer_uids = [f"bench_writer_{i}" for i in range(updaters)]
+  for i, uid in enumerate(writer_uids):
+    serv.save_profile(uid, _sample_profile(i))
+
+  stop = threading.Event()
+
+  def _writer(uid: str, i: int):
+    while not stop.is_set():
+      serv.update_profile(uid, _sample_profile(i), skip_sleep_scenarios_reco_update=False)
+
+  threads = [threading.Thread(target=_writer, args=(uid, i), daemon=True) for i, uid in enumerate(writer_uids)]
+  for t in threads:
+    t.start()
+  time.sleep(llm_ms / 1000.0)
+
+  latencies = []
+  for k in range(queries):
+    uid = reader_uids[k % len(reader_uids)]
+    t0 = time.perf_counter()
+    profile = serv.get_profile(uid)
+    profile.model_dump()
+    latencies.append((time.perf_counter() - t0) * 1000)
+
+  stop.set()
+  for t in threads:
+    t.join()
+  serv.close()
+  return {
+    "p50_ms": statistics.median(latencies),
+    "p99_ms": _percentile(latencies, 99),
+    "max_ms": max(latencies),
+  }
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--updaters", type=int, default=32)
+  parser.add_argument("--llm-ms", type=int, default=50, help="simulated LLM recommendation latency")
+  parser.add_argument("--queries", type=int, default=200)
+  args = parser.parse_args()
+  logging.getLogger().setLevel(logging.WARNING)
+
+  fake = _fake_reco(args.llm_ms)
+  user_server.RecommendationEngine.generate = staticmethod(fake)
+  user_server.RecommendationEngine.generate_sop_reco = staticmethod(fake)
+
+  print(f"{args.updaters} concurrent update_profile, llm={args.llm_ms}ms, {args.queries} query_profile calls")
+  for global_lock in (True, False):
+    label = "global lock" if global_lock else "per-uid lock"
+    Config.DB_PATH = f"data/bench_lock_db_{'global' if global_lock else 'uid'}"
+    os.makedirs(os.path.join(user_server.run_dir, "data"), exist_ok=True)
+    res = run(global_lock, args.updaters, args.llm_ms, args.queries)
+    print(f"{label:>12}: p50={res['p50_ms']:.3f}ms p99={res['p99_ms']:.3f}ms max={res['max_ms']:.3f}ms")
+
+
+if __name__ == "__main__":
+  main()
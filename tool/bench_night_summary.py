@@ -0,0 +1,76 @@
+"""
+SleepResult.sequence_summaries: per-access rescans vs the stored NightSummary.
+
+The old property walked sleep_status seven times on every access; the
+analysis builders and the LLM context read it several times per request.
+NightSummary is computed once, with one bincount pass, when the night is
+validated, and is persisted with it. Reports the cost of one access either
+way, the one-off cost of computing the summary, and the cost of validating
+a month of stored nights with and without a persisted summary.
+
+Usage (from the repo root):
+    python -m tool.bench_night_summary
+    python -m tool.bench_night_summary --nights 30 --rounds 2000
+"""
+import argparse
+import random
+import time
+
+from tool.bench_profiles import _night
+from user_profile import STORED_CONTEXT, NightSummary, SleepResult
+
+
+def _rescan(result: SleepResult) -> dict:
+  """The pre-NightSummary property body."""
+  status = result.sleep_status
+  awake_types = {}
+  for seq in status:
+    if seq.sleep_type == "awake":
+      awake_types[seq.sleep_type] = awake_types.get(seq.sleep_type, 0) + 1
+  return {
+    "rem_sleep_duration": sum(seq.duration for seq in status if seq.sleep_type == "rem"),
+    "core_sleep_duration": sum(seq.duration for seq in status if seq.sleep_type == "core"),
+    "deep_sleep_duration": sum(seq.duration for seq in status if seq.sleep_type == "deep"),
+    "night_awake_duration": sum(seq.duration for seq in status if seq.sleep_type == "awake"),
+    "night_awake_count": sum(1 for seq in status if seq.sleep_type == "awake"),
+    "night_awake_type": max(awake_types, key=awake_types.get) if awake_types else None,
+    "time_in_bed": sum(seq.duration for seq in status),
+  }
+
+
+def _us(fn, rounds: int) -> float:
+  fn()
+  t0 = time.perf_counter()
+  for _ in range(rounds):
+    fn()
+  return (time.perf_counter() - t0) / rounds * 1e6
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--nights", type=int, default=30)
+  parser.add_argument("--rounds", type=int, default=2000)
+  args = parser.parse_args()
+
+  rng = random.Random(0)
+  raw = [_night(rng, 1_700_000_000 + k * 86400) for k in range(args.nights)]
+  nights = [SleepResult.model_validate(night) for night in raw]
+  for night in nights:
+    expected, got = _rescan(night), night.sequence_summaries
+    assert expected.keys() == got.keys()
+    assert all(abs(expected[k] - got[k]) < 1e-6 if isinstance(got[k], float) else expected[k] == got[k] for k in got)
+
+  night = nights[-1]
+  stored = [n.model_dump(mode="json") for n in nights]
+  print(f"segments/night={len(night.sleep_status)}")
+  print(f"sequence_summaries access: rescan {_us(lambda: _rescan(night), args.rounds):.2f} us,"
+        f" stored {_us(lambda: night.sequence_summaries, args.rounds):.2f} us")
+  print(f"NightSummary.from_elements (once per night): {_us(lambda: NightSummary.from_elements(night.sleep_status), args.rounds):.2f} us")
+  rounds = max(1, args.rounds // 20)
+  legacy_ms = _us(lambda: [SleepResult.model_validate(n) for n in raw], rounds) / 1000
+  stored_ms = _us(lambda: [SleepResult.model_validate(n, context=STORED_CONTEXT) for n in stored], rounds) / 1000
+  print(f"validate {args.nights} nights: without summary (recompute) {legacy_ms:.3f} ms, with stored summary {stored_ms:.3f} ms")
+
+
+if __name__ == "__main__":
+  main()
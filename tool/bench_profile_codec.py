@@ -0,0 +1,56 @@
+"""
+Encode/decode micro-benchmark: legacy json.dumps records vs db.profile_codec.
+
+Usage (from the repo root):
+    python -m tool.bench_profile_codec
+    python -m tool.bench_profile_codec --nights 7 30 90 --rounds 200
+"""
+import argparse
+import json
+import time
+
+from config import Config
+from db import profile_codec
+from tool.bench_profiles import make_profile_data
+from user_profile import UserProfile
+
+
+def _timeit(fn, rounds: int) -> float:
+  fn()
+  t0 = time.perf_counter()
+  for _ in range(rounds):
+    fn()
+  return (time.perf_counter() - t0) / rounds * 1000
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--nights", type=int, nargs="+", default=[7, 30, 90])
+  parser.add_argument("--rounds", type=int, default=200)
+  args = parser.parse_args()
+
+  print(f"orjson={'yes' if profile_codec.orjson else 'no'} compress_min_bytes={Config.PROFILE_CODEC_COMPRESS_MIN_BYTES}")
+  print(f"{'nights':>6} {'format':>8} {'bytes':>9} {'encode ms':>10} {'decode ms':>10} {'decode+validate ms':>19}")
+  for nights in args.nights:
+    data = make_profile_data(seed=nights, nights=nights)
+    legacy = json.dumps(data).encode("utf-8")
+    binary = profile_codec.encode_profile(data, Config.PROFILE_CODEC_COMPRESS_MIN_BYTES)
+    assert profile_codec.decode_profile(binary) == json.loads(legacy)
+
+    rows = [
+      ("json", legacy,
+       lambda: json.dumps(data).encode("utf-8"),
+       lambda: json.loads(legacy.decode("utf-8"))),
+      ("v1", binary,
+       lambda: profile_codec.encode_profile(data, Config.PROFILE_CODEC_COMPRESS_MIN_BYTES),
+       lambda: profile_codec.decode_profile(binary)),
+    ]
+    for name, raw, enc, dec in rows:
+      enc_ms = _timeit(enc, args.rounds)
+      dec_ms = _timeit(dec, args.rounds)
+      full_ms = _timeit(lambda: UserProfile.model_validate(dec()), args.rounds)
+      print(f"{nights:>6} {name:>8} {len(raw):>9} {enc_ms:>10.3f} {dec_ms:>10.3f} {full_ms:>19.3f}")
+
+
+if __name__ == "__main__":
+  main()
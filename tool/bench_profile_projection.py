@@ -0,0 +1,87 @@
+"""
+Full get_profile vs field projection for the /analysis builders.
+
+For each analysis request type, loads the profile either whole or with the
+fields its module producers declare (UserServer._analysis_fields), builds
+the response, and reports latency plus the peak and retained allocation of the
+profile read. The profile cache is disabled so every call pays for decoding
+and validation. --modules limits every request to those modules, the way
+the app asks for a single card.
+
+Usage (from the repo root):
+    python -m tool.bench_profile_projection
+    python -m tool.bench_profile_projection --nights 90 --samples 100 --rounds 100
+    python -m tool.bench_profile_projection --modules score_summary,overall_score
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault("RUN_DIR", tempfile.mkdtemp(prefix="bench_proj_"))
+
+from config import Config  # noqa: E402
+
+Config.USER_PROFILE_STORAGE_MODE = "txt_json"
+Config.PROFILE_CACHE_MAX_BYTES = 0
+
+import user_server  # noqa: E402
+from tool.bench_profiles import make_profile_data  # noqa: E402
+from analysis_modules import ANALYSIS_MODULES  # noqa: E402
+from user_profile import AnalysisRequest, UserProfile  # noqa: E402
+
+
+def _latency(fn, rounds: int) -> float:
+  fn()
+  t0 = time.perf_counter()
+  for _ in range(rounds):
+    fn()
+  return (time.perf_counter() - t0) / rounds * 1000
+
+
+def _allocation(fn) -> tuple[int, int]:
+  """(peak, retained) bytes allocated by one call; retained = still held by the result."""
+  tracemalloc.start()
+  result = fn()
+  retained, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  del result
+  return peak, retained
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--nights", type=int, default=90)
+  parser.add_argument("--samples", type=int, default=100)
+  parser.add_argument("--rounds", type=int, default=100)
+  parser.add_argument("--modules", default="", help="comma-separated modules to request (default: all)")
+  args = parser.parse_args()
+  logging.getLogger().setLevel(logging.WARNING)
+
+  server = user_server.UserServer()
+  serv = server.user_serv
+  uid = "bench_projection_uid"
+  serv.save_profile(uid, UserProfile.model_validate(make_profile_data(nights=args.nights, samples=args.samples)))
+
+  print(f"nights={args.nights} samples/behavior={args.samples}")
+  print(f"{'request_type':>22} {'full ms':>9} {'proj ms':>9} {'peak KiB full/proj':>20} {'retained KiB full/proj':>24}")
+  for request_type in ANALYSIS_MODULES.request_types():
+    req = AnalysisRequest.model_validate({
+      "request_type": request_type, "timestamp": int(time.time()),
+      "data": {"uid": uid, "modules": [m for m in args.modules.split(",") if m]},
+    })
+    fields = server._analysis_fields(req)
+    full_ms = _latency(lambda: server._build_analysis_data(req, serv.get_profile(uid)), args.rounds)
+    proj_ms = _latency(lambda: server._build_analysis_data(req, serv.get_profile(uid, fields=fields)), args.rounds)
+    full_peak, full_kept = _allocation(lambda: serv.get_profile(uid))
+    proj_peak, proj_kept = _allocation(lambda: serv.get_profile(uid, fields=fields))
+    peak = f"{full_peak / 1024:.0f}/{proj_peak / 1024:.0f}"
+    kept = f"{full_kept / 1024:.0f}/{proj_kept / 1024:.0f}"
+    print(f"{request_type:>22} {full_ms:>9.3f} {proj_ms:>9.3f} {peak:>20} {kept:>24}")
+  server.close()
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,69 @@
+"""
+Realistic UserProfile fixtures shared by the tool/bench_*.py scripts.
+"""
+import base64
+import random
+import time
+
+from user_profile import UserProfile
+
+_SCENES = [
+  "sleep.scene.cocos_island_moonlight", "sleep.scene.amalfi_breeze",
+  "sleep.scene.kyoto_forest", "sleep.scene.sedona_red_rock_peace",
+]
+_STAGES = ["awake", "core", "deep", "core", "rem"]
+
+
+def _series(rng: random.Random, now: int, n: int, step: int, lo: float, hi: float, digits: int = 0):
+  return [(now - k * step, round(rng.uniform(lo, hi), digits) if digits else int(rng.uniform(lo, hi))) for k in range(n)][::-1]
+
+
+def _night(rng: random.Random, start: int) -> dict:
+  status = []
+  t = start
+  for k in range(rng.randint(30, 45)):
+    duration = round(rng.uniform(3, 25), 1)
+    status.append({"start_time": t, "duration": duration, "sleep_type": _STAGES[k % len(_STAGES)]})
+    t += int(duration * 60)
+  return {
+    "timestamp": t,
+    "sleep_quality": round(rng.uniform(55, 95), 1),
+    "soe": round(rng.uniform(60, 95), 1),
+    "onset": round(rng.uniform(5, 30), 1),
+    "first_sleep_time": "23:%02d" % rng.randint(0, 59),
+    "hr_before_sleep": round(rng.uniform(58, 75), 1),
+    "rr_before_sleep": round(rng.uniform(12, 17), 1),
+    "hrv": round(rng.uniform(20, 60), 1),
+    "respiratory_var": round(rng.uniform(5, 30), 1),
+    "avg_heart_rate": round(rng.uniform(52, 68), 1),
+    "avg_respiratory": round(rng.uniform(12, 16), 1),
+    "scene_preference": [[_SCENES[0], 0.7]],
+    "sleep_status": status,
+  }
+
+
+def make_profile_data(seed: int = 0, nights: int = 30, samples: int = 100, avatar_bytes: int = 24 * 1024) -> dict:
+  """A json-ready profile dict with full behavior series, a month of nights and an avatar."""
+  rng = random.Random(seed)
+  now = int(time.time())
+  profile = UserProfile().model_dump(mode="json")
+  profile["uid_emb"] = [round(rng.uniform(-1, 1), 6) for _ in range(64)]
+  profile["long_term_profile"] = [["stress_index", 0.4], ["chronotype", 0.7]]
+  behaviors = profile["behaviors"]
+  behaviors["heart_rate"] = _series(rng, now, samples, 5, 50, 90)
+  behaviors["blood_oxygen"] = _series(rng, now, samples, 60, 94, 99)
+  behaviors["resting_heart_rate"] = _series(rng, now, samples, 3600, 50, 65)
+  behaviors["heart_rate_variability_sdnn"] = _series(rng, now, samples, 300, 20, 70, 2)
+  behaviors["respiratory_rate"] = _series(rng, now, samples, 30, 11, 18, 1)
+  behaviors["sleeping_wrist_temperature"] = _series(rng, now, samples, 600, 35.5, 36.8, 2)
+  behaviors["clicks"] = [[now - k * 90, f"page_{k % 7}"] for k in range(samples)][::-1]
+  behaviors["plays"] = [[now - k * 86400, {"cmd": _SCENES[k % len(_SCENES)], "event": "sop_start"}] for k in range(20)][::-1]
+  for k, scene in enumerate(_SCENES):
+    profile["mindora_record"][scene] = [[now - (j * 4 + k) * 86400, {"cmd": scene, "event": "sop_start"}] for j in range(10)][::-1]
+  profile["sleep_data"] = [_night(rng, now - (nights - n) * 86400) for n in range(nights)]
+  profile["profile"] = {
+    "nickname": "bench",
+    "avatar_base64": base64.b64encode(rng.randbytes(avatar_bytes)).decode("ascii"),
+    "avatar_mime_type": "image/jpeg",
+  }
+  return profile
@@ -0,0 +1,79 @@
+"""
+Recommendation fingerprint cache: LLM calls made vs saved over an update stream.
+
+Replaces the LLM with a stub, then replays --updates updates for each of
+--users profiles. Each update is drawn like production traffic: mostly
+behavior samples and scene plays that leave the bucketed features alone,
+sometimes a long_term_profile change (--ltp-rate). Both recommendation
+kinds are regenerated after every update, as with the skip flag off.
+Reports the RecoCache stats and the cost of one fingerprint.
+
+Usage (from the repo root):
+    python -m tool.bench_reco_cache
+    python -m tool.bench_reco_cache --users 200 --updates 20 --ltp-rate 0.1
+"""
+import argparse
+import json
+import logging
+import random
+import time
+import types
+
+import sleep_reco
+from sleep_reco import RECO_SOP, RecommendationEngine, reco_fingerprint
+from tool.bench_profiles import make_profile_data
+from user_profile import UserProfile
+
+
+class _StubModel:
+  def invoke(self, messages):
+    prompt = messages[-1].content
+    if "Standard SOP process candidates" in prompt:
+      cmds = [sleep_reco._extract_sop_cmd_name(item) for item in sleep_reco._load_sop_candidate_scenarios()[:3]]
+      payload = [{"stages": [{"cmd_name": cmd}]} for cmd in cmds]
+    else:
+      payload = sleep_reco._SCENARIO_CANDIDATES[:2]
+    return types.SimpleNamespace(content=json.dumps({"scenarios": payload}))
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--users", type=int, default=50)
+  parser.add_argument("--updates", type=int, default=20, help="updates per user")
+  parser.add_argument("--ltp-rate", type=float, default=0.1, help="share of updates that move long_term_profile")
+  parser.add_argument("--seed", type=int, default=7)
+  args = parser.parse_args()
+  logging.getLogger().setLevel(logging.ERROR)
+  rng = random.Random(args.seed)
+  sleep_reco._get_model = lambda: _StubModel()
+  sleep_reco._append_llm_trace = lambda *a, **k: None
+
+  start = time.perf_counter()
+  for user in range(args.users):
+    profile = UserProfile.model_validate(make_profile_data(nights=30, seed=user))
+    for _ in range(args.updates):
+      if rng.random() < args.ltp_rate:
+        ltp = dict(profile.long_term_profile)
+        ltp["stress_index"] = round(rng.random(), 2)
+        profile.long_term_profile = list(ltp.items())
+      RecommendationEngine.generate(profile)
+      RecommendationEngine.generate_sop_reco(profile)
+  wall = time.perf_counter() - start
+
+  profile = UserProfile.model_validate(make_profile_data(nights=30))
+  rounds = 500
+  fp_start = time.perf_counter()
+  for _ in range(rounds):
+    reco_fingerprint(profile, RECO_SOP)
+  fp_us = (time.perf_counter() - fp_start) / rounds * 1e6
+
+  stats = RecommendationEngine.cache.stats()
+  requests = 2 * args.users * args.updates
+  print(f"reco requests={requests} wall={wall:.2f}s fingerprint={fp_us:.1f}us")
+  print(f"cache={stats}")
+  print(f"llm calls without cache={requests} with cache={stats['llm_calls']} "
+        f"({stats['llm_calls_saved'] / requests:.0%} saved)")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,74 @@
+"""
+Reco rerun gate: how many LLM reruns a month of update traffic triggers.
+
+Replays --days days for each of --users profiles: --updates-per-day
+updates spread over each day (vitals pushes that leave the reco features
+alone), one new night every morning and a SOP play every other evening.
+Before the gate, every update regenerated recommendations; here each
+update asks RecoGate (Config.RECO_RERUN_RULES) and a rerun resets the
+baseline. Reports reruns vs updates, the reasons and decide() cost.
+
+Usage (from the repo root):
+    python -m tool.bench_reco_gate
+    python -m tool.bench_reco_gate --users 20 --days 30 --updates-per-day 48
+"""
+import argparse
+import random
+import time
+
+from config import Config
+import sleep_reco
+from reco_gate import RecoGate, snapshot
+from tool.bench_profiles import _night, make_profile_data
+from user_profile import SceneUsage, SleepResult, UserProfile
+
+
+def _replay(profile: UserProfile, gate: RecoGate, uid: str, days: int, updates_per_day: int, rng: random.Random):
+  now = int(time.time()) - days * 86400
+  profile.reco_baseline = snapshot(profile, now)
+  for day in range(days):
+    day_start = now + day * 86400
+    for k in range(updates_per_day):
+      t = day_start + k * 86400 // updates_per_day
+      if k == updates_per_day // 4:
+        night = SleepResult.model_validate(_night(rng, t - 8 * 3600))
+        profile.sleep_data.append(night)
+        profile.sleep_aggregates.add(night)
+      if day % 2 == 0 and k == updates_per_day - 2:
+        profile.scene_usage.setdefault("sleep.scene.kyoto_forest", SceneUsage()).record(t)
+      if gate.decide(uid, profile, t).rerun:
+        profile.reco_baseline = snapshot(profile, t)
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--users", type=int, default=10)
+  parser.add_argument("--days", type=int, default=30)
+  parser.add_argument("--updates-per-day", type=int, default=48)
+  parser.add_argument("--seed", type=int, default=7)
+  args = parser.parse_args()
+  rng = random.Random(args.seed)
+
+  gate = RecoGate(Config.RECO_RERUN_RULES, Config.RECO_RERUN_MAX_AGE_SEC)
+  start = time.perf_counter()
+  for user in range(args.users):
+    profile = UserProfile.model_validate(make_profile_data(seed=user, nights=60))
+    # keep the nights from before the replayed period, as of its first day
+    cutoff = int(time.time()) - args.days * 86400
+    profile.sleep_data = [night for night in profile.sleep_data if night.timestamp < cutoff]
+    profile.sleep_aggregates = type(profile.sleep_aggregates).from_nights(profile.sleep_data)
+    profile.sleep_scenarios_reco = sleep_reco.RecommendationEngine.local_scenarios(profile)
+    profile.standard_sop_reco = sleep_reco.RecommendationEngine.local_sop_reco(profile)
+    _replay(profile, gate, f"bench_gate_{user}", args.days, args.updates_per_day, rng)
+  wall = time.perf_counter() - start
+
+  stats = gate.stats()
+  updates = stats["decisions"]
+  print(f"updates={updates} reruns={stats['reruns']} (ungated: {updates}) "
+        f"reduction={updates / max(1, stats['reruns']):.1f}x decide={wall / max(1, updates) * 1e6:.1f}us")
+  print(f"by_reason={stats['by_reason']}")
+  print(f"reruns per user per day={stats['reruns'] / (args.users * args.days):.2f}")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,64 @@
+"""
+Recommendation prompt size and build time: pre-rendered prefix + budgeted profile vs the old f-string.
+
+The old builders pretty-printed the whole profile (raw behavior series,
+mindora_record, every night with its hypnogram) and re-rendered the
+knowledge base, topology and indented candidate JSON on every call; the
+legacy layout is rebuilt here for comparison. Reports characters,
+estimated tokens and per-call build time for profiles of --nights nights,
+and the PromptStats counters.
+
+Usage (from the repo root):
+    python -m tool.bench_reco_prompt
+    python -m tool.bench_reco_prompt --nights 90 --rounds 200
+"""
+import argparse
+import json
+import time
+
+import sleep_reco
+from tool.bench_profiles import make_profile_data
+from user_profile import UserProfile
+
+
+def _legacy_prompt(profile: UserProfile) -> str:
+  payload = profile.model_dump(mode="json", exclude_none=True)
+  if payload.get("profile", {}).get("avatar_base64"):
+    payload["profile"]["avatar_base64"] = "[omitted base64 image data]"
+  return "\n".join([
+    "User profile JSON:", json.dumps(payload, ensure_ascii=False, indent=2),
+    "Sleep intervention knowledge base:", sleep_reco._load_text(sleep_reco._KNOWLEDGE_BASE_PATH),
+    "Sleep strategy topology:", sleep_reco._load_text(sleep_reco._TOPOLOGY_PATH),
+    "Scenario candidates:", json.dumps(sleep_reco._SCENARIO_CANDIDATES, ensure_ascii=False, indent=2),
+    sleep_reco._SCENARIO_TASK,
+  ])
+
+
+def _per_call_ms(fn, rounds):
+  start = time.perf_counter()
+  for _ in range(rounds):
+    fn()
+  return (time.perf_counter() - start) / rounds * 1000
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--nights", type=int, nargs="+", default=[7, 30, 90])
+  parser.add_argument("--rounds", type=int, default=100)
+  args = parser.parse_args()
+
+  print(f"{'nights':>6} {'legacy chars':>13} {'legacy tok':>11} {'legacy ms':>10} "
+        f"{'new chars':>10} {'new tok':>8} {'new ms':>7}")
+  for nights in args.nights:
+    profile = UserProfile.model_validate(make_profile_data(nights=nights))
+    legacy = _legacy_prompt(profile)
+    prompt = sleep_reco._build_prompt(profile)
+    legacy_ms = _per_call_ms(lambda: _legacy_prompt(profile), args.rounds)
+    new_ms = _per_call_ms(lambda: sleep_reco._build_prompt(profile), args.rounds)
+    print(f"{nights:>6} {len(legacy):>13} {sleep_reco._estimate_tokens(legacy):>11} {legacy_ms:>10.2f} "
+          f"{len(prompt):>10} {sleep_reco._estimate_tokens(prompt):>8} {new_ms:>7.2f}")
+  print(f"prompt stats={sleep_reco.RecommendationEngine.prompt_stats.stats()}")
+
+
+if __name__ == "__main__":
+  main()
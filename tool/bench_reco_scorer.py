@@ -0,0 +1,67 @@
+"""
+Local recommendation scorer: latency and how recommendations spread over users.
+
+Scores --users fixture profiles (varied sleep means, stress_index and
+scene plays) with the scenario and SOP LocalScorers and reports the
+per-call cost of scores() and of the ranked, validated result, plus how
+often each candidate lands in the top slot.
+
+Usage (from the repo root):
+    python -m tool.bench_reco_scorer
+    python -m tool.bench_reco_scorer --users 500 --rounds 2000
+"""
+import argparse
+import random
+import time
+from collections import Counter
+
+from sleep_reco import RecommendationEngine, _scenario_scorer, _sop_scorer, _today
+from tool.bench_profiles import make_profile_data
+from user_profile import SceneUsage, UserProfile
+
+
+def _profile(seed: int) -> UserProfile:
+  rng = random.Random(seed)
+  data = make_profile_data(seed=seed, nights=30, samples=10, avatar_bytes=0)
+  data["long_term_profile"] = [["stress_index", round(rng.random(), 2)]]
+  for night in data["sleep_data"]:
+    night["soe"] = round(rng.uniform(60, 95), 1)
+    night["avg_heart_rate"] = round(rng.uniform(52, 76), 1)
+  profile = UserProfile.model_validate(data)
+  # replace the fixture's uniform play history with a few plays of random scenes
+  profile.scene_usage = {}
+  now = int(time.time())
+  for scene in rng.sample(list(profile.mindora_record), rng.randint(0, 3)):
+    usage = profile.scene_usage[scene] = SceneUsage()
+    for k in range(rng.randint(1, 12)):
+      usage.record(now - k * 86400)
+  return profile
+
+
+def _per_call_us(fn, rounds):
+  start = time.perf_counter()
+  for _ in range(rounds):
+    fn()
+  return (time.perf_counter() - start) / rounds * 1e6
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--users", type=int, default=200)
+  parser.add_argument("--rounds", type=int, default=1000)
+  args = parser.parse_args()
+
+  profiles = [_profile(seed) for seed in range(args.users)]
+  today = _today()
+  profile = profiles[0]
+  print(f"scenario scores()  {_per_call_us(lambda: _scenario_scorer().scores(profile, today), args.rounds):7.1f} us")
+  print(f"SOP scores()       {_per_call_us(lambda: _sop_scorer().scores(profile, today), args.rounds):7.1f} us")
+  print(f"local_scenarios()  {_per_call_us(lambda: RecommendationEngine.local_scenarios(profile), args.rounds):7.1f} us")
+  print(f"local_sop_reco()   {_per_call_us(lambda: RecommendationEngine.local_sop_reco(profile), args.rounds):7.1f} us")
+
+  top = Counter(RecommendationEngine.local_scenarios(p)[0].scenario_id for p in profiles)
+  print(f"top scenario over {args.users} users: {dict(top.most_common())}")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,109 @@
+"""
+update_profile latency with recommendations inline vs on the background pool.
+
+Replaces the LLM calls of RecommendationEngine with a --llm-ms sleep, then
+sends --updates updates for each of --users users from --clients threads,
+once with Config.RECO_WORKERS = 0 (recommendations regenerated inside the
+update, as before) and once with the debounced background pool. Reports
+update latency percentiles, LLM calls made and the worker stats.
+
+Usage (from the repo root):
+    python -m tool.bench_reco_worker
+    python -m tool.bench_reco_worker --llm-ms 500 --users 8 --updates 10 --debounce-sec 0.5
+"""
+import argparse
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("RUN_DIR", tempfile.mkdtemp(prefix="bench_reco_"))
+os.makedirs(os.path.join(os.environ["RUN_DIR"], "data"), exist_ok=True)
+
+from config import Config  # noqa: E402
+
+Config.USER_PROFILE_STORAGE_MODE = "txt_json"
+
+import sleep_reco  # noqa: E402
+import user_server  # noqa: E402
+from user_profile import UserProfile  # noqa: E402
+
+
+def _stub_llm(delay_sec: float, calls: list):
+  lock = threading.Lock()
+
+  def generate(profile):
+    with lock:
+      calls.append(1)
+    time.sleep(delay_sec)
+    return sleep_reco.RecommendationEngine.local_scenarios(profile)
+
+  def generate_sop_reco(profile, candidates=None):
+    with lock:
+      calls.append(1)
+    time.sleep(delay_sec)
+    return sleep_reco.RecommendationEngine.local_sop_reco(profile)
+
+  sleep_reco.RecommendationEngine.generate = staticmethod(generate)
+  sleep_reco.RecommendationEngine.generate_sop_reco = staticmethod(generate_sop_reco)
+
+
+def _run(args, workers: int) -> None:
+  Config.RECO_WORKERS = workers
+  Config.RECO_DEBOUNCE_SEC = args.debounce_sec
+  Config.RECO_MAX_DELAY_SEC = args.debounce_sec * 4
+  calls: list = []
+  _stub_llm(args.llm_ms / 1000, calls)
+  serv = user_server.UserProfileServ()
+  latencies = []
+  lock = threading.Lock()
+
+  def client(user: int):
+    uid = f"bench_reco_{workers}_{user}"
+    for k in range(args.updates):
+      payload = UserProfile.model_validate({"long_term_profile": [["stress_index", k / args.updates]]})
+      start = time.perf_counter()
+      serv.update_profile(uid, payload, False)
+      with lock:
+        latencies.append(time.perf_counter() - start)
+      time.sleep(args.gap_ms / 1000)
+
+  wall = time.perf_counter()
+  with ThreadPoolExecutor(args.clients) as pool:
+    list(pool.map(client, range(args.users)))
+  wall = time.perf_counter() - wall
+  stats = None
+  if serv.reco_worker is not None:
+    serv.reco_worker.wait_idle()
+    stats = serv.reco_worker.stats()
+  serv.close()
+
+  latencies.sort()
+  pct = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+  mode = "inline" if workers == 0 else f"pool({workers})"
+  print(f"{mode:>9}: updates={len(latencies)} wall={wall:.2f}s p50={pct(0.5):.1f}ms p99={pct(0.99):.1f}ms "
+        f"max={latencies[-1] * 1000:.1f}ms llm_calls={len(calls)}")
+  if stats:
+    print(f"{'':>9}  worker={stats}")
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--llm-ms", type=float, default=300, help="simulated latency of one LLM call")
+  parser.add_argument("--users", type=int, default=8)
+  parser.add_argument("--updates", type=int, default=5, help="updates per user")
+  parser.add_argument("--clients", type=int, default=8)
+  parser.add_argument("--gap-ms", type=float, default=50, help="pause between one user's updates")
+  parser.add_argument("--debounce-sec", type=float, default=0.5)
+  parser.add_argument("--workers", type=int, default=4)
+  args = parser.parse_args()
+  logging.getLogger().setLevel(logging.WARNING)
+
+  _run(args, 0)
+  _run(args, args.workers)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,71 @@
+"""
+Single-write cost of the txt_json storage mode as the user count grows.
+
+Compares the old behaviour (re-serialise every profile with indent=2 and
+rewrite user_profiles.txt on each save) with SegmentLogDB, which appends one
+record per save.
+
+Usage (from the repo root):
+    python -m tool.bench_segment_log
+    python -m tool.bench_segment_log --users 100 1000 10000 --writes 50
+"""
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from db.segment_log import SegmentLogDB
+from user_profile import UserProfile
+
+
+def _profile_data(i: int) -> dict:
+  now = int(time.time())
+  profile = UserProfile.model_validate({"behaviors": {
+    "heart_rate": [(now - k * 5, 60 + (k + i) % 20) for k in range(100)],
+    "blood_oxygen": [(now - k * 60, 97) for k in range(100)],
+  }})
+  return profile.model_dump(mode="json")
+
+
+def bench_full_rewrite(users: int, writes: int, workdir: Path) -> float:
+  path = workdir / "user_profiles.txt"
+  profiles = {f"uid_{i}": _profile_data(i) for i in range(users)}
+  t0 = time.perf_counter()
+  for k in range(writes):
+    profiles[f"uid_{k % users}"] = _profile_data(k)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(profiles, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp_path.replace(path)
+  return (time.perf_counter() - t0) / writes * 1000
+
+
+def bench_segment_log(users: int, writes: int, workdir: Path) -> float:
+  db = SegmentLogDB(workdir / "segments", compact_interval_sec=0)
+  for i in range(users):
+    db.put(f"uid_{i}".encode("utf-8"), json.dumps(_profile_data(i)).encode("utf-8"))
+  t0 = time.perf_counter()
+  for k in range(writes):
+    db.put(f"uid_{k % users}".encode("utf-8"), json.dumps(_profile_data(k)).encode("utf-8"))
+  elapsed = (time.perf_counter() - t0) / writes * 1000
+  db.close()
+  return elapsed
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--users", type=int, nargs="+", default=[100, 1000, 3000])
+  parser.add_argument("--writes", type=int, default=10)
+  args = parser.parse_args()
+
+  print(f"{'users':>8} {'full rewrite ms/write':>22} {'segment log ms/write':>22}")
+  for users in args.users:
+    with tempfile.TemporaryDirectory(prefix="bench_seg_") as tmp:
+      workdir = Path(tmp)
+      full = bench_full_rewrite(users, args.writes, workdir)
+      seg = bench_segment_log(users, args.writes, workdir)
+    print(f"{users:>8} {full:>22.3f} {seg:>22.3f}")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,73 @@
+"""
+Per-event cost of keeping a bounded, sorted series.
+
+Old path (what _update_mindora_record did): list.append + sort + slice back
+to capacity on every event. New path: EventSeries / BehaviorSeries ring
+buffers, which append in O(1) and insert late samples in O(capacity).
+
+Usage (from the repo root):
+    python -m tool.bench_series_append
+    python -m tool.bench_series_append --capacity 100 1000 --events 20000 --late 0.05
+"""
+import argparse
+import random
+import time
+
+from common.series import BehaviorSeries, EventSeries
+
+
+def _events(n: int, late: float, seed: int) -> list:
+  rng = random.Random(seed)
+  events, ts = [], 1_700_000_000
+  for _ in range(n):
+    ts += rng.randint(1, 30)
+    t = ts - rng.randint(1, 600) if rng.random() < late else ts
+    events.append((t, {"cmd": "sleep.scene.kyoto_forest", "event": "sop_start"}))
+  return events
+
+
+def _per_event_us(fn, events: list) -> float:
+  t0 = time.perf_counter()
+  fn(events)
+  return (time.perf_counter() - t0) / len(events) * 1e6
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--capacity", type=int, nargs="+", default=[100, 1000, 10000])
+  parser.add_argument("--events", type=int, default=20000)
+  parser.add_argument("--late", type=float, default=0.05, help="share of out-of-order events")
+  args = parser.parse_args()
+
+  print(f"{'capacity':>9} {'list+sort us':>13} {'EventSeries us':>15} {'BehaviorSeries us':>18}")
+  for capacity in args.capacity:
+    events = _events(args.events, args.late, capacity)
+
+    def _legacy(items):
+      record = []
+      for item in items:
+        record.append(item)
+        record.sort(key=lambda x: x[0])
+        if len(record) > capacity:
+          record[:] = record[-capacity:]
+      return record
+
+    def _event_ring(items):
+      record = EventSeries(capacity=capacity)
+      for item in items:
+        record.append(item)
+      return record
+
+    def _behavior_ring(items):
+      series = BehaviorSeries(capacity=capacity)
+      for ts, _ in items:
+        series.append(ts, 60)
+      return series
+
+    assert _event_ring(events).to_pairs() == _legacy(events)
+    print(f"{capacity:>9} {_per_event_us(_legacy, events):>13.2f} {_per_event_us(_event_ring, events):>15.2f}"
+          f" {_per_event_us(_behavior_ring, events):>18.2f}")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,67 @@
+"""
+Rolling 7/30/90-day sleep averages: running aggregates vs scanning sleep_data.
+
+Builds a profile with --nights nights, then compares reading the 7/30/90-day
+means of every AGGREGATE_METRICS value from SleepAggregates (today and the
+newest night's day) with recomputing them from the matching sleep_data
+tail, and reports the per-night cost of folding a new night in.
+
+Usage (from the repo root):
+    python -m tool.bench_sleep_aggregates
+    python -m tool.bench_sleep_aggregates --nights 400 --rounds 2000
+"""
+import argparse
+import time
+
+from tool.bench_profiles import make_profile_data
+from user_profile import AGGREGATE_METRICS, AGGREGATE_WINDOWS, SleepAggregates, UserProfile, _night_row, epoch_day
+
+
+def _scan(nights, days):
+  """The means the aggregates hold, recomputed from the nights of the last `days` days."""
+  newest = nights[-1].timestamp // 86400
+  rows = [_night_row(n) for n in nights if n.timestamp // 86400 > newest - days]
+  result = {"nights": len(rows)}
+  for k, name in enumerate(AGGREGATE_METRICS):
+    count = sum(r[2 + 2 * k] for r in rows)
+    result[name] = round(sum(r[1 + 2 * k] for r in rows) / count, 1) if count else None
+  return result
+
+
+def _per_call_us(fn, rounds):
+  start = time.perf_counter()
+  for _ in range(rounds):
+    fn()
+  return (time.perf_counter() - start) / rounds * 1e6
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--nights", type=int, default=120)
+  parser.add_argument("--rounds", type=int, default=1000)
+  args = parser.parse_args()
+
+  profile = UserProfile.model_validate(make_profile_data(nights=args.nights))
+  nights = profile.sleep_data
+  aggregates = profile.sleep_aggregates
+  today = epoch_day()
+
+  print(f"nights={len(nights)} daily rows={len(aggregates.daily)}")
+  print(f"{'window':>7} {'scan us':>9} {'agg us':>8} {'agg(today) us':>14}  match")
+  for days in AGGREGATE_WINDOWS:
+    scan_us = _per_call_us(lambda: _scan(nights, days), args.rounds)
+    agg_us = _per_call_us(lambda: aggregates.window(days), args.rounds)
+    today_us = _per_call_us(lambda: aggregates.window(days, today), args.rounds)
+    # running sums may land on the other side of a rounding boundary
+    expected, got = _scan(nights, days), aggregates.window(days)
+    match = all(abs(expected[k] - got[k]) <= 0.1 for k in expected if expected[k] is not None)
+    print(f"{days:>6}d {scan_us:>9.1f} {agg_us:>8.1f} {today_us:>14.1f}  {match}")
+
+  start = time.perf_counter()
+  rebuilt = SleepAggregates.from_nights(nights)
+  fold_us = (time.perf_counter() - start) / len(nights) * 1e6
+  print(f"fold us/night={fold_us:.1f}  rebuilt == maintained: {rebuilt.window(30) == aggregates.window(30)}")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,72 @@
+"""
+Latency of the hypnogram metrics behind /analysis.
+
+Times sleep_analytics.analyze_nights over N nights of one user (the month
+view) and over the latest night alone (the explore view), and checks the
+vectorized result against a straightforward per-night Python version.
+
+Usage (from the repo root):
+    python -m tool.bench_sleep_analytics
+    python -m tool.bench_sleep_analytics --nights 90 --rounds 500
+"""
+import argparse
+import random
+import time
+
+from sleep_analytics import analyze_nights
+from tool.bench_profiles import _night
+from user_profile import SleepResult
+
+_SLEEP = {"rem", "core", "deep"}
+
+
+def _reference(result: SleepResult) -> dict:
+  segs = sorted(result.sleep_status, key=lambda e: e.start_time)
+  sleep_idx = [i for i, e in enumerate(segs) if e.sleep_type in _SLEEP]
+  first, last = sleep_idx[0], sleep_idx[-1]
+  longest = run = 0.0
+  for e in segs:
+    run = run + e.duration if e.sleep_type in _SLEEP else 0.0
+    longest = max(longest, run)
+  return {
+    "time_in_bed": sum(e.duration for e in segs),
+    "total_sleep": sum(e.duration for e in segs if e.sleep_type in _SLEEP),
+    "latency": sum(e.duration for e in segs[:first]),
+    "waso": sum(e.duration for e in segs[first:last] if e.sleep_type == "awake"),
+    "awakenings": sum(1 for i in range(first, last) if segs[i].sleep_type == "awake" and segs[i - 1].sleep_type != "awake"),
+    "transitions": sum(1 for i in range(1, len(segs)) if segs[i].sleep_type != segs[i - 1].sleep_type),
+    "longest_sleep": longest,
+  }
+
+
+def _ms(fn, rounds: int) -> float:
+  fn()
+  t0 = time.perf_counter()
+  for _ in range(rounds):
+    fn()
+  return (time.perf_counter() - t0) / rounds * 1000
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--nights", type=int, default=30)
+  parser.add_argument("--rounds", type=int, default=500)
+  args = parser.parse_args()
+
+  rng = random.Random(0)
+  nights = [SleepResult.model_validate(_night(rng, 1_700_000_000 + k * 86400)) for k in range(args.nights)]
+  metrics = analyze_nights(nights)
+  for i, night in enumerate(nights):
+    got = metrics.night(i)
+    for name, expected in _reference(night).items():
+      assert abs(got[name] - round(expected, 1)) <= 0.051, (i, name, got[name], expected)
+
+  segments = sum(len(n.sleep_status) for n in nights)
+  print(f"nights={args.nights} segments={segments}")
+  print(f"analyze_nights, all nights:  {_ms(lambda: analyze_nights(nights), args.rounds):.3f} ms")
+  print(f"analyze_nights, last night:  {_ms(lambda: analyze_nights(nights[-1:]), args.rounds):.3f} ms")
+  print(f"per-night Python reference:  {_ms(lambda: [_reference(n) for n in nights], args.rounds):.3f} ms (subset of metrics)")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,101 @@
+"""
+Concurrent update_profile calls for one uid, with and without coalescing.
+
+Several devices push heart-rate batches for the same uid at once while the
+sleep recommendation is simulated as a slow call. With the per-uid mailbox
+the queued payloads are merged into one read-modify-write; the baseline
+runs get -> merge -> reco -> put once per payload, which is how
+update_profile used to behave.
+
+Usage (from the repo root):
+    python -m tool.bench_update_coalescing
+    python -m tool.bench_update_coalescing --devices 16 --pushes 10 --reco-ms 50
+"""
+import argparse
+import logging
+import os
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("RUN_DIR", tempfile.mkdtemp(prefix="bench_coalesce_"))
+
+import user_server  # noqa: E402
+from user_profile import UserProfile  # noqa: E402
+
+
+class _NoCoalescing:
+  """The old behaviour: every payload is its own round."""
+
+  def __init__(self):
+    self.items = self.rounds = 0
+
+  def submit(self, uid, item, process):
+    self.items += 1
+    self.rounds += 1
+    return process(uid, [item])
+
+  def stats(self) -> dict:
+    return {"items": self.items, "rounds": self.rounds}
+
+
+def _payload(device: int, push: int, start: int) -> UserProfile:
+  ts = start + push * 600 + device
+  heart_rate = [(ts + k * 5, 60 + (device + k) % 20) for k in range(20)]
+  return UserProfile.model_validate({"behaviors": {"heart_rate": heart_rate}})
+
+
+def run(coalesce: bool, devices: int, pushes: int, reco_ms: int) -> dict:
+  serv = user_server.UserProfileServ()
+  if not coalesce:
+    serv.mailbox = _NoCoalescing()
+  reco_calls = [0]
+
+  def _slow_reco(uid, new_profile, old_profile):
+    reco_calls[0] += 1
+    time.sleep(reco_ms / 1000.0)
+    return []
+  serv.calc_sleep_reco = _slow_reco
+
+  uid = "bench_coalesce_uid"
+  start = int(time.time())
+  serv.save_profile(uid, UserProfile())
+
+  def _device(d: int):
+    for p in range(pushes):
+      serv.update_profile(uid, _payload(d, p, start), skip_sleep_scenarios_reco_update=False)
+
+  threads = [threading.Thread(target=_device, args=(d,)) for d in range(devices)]
+  t0 = time.perf_counter()
+  for t in threads:
+    t.start()
+  for t in threads:
+    t.join()
+  elapsed = time.perf_counter() - t0
+
+  stats = serv.mailbox.stats()
+  writes = serv.writer.stats()["writes"]
+  samples = len(serv.get_profile(uid).behaviors["heart_rate"])
+  serv.close()
+  return {"elapsed": elapsed, "rounds": stats["rounds"], "reco": reco_calls[0], "writes": writes, "samples": samples}
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--devices", type=int, default=8)
+  parser.add_argument("--pushes", type=int, default=10)
+  parser.add_argument("--reco-ms", type=int, default=50)
+  args = parser.parse_args()
+  logging.disable(logging.WARNING)
+  os.makedirs(os.path.join(user_server.run_dir, "data"), exist_ok=True)
+
+  print(f"devices={args.devices} pushes/device={args.pushes} reco={args.reco_ms}ms")
+  print(f"{'mode':>12} {'total s':>8} {'rounds':>7} {'reco calls':>11} {'db writes':>10} {'hr samples':>11}")
+  for coalesce in (False, True):
+    r = run(coalesce, args.devices, args.pushes, args.reco_ms)
+    name = "mailbox" if coalesce else "per-payload"
+    print(f"{name:>12} {r['elapsed']:>8.2f} {r['rounds']:>7} {r['reco']:>11} {r['writes']:>10} {r['samples']:>11}")
+
+
+if __name__ == "__main__":
+  main()
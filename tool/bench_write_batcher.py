@@ -0,0 +1,86 @@
+"""
+Concurrent save throughput with and without group commit.
+
+N writer threads each save distinct uids (as update_profile does under the
+uid lock) through db.write_batcher.WriteBatcher. max_writes=1 is the old
+one-write-per-save path; larger values let concurrent saves share a batch.
+
+Usage (from the repo root):
+    python -m tool.bench_write_batcher
+    python -m tool.bench_write_batcher --backend segment --threads 32 --sync
+"""
+import argparse
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from db import profile_codec
+from db.segment_log import SegmentLogDB
+from db.write_batcher import WriteBatcher
+from tool.bench_profiles import make_profile_data
+
+
+def _open_db(backend: str, path: Path, sync: bool):
+  if backend == "leveldb":
+    import plyvel
+    return plyvel.DB(str(path), create_if_missing=True)
+  return SegmentLogDB(path, fsync=sync, compact_interval_sec=0)
+
+
+def bench(backend: str, threads: int, saves: int, window_ms: float, max_writes: int, sync: bool, value: bytes):
+  with tempfile.TemporaryDirectory(prefix="bench_wb_") as workdir:
+    db = _open_db(backend, Path(workdir) / "db", sync)
+    writer = WriteBatcher(db, window_ms, max_writes, sync=sync and backend == "leveldb")
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(t: int):
+      local = []
+      for k in range(saves):
+        t0 = time.perf_counter()
+        writer.write([(f"uid_{t}_{k % 8}".encode("utf-8"), value)])
+        local.append(time.perf_counter() - t0)
+      with lock:
+        latencies.extend(local)
+
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    t0 = time.perf_counter()
+    for w in workers:
+      w.start()
+    for w in workers:
+      w.join()
+    elapsed = time.perf_counter() - t0
+    stats = writer.stats()
+    writer.close()
+    db.close()
+
+  latencies.sort()
+  p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+  return threads * saves / elapsed, statistics.median(latencies) * 1000, p99, stats
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--backend", choices=["leveldb", "segment"], default="leveldb")
+  parser.add_argument("--threads", type=int, default=16)
+  parser.add_argument("--saves", type=int, default=200, help="saves per thread")
+  parser.add_argument("--sync", action="store_true", help="fsync every commit")
+  parser.add_argument("--configs", nargs="+", default=["0:1", "0:128", "1:128", "2:128"],
+                      help="window_ms:max_writes pairs; max_writes=1 disables batching")
+  args = parser.parse_args()
+
+  value = profile_codec.encode_profile({"behaviors": make_profile_data(nights=1)["behaviors"]})
+  print(f"backend={args.backend} threads={args.threads} saves/thread={args.saves} sync={args.sync} value={len(value)}B")
+  print(f"{'window_ms:max':>14} {'saves/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'avg fill':>9} {'avg commit ms':>14}")
+  for config in args.configs:
+    window_ms, max_writes = config.split(":")
+    rate, p50, p99, stats = bench(
+      args.backend, args.threads, args.saves, float(window_ms), int(max_writes), args.sync, value,
+    )
+    print(f"{config:>14} {rate:>10.0f} {p50:>8.3f} {p99:>8.3f} {stats['avg_fill']:>9} {stats['avg_commit_ms']:>14}")
+
+
+if __name__ == "__main__":
+  main()
@@ -1,13 +1,74 @@
+import asyncio
+import json
 import os
+import threading
+import weakref
 import requests
-from typing import List, Optional, Any
+from requests.adapters import HTTPAdapter
+from typing import List, Optional, Any, Tuple
 from pydantic import Field, model_validator
 
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
 # 导入LangChain核心抽象类和消息类型（遵循标准）
 from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, AIMessage
 from langchain_core.outputs import ChatResult, ChatGeneration
-from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+
+# 连接池：所有实例共用，避免每次调用都重新做 TCP+TLS 握手
+# sync calls share one requests.Session; async calls share one aiohttp session per event loop
+HTTP_POOL_MAXSIZE = int(os.getenv("ARK_HTTP_POOL_MAXSIZE", "32"))  # connections kept per host
+HTTP_KEEPALIVE_SEC = float(os.getenv("ARK_HTTP_KEEPALIVE_SEC", "60"))  # idle time before an async connection is closed
+HTTP_TIMEOUT_SEC = 30
+
+_http_session: Optional[requests.Session] = None
+_http_session_lock = threading.Lock()
+_async_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+
+
+def get_http_session() -> requests.Session:
+    """进程共享的 requests.Session（keep-alive 连接池）"""
+    global _http_session
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                session = requests.Session()
+                # one host; pool_maxsize bounds idle connections, pool_block=False lets bursts open extra ones;
+                # max_retries only re-tries connection errors (a pooled connection the server already closed), never a sent POST
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=1)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _http_session = session
+    return _http_session
+
+
+def get_async_http_session() -> "aiohttp.ClientSession":
+    """当前事件循环共享的 aiohttp.ClientSession（keep-alive 连接池）"""
+    if aiohttp is None:
+        raise ImportError("aiohttp is required for async VolcEngineArkChat calls")
+    loop = asyncio.get_running_loop()
+    session = _async_sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_MAXSIZE,
+            limit_per_host=HTTP_POOL_MAXSIZE,
+            keepalive_timeout=HTTP_KEEPALIVE_SEC,
+            ttl_dns_cache=300,
+        )
+        session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT_SEC))
+        _async_sessions[loop] = session
+    return session
+
+
+async def close_async_http_session(*_):
+    """关闭当前事件循环的共享 session（可直接挂到 aiohttp app.on_cleanup）"""
+    session = _async_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
 
 # 自定义火山方舟平台Chat类：继承LangChain标准BaseChatModel，适配ark_api_key
 class VolcEngineArkChat(BaseChatModel):
@@ -42,14 +103,8 @@ class VolcEngineArkChat(BaseChatModel):
             )
         return self
 
-    def _generate(
-        self,
-        messages: List[BaseMessage],
-        stop: Optional[List[str]] = None,
-        run_manager: Optional[CallbackManagerForLLMRun] = None,
-        **kwargs: Any,
-    ) -> ChatResult:
-        """核心方法：实现消息转换、接口调用、结果解析（LangChain标准）"""
+    def _build_request(self, messages: List[BaseMessage], stop: Optional[List[str]]) -> Tuple[dict, dict]:
+        """转换消息并构造请求体和请求头（同步/异步调用共用）"""
         # 1. 转换LangChain消息为方舟平台标准格式（兼容System/Human/AIMessage）
         ark_messages = []
         for msg in messages:
@@ -77,58 +132,84 @@ class VolcEngineArkChat(BaseChatModel):
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.ark_api_key}"
         }
+        return request_body, headers
+
+    @staticmethod
+    def _parse_answer(status: int, content: bytes, encoding: Optional[str]) -> ChatResult:
+        """解析方舟响应体为LangChain标准ChatResult"""
+        try:
+            result = json.loads(content.decode(encoding or "utf-8"))
+        except Exception:
+            # Ensure we decode with utf-8 fallback
+            content_text = content.decode(encoding or "utf-8", errors="replace")
+            raise RuntimeError(
+                f"Non-JSON response from API (status={status}): {content_text}"
+            )
+        # 提取模型回复内容
+        answer = result["choices"][0]["message"]["content"].strip()
+        chat_generation = ChatGeneration(message=AIMessage(content=answer))
+        return ChatResult(generations=[chat_generation])
+
+    @staticmethod
+    def _raise_call_error(e: Exception, status: Optional[int], content: Optional[bytes], encoding: Optional[str]):
+        # Provide richer error message to help diagnose encoding/header issues
+        import traceback
+
+        tb = traceback.format_exc()
+        resp_info = None
+        if status is not None:
+            resp_info = {
+                "status_code": status,
+                "body": (content or b"").decode(encoding or "utf-8", errors="replace"),
+            }
+        raise RuntimeError(
+            "调用火山方舟API失败: "
+            f"{type(e).__name__}: {repr(e)}; response={resp_info}; traceback={tb}"
+        ) from e
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        """核心方法：实现消息转换、接口调用、结果解析（LangChain标准）"""
+        request_body, headers = self._build_request(messages, stop)
 
-        # 4. 调用方舟平台API并解析结果
+        # 4. 调用方舟平台API并解析结果（共享连接池，复用 keep-alive 连接）
+        response = None
         try:
-            response = requests.post(
+            response = get_http_session().post(
                 url=self.api_base,
                 json=request_body,
                 headers=headers,
-                timeout=30
+                timeout=HTTP_TIMEOUT_SEC
             )
             response.raise_for_status()  # 抛出HTTP错误（如401/403）
-            # Try to parse JSON; if decoding fails, include raw text for debugging
-            try:
-                result = response.json()
-            except Exception:
-                # Ensure we decode with utf-8 fallback
-                content_text = None
-                try:
-                    content_text = response.content.decode(
-                        response.encoding or "utf-8", errors="replace"
-                    )
-                except Exception:
-                    content_text = str(response.content)
-                raise RuntimeError(
-                    f"Non-JSON response from API (status={response.status_code}): {content_text}"
-                )
-            # 提取模型回复内容
-            answer = result["choices"][0]["message"]["content"].strip()
+            return self._parse_answer(response.status_code, response.content, response.encoding)
         except Exception as e:
-            # Provide richer error message to help diagnose encoding/header issues
-            import traceback
-
-            tb = traceback.format_exc()
-            resp_info = None
-            if "response" in locals():
-                try:
-                    resp_text = response.content.decode(
-                        response.encoding or "utf-8", errors="replace"
-                    )
-                except Exception:
-                    resp_text = str(getattr(response, "content", None))
-                resp_info = {
-                    "status_code": getattr(response, "status_code", None),
-                    "body": resp_text,
-                }
-            raise RuntimeError(
-                "调用火山方舟API失败: "
-                f"{type(e).__name__}: {repr(e)}; response={resp_info}; traceback={tb}"
-            ) from e
+            if response is None:
+                self._raise_call_error(e, None, None, None)
+            self._raise_call_error(e, response.status_code, response.content, response.encoding)
 
-        # 5. 转换为LangChain标准ChatResult（保证调用逻辑一致）
-        chat_generation = ChatGeneration(message=AIMessage(content=answer))
-        return ChatResult(generations=[chat_generation])
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        """原生异步调用：在事件循环内直接发请求，不占用线程池"""
+        request_body, headers = self._build_request(messages, stop)
+        status, content, encoding = None, None, None
+        try:
+            async with get_async_http_session().post(self.api_base, json=request_body, headers=headers) as response:
+                status, content, encoding = response.status, await response.read(), response.charset
+                response.raise_for_status()
+            return self._parse_answer(status, content, encoding)
+        except Exception as e:
+            self._raise_call_error(e, status, content, encoding)
 
     @property
     def _llm_type(self) -> str:
@@ -1,14 +1,24 @@
-from typing import Dict, List, Tuple, Any, Optional
+from typing import Annotated, Dict, List, NamedTuple, Tuple, Any, Iterable, Optional, Union
+from bisect import bisect_left
+from functools import lru_cache
+import datetime
+import logging
 import time
+import zoneinfo
 
+import numpy as np
 from pydantic import (
     BaseModel,
     EmailStr,
     Field,
+    TypeAdapter,
+    ValidationInfo,
     model_validator,
     field_validator,
     ValidationError
 )
+from common.series import BehaviorSeries, EventSeries
+from common.rollup import BehaviorRollup
 
 
 class BaseResponse(BaseModel):
@@ -68,6 +78,60 @@ class SleepElement(BaseModel):
   duration: float = Field(..., description="睡眠阶段持续时长，单位分钟")
   sleep_type: str = Field(..., description="睡眠阶段类型，如REM、core,deep,rem,awake")
 
+# model_validate(context=STORED_CONTEXT) decodes a record this server stored, whose
+# night summaries were computed at ingest; without it every summary is recomputed
+STORED_CONTEXT = {"stored_record": True}
+
+# stage codes for NightSummary's bincount; any other sleep_type only counts towards time in bed
+STAGE_CODES = {"rem": 0, "core": 1, "deep": 2, "awake": 3}
+OTHER_STAGE = len(STAGE_CODES)
+
+
+class NightSummary(BaseModel):
+  """一晚睡眠阶段的汇总（分钟）"""
+  rem_sleep_duration: float = 0.0
+  core_sleep_duration: float = 0.0
+  deep_sleep_duration: float = 0.0
+  night_awake_duration: float = 0.0
+  night_awake_count: int = 0
+  night_awake_type: Optional[str] = None
+  time_in_bed: float = 0.0
+  segments: int = Field(0, description="sleep_status 段数，用于判断汇总是否过期")
+
+  @classmethod
+  def from_elements(cls, elements: List[SleepElement]) -> "NightSummary":
+    """One pass over the segments, then a weighted and a plain bincount over stage codes."""
+    if not elements:
+      return cls()
+    codes = np.fromiter((STAGE_CODES.get(e.sleep_type, OTHER_STAGE) for e in elements), dtype=np.intp, count=len(elements))
+    durations = np.fromiter((e.duration for e in elements), dtype=np.float64, count=len(elements))
+    minutes = np.bincount(codes, weights=durations, minlength=OTHER_STAGE + 1)
+    counts = np.bincount(codes, minlength=OTHER_STAGE + 1)
+    awake_count = int(counts[STAGE_CODES["awake"]])
+    return cls(
+      rem_sleep_duration=float(minutes[STAGE_CODES["rem"]]),
+      core_sleep_duration=float(minutes[STAGE_CODES["core"]]),
+      deep_sleep_duration=float(minutes[STAGE_CODES["deep"]]),
+      night_awake_duration=float(minutes[STAGE_CODES["awake"]]),
+      night_awake_count=awake_count,
+      night_awake_type="awake" if awake_count else None,
+      time_in_bed=float(durations.sum()),
+      segments=len(elements),
+    )
+
+  def as_dict(self) -> dict:
+    """The dict SleepResult.sequence_summaries has always returned."""
+    return {
+      "rem_sleep_duration": self.rem_sleep_duration,
+      "core_sleep_duration": self.core_sleep_duration,
+      "deep_sleep_duration": self.deep_sleep_duration,
+      "night_awake_duration": self.night_awake_duration,
+      "night_awake_count": self.night_awake_count,
+      "night_awake_type": self.night_awake_type,
+      "time_in_bed": self.time_in_bed,
+    }
+
+
 class SleepResult(BaseModel):
   timestamp: int = Field(..., description="数据 update 时间戳（秒级）")
   sleep_quality: Optional[float] = Field(None, description="睡眠得分，范围0-100") 
@@ -91,25 +155,21 @@ class SleepResult(BaseModel):
   # the recent sleep status sequence, with start_time, duration and sleep_type, used for sleep analysis and advice generation
   sleep_status: List[SleepElement] = Field(default_factory=list, description="the seq for the sleep status, with start_time, duration and sleep_type")
 
-  @property
-  def sequence_summaries(self):
-    awake_types = {}
-    for seq in self.sleep_status:
-      if seq.sleep_type == "awake":
-        awake_types[seq.sleep_type] = awake_types.get(seq.sleep_type, 0) + 1
+  # stage totals of sleep_status, computed once when the night is validated and stored with it
+  night_summary: Optional[NightSummary] = Field(None, description="sleep_status 的分阶段汇总（服务端计算）")
 
-    max_awake_type = max(awake_types, key=awake_types.get) if awake_types else None
+  @model_validator(mode="after")
+  def summarize_night(self, info: ValidationInfo):
+    # only a stored record keeps its summary (old ones have none); a client-sent one is never trusted
+    stored = bool(info.context and info.context.get("stored_record"))
+    if not stored or self.night_summary is None or self.night_summary.segments != len(self.sleep_status):
+      self.night_summary = NightSummary.from_elements(self.sleep_status)
+    return self
+
+  @property
+  def sequence_summaries(self) -> dict:
+    return self.night_summary.as_dict()
 
-    return {
-      "rem_sleep_duration": sum(seq.duration for seq in self.sleep_status if seq.sleep_type == "rem"),
-      "core_sleep_duration": sum(seq.duration for seq in self.sleep_status if seq.sleep_type == "core"),
-      "deep_sleep_duration": sum(seq.duration for seq in self.sleep_status if seq.sleep_type == "deep"),
-      "night_awake_duration": sum(seq.duration for seq in self.sleep_status if seq.sleep_type == "awake"),
-      "night_awake_count": sum(1 for seq in self.sleep_status if seq.sleep_type == "awake"),
-      "night_awake_type": max_awake_type,
-      "time_in_bed": sum(seq.duration for seq in self.sleep_status) 
-    }
-  
 # -------------------------- 助眠场景推荐模型 --------------------------
 class SleepStage(BaseModel):
   """助眠阶段模型"""
@@ -126,6 +186,224 @@ class SleepScenario(BaseModel):
   scenario_name: Optional[str] = Field(None, description="方案展示名称")
   stages: List[SleepStage] = Field(default_factory=list, description="包含四个睡眠阶段")
 
+# days of per-day scene counts kept by SceneUsage; covers the 7- and 30-day windows
+SCENE_USAGE_DAYS = 30
+
+
+def epoch_day(date: str | datetime.date | None = None, tz: Optional[datetime.tzinfo] = None) -> int:
+  """UTC day number (days since 1970-01-01) that ends a window at a local date; None = the current UTC day.
+
+  Nights and scene plays are bucketed by UTC day (ts // 86400). A local
+  `date` in `tz` (UTC when omitted) maps to the UTC day its last second
+  falls in, capped at the current UTC day, so a window ending "today" ends
+  at the newest bucket whatever the time of day in `tz`.
+  """
+  today = int(time.time()) // 86400
+  if date is None:
+    return today
+  if isinstance(date, str):
+    date = datetime.date.fromisoformat(date)
+  day_end = datetime.datetime.combine(date + datetime.timedelta(days=1), datetime.time(), tz or datetime.timezone.utc)
+  return min(today, (int(day_end.timestamp()) - 1) // 86400)
+
+
+class SceneUsage(BaseModel):
+  """单个助眠场景的使用计数
+
+  sop_start counts per UTC day for the last SCENE_USAGE_DAYS days plus an
+  all-time total, maintained as events are ingested, so "most used scene
+  this week" reads at most 30 small counters instead of every record.
+  """
+  total: int = 0
+  last_ts: int = 0
+  daily: Dict[int, int] = Field(default_factory=dict, description="UTC day number -> sop_start count")
+
+  def record(self, ts: int, count: int = 1):
+    day = ts // 86400
+    self.total += count
+    self.last_ts = max(self.last_ts, ts)
+    newest = self.last_ts // 86400
+    if day <= newest - SCENE_USAGE_DAYS:
+      return
+    self.daily[day] = self.daily.get(day, 0) + count
+    if len(self.daily) > SCENE_USAGE_DAYS:
+      self.daily = {d: n for d, n in self.daily.items() if d > newest - SCENE_USAGE_DAYS}
+
+  def count(self, end_day: int, days: Optional[int] = None) -> int:
+    """sop_starts in the `days` days ending at end_day (inclusive); None = all time."""
+    if days is None:
+      return self.total
+    return sum(self.daily.get(day, 0) for day in range(end_day - days + 1, end_day + 1))
+
+  @classmethod
+  def from_records(cls, records: Dict[str, Any]) -> Dict[str, "SceneUsage"]:
+    """Rebuild counters from mindora_record items, for profiles stored before counters existed."""
+    usage = {}
+    for cmd, items in (records or {}).items():
+      if not items:
+        continue
+      scene = usage[cmd] = cls()
+      for item in sorted(items, key=lambda x: x[0]):
+        scene.record(int(item[0]))
+    return usage
+
+
+def top_scenes(usage: Dict[str, SceneUsage], end_day: int, days: Optional[int] = None, n: int = 1) -> List[Tuple[str, int]]:
+  """The n most used scenes in the window as (cmd, count), most used first; unused scenes are skipped."""
+  counts = [(cmd, scene.count(end_day, days)) for cmd, scene in (usage or {}).items()]
+  counts = [item for item in counts if item[1] > 0]
+  counts.sort(key=lambda item: item[1], reverse=True)
+  return counts[:n]
+
+
+# per-night values summed by SleepAggregates; stage shares are % of time in bed
+AGGREGATE_METRICS = ("sleep_quality", "soe", "deep_pct", "rem_pct", "core_pct", "avg_heart_rate", "hrv")
+# window lengths (days) kept as running totals; daily rows cover the longest one
+AGGREGATE_WINDOWS = (7, 30, 90)
+_AGGREGATE_DAYS = max(AGGREGATE_WINDOWS)
+
+
+def _night_row(night: SleepResult) -> List[float]:
+  """[nights, sum_1, count_1, sum_2, count_2, ...] of one night, in AGGREGATE_METRICS order."""
+  summary = night.night_summary
+  tb = summary.time_in_bed
+  values = (
+    night.sleep_quality,
+    night.soe,
+    summary.deep_sleep_duration / tb * 100 if tb else None,
+    summary.rem_sleep_duration / tb * 100 if tb else None,
+    summary.core_sleep_duration / tb * 100 if tb else None,
+    night.avg_heart_rate,
+    night.hrv,
+  )
+  row = [1.0]
+  for value in values:
+    row += (float(value), 1.0) if value is not None else (0.0, 0.0)
+  return row
+
+
+def _add_row(total: Optional[List[float]], row: List[float], sign: float = 1.0) -> List[float]:
+  if total is None:
+    return [sign * x for x in row]
+  return [a + sign * b for a, b in zip(total, row)]
+
+
+class SleepAggregates(BaseModel):
+  """最近7/30/90天睡眠指标的滚动汇总
+
+  Running sums and counts of AGGREGATE_METRICS for each window in
+  AGGREGATE_WINDOWS, ending at the UTC day of the newest night, updated as
+  nights are added or replaced; days that fall out of a window are
+  subtracted when a newer night moves the window forward. One row per UTC
+  day is kept for the longest window, so windows ending on a later day
+  (today, with no new night yet) or an earlier one are still a bounded scan.
+  """
+  newest_day: int = Field(-1, description="UTC day number of the newest night folded in")
+  daily: Dict[int, List[float]] = Field(default_factory=dict, description="UTC day number -> summed row")
+  windows: Dict[int, List[float]] = Field(default_factory=dict, description="window days -> summed row ending at newest_day")
+
+  def add(self, night: SleepResult):
+    day = night.timestamp // 86400
+    if day > self.newest_day:
+      self._advance(day)
+    self._fold(day, _night_row(night), 1.0)
+
+  def remove(self, night: SleepResult):
+    """Take back a night added earlier (replaced by a re-sent record or trimmed)."""
+    day = night.timestamp // 86400
+    if day <= self.newest_day:
+      self._fold(day, _night_row(night), -1.0)
+
+  def _fold(self, day: int, row: List[float], sign: float):
+    if day <= self.newest_day - _AGGREGATE_DAYS:
+      return
+    daily = _add_row(self.daily.get(day), row, sign)
+    if daily[0] > 0.5:
+      self.daily[day] = daily
+    else:
+      self.daily.pop(day, None)
+    for days in AGGREGATE_WINDOWS:
+      if day > self.newest_day - days:
+        self.windows[days] = _add_row(self.windows.get(days), row, sign)
+
+  def _advance(self, day: int):
+    """Move every window to end at `day`, subtracting the days that leave it."""
+    for days, total in self.windows.items():
+      for d, row in self.daily.items():
+        if self.newest_day - days < d <= day - days:
+          total = _add_row(total, row, -1.0)
+      self.windows[days] = total
+    self.newest_day = day
+    oldest = day - _AGGREGATE_DAYS
+    if any(d <= oldest for d in self.daily):
+      self.daily = {d: row for d, row in self.daily.items() if d > oldest}
+
+  def window(self, days: int, end_day: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """Means over the nights of the `days` UTC days ending at end_day (default: the newest night's day).
+
+    None when there are no nights in the window or it reaches back past
+    the daily rows kept.
+    """
+    if end_day is None:
+      end_day = self.newest_day
+    if days > _AGGREGATE_DAYS or end_day - days < self.newest_day - _AGGREGATE_DAYS:
+      return None
+    if end_day >= self.newest_day and days in self.windows:
+      row = self.windows[days]
+      if end_day > self.newest_day:
+        for d, daily in self.daily.items():
+          if self.newest_day - days < d <= end_day - days:
+            row = _add_row(row, daily, -1.0)
+    else:
+      row = None
+      for d, daily in self.daily.items():
+        if end_day - days < d <= end_day:
+          row = _add_row(row, daily)
+    return _row_means(row)
+
+  @classmethod
+  def from_nights(cls, nights: Iterable[SleepResult]) -> "SleepAggregates":
+    """Rebuild from stored nights, for profiles stored before the aggregates existed."""
+    aggregates = cls()
+    for night in nights:
+      aggregates.add(night)
+    return aggregates
+
+
+def _row_means(row: Optional[List[float]]) -> Optional[Dict[str, Any]]:
+  if row is None or row[0] < 0.5:
+    return None
+  result: Dict[str, Any] = {"nights": round(row[0])}
+  for k, name in enumerate(AGGREGATE_METRICS):
+    total, count = row[1 + 2 * k], row[2 + 2 * k]
+    result[name] = round(total / count, 1) if count > 0.5 else None
+  return result
+
+
+class RecoBaseline(BaseModel):
+  """上次重新生成推荐时的特征快照
+
+  What the reco-relevant features looked like when recommendations were
+  last regenerated; reco_gate measures how far the profile has moved
+  since, so small changes that add up across updates still trigger a rerun.
+  """
+  ts: int = Field(0, description="rerun time (seconds), 0 = recommendations never generated")
+  catalog_version: str = ""
+  newest_night_ts: int = Field(0, description="timestamp of the newest night seen by that rerun")
+  sleep_quality_7d: Optional[float] = None
+  heart_rate_30d: Optional[float] = None
+  sop_plays: int = Field(0, description="all-time sop_start count over every scene")
+  long_term_profile: Dict[str, float] = Field(default_factory=dict)
+
+
+# vital signs that are always numeric: an empty list of these is a BehaviorSeries,
+# where the left_to_right union alone would make it an EventSeries
+NUMERIC_BEHAVIORS = frozenset({
+  "heart_rate", "blood_oxygen", "resting_heart_rate", "heart_rate_variability_sdnn",
+  "respiratory_rate", "sleeping_wrist_temperature", "body_temperature",
+})
+
+
 class UserProfile(BaseModel):
   """用户画像信息"""
   uid_emb: List[float] = Field(default_factory=list)
@@ -135,6 +413,8 @@ class UserProfile(BaseModel):
   # 新增：存储推荐的助眠候选方案
   sleep_scenarios_reco: Optional[List[SleepScenario]] = Field(default_factory=list, description="推荐的候选助眠流程列表")
   standard_sop_reco: List[SleepScenario] = Field(default_factory=list, description="推荐的标准SOP流程列表")
+  # features at the last reco rerun, see reco_gate; kept out of API responses
+  reco_baseline: RecoBaseline = Field(default_factory=RecoBaseline)
 
   @field_validator("standard_sop_reco", mode="before")
   @classmethod
@@ -161,7 +441,8 @@ class UserProfile(BaseModel):
         normalized.append(item)
     return normalized
 
-  behaviors: Dict[str, List[Tuple[int, Any]]] = Field(
+  # bounded ring-buffer series: numeric signals as BehaviorSeries, everything else (clicks, plays, ...) as EventSeries
+  behaviors: Dict[str, Annotated[Union[BehaviorSeries, EventSeries], Field(union_mode="left_to_right")]] = Field(
     default_factory=lambda: {
       # 生命体征
       "heart_rate": [], "blood_oxygen": [], "resting_heart_rate": [],
@@ -172,11 +453,19 @@ class UserProfile(BaseModel):
       "sleep_stage_deep": [], "sleep_stage_rem": [], "sleep_stage_light": [],
       # 交互行为
       "clicks": [], "plays": [],
-    }
+    },
+    validate_default=True,
   )
 
+  # minute/hour/day min/max/mean/count of the numeric behaviors, folded in at merge time, so history
+  # survives the raw ring buffers above; kept out of API responses
+  behavior_rollups: Dict[str, BehaviorRollup] = Field(default_factory=dict)
+
   # only the recent 7 days sleep data will be returned to app, and used for sleep analysis and advice generation, such as the data of yestoday night
+  # kept sorted by timestamp (one night per timestamp) so day/week/month lookups are a bisect, see nights_between
   sleep_data:  List[SleepResult] = Field(default_factory=list)
+  # 7/30/90-day running sums of the nightly metrics, updated as nights are merged; kept out of API responses
+  sleep_aggregates: SleepAggregates = Field(default_factory=SleepAggregates)
 
   sleep_analysis: Dict[str, Any] = Field(
     default_factory=lambda: {
@@ -187,7 +476,7 @@ class UserProfile(BaseModel):
     }
   )
 
-  mindora_record: Dict[str, List[Tuple[Any, Any]]] = Field(
+  mindora_record: Dict[str, EventSeries] = Field(
     default_factory=lambda: {
       "sleep.scene.cocos_island_moonlight": [], 
       "sleep.scene.amalfi_breeze": [],
@@ -197,11 +486,209 @@ class UserProfile(BaseModel):
       "sleep.scene.sedona_red_rock_peace" : [],
       "sleep.scene.fogo_island_cookie_box": [],
       "sleep.scene.seychelles_moonlight_lullaby": []
-    }
+    },
+    validate_default=True,
   )
+  # per-scene sop_start counters kept next to mindora_record, with 7/30-day windows
+  scene_usage: Dict[str, SceneUsage] = Field(default_factory=dict)
 
   profile: Optional[Profile] = None
 
+  @field_validator("behaviors", mode="before")
+  @classmethod
+  def pin_numeric_behaviors(cls, value):
+    if isinstance(value, dict):
+      empty = [name for name in NUMERIC_BEHAVIORS if isinstance(value.get(name), list) and not value[name]]
+      if empty:
+        value = {**value, **{name: BehaviorSeries() for name in empty}}
+    return value
+
+  @field_validator("sleep_data", mode="after")
+  @classmethod
+  def sort_sleep_data(cls, value: List[SleepResult]) -> List[SleepResult]:
+    return sorted_by_timestamp(value)
+
+  @model_validator(mode="before")
+  @classmethod
+  def backfill_derived_fields(cls, data, info: ValidationInfo):
+    if isinstance(data, dict):
+      _backfill_derived_fields(data, context=info.context)
+    return data
+
+
+def _backfill_derived_fields(data: dict, fields: Optional[Iterable[str]] = None, context: Optional[dict] = None):
+  """Fill fields derived from other stored fields when a record predates them; `fields` limits which."""
+  if (fields is None or "scene_usage" in fields) and not data.get("scene_usage") and data.get("mindora_record"):
+    data["scene_usage"] = SceneUsage.from_records(data["mindora_record"])
+  aggregates = data.get("sleep_aggregates")
+  if isinstance(aggregates, SleepAggregates):
+    aggregates = {"newest_day": aggregates.newest_day}
+  # a record from before the aggregates, or one carrying only the empty default
+  missing = (aggregates or {}).get("newest_day", -1) < 0
+  if (fields is None or "sleep_aggregates" in fields) and missing and data.get("sleep_data"):
+    # one night per timestamp, the later record winning, as sort_sleep_data keeps them
+    nights = (SleepResult.model_validate(night, context=context) for night in data["sleep_data"])
+    by_ts = {night.timestamp: night for night in nights}
+    data["sleep_aggregates"] = SleepAggregates.from_nights(by_ts[ts] for ts in sorted(by_ts))
+
+
+@lru_cache(maxsize=None)
+def _profile_field_adapter(name: str) -> TypeAdapter:
+  return TypeAdapter(UserProfile.model_fields[name].annotation)
+
+
+@lru_cache(maxsize=None)
+def _profile_field_before_validators(name: str) -> tuple:
+  decorators = UserProfile.__pydantic_decorators__.field_validators.values()
+  return tuple(
+    getattr(UserProfile, d.cls_var_name)
+    for d in decorators
+    if name in d.info.fields and d.info.mode == "before"
+  )
+
+
+class TsRange(NamedTuple):
+  """[start, end) on the item timestamps of a timestamp-sorted list field (sleep_data)."""
+  start: int
+  end: int
+
+
+# A projection names the UserProfile fields to load, either as a plain list or
+# as {field: tail}, where tail keeps only the last N items of a list field,
+# or a TsRange keeps the items stamped inside it (None keeps everything).
+FieldSpec = Iterable[str] | Dict[str, Optional[int | TsRange]]
+
+
+def normalize_field_spec(fields: FieldSpec) -> Dict[str, Optional[int | TsRange]]:
+  if isinstance(fields, dict):
+    return dict(fields)
+  return {name: None for name in fields}
+
+
+def merge_field_specs(*specs: FieldSpec) -> Dict[str, Optional[int | TsRange]]:
+  """Union of projections; the longer tail, the hull of two ranges, or None = everything wins."""
+  merged: Dict[str, Optional[int | TsRange]] = {}
+  for spec in specs:
+    for name, tail in normalize_field_spec(spec).items():
+      if name not in merged:
+        merged[name] = tail
+      elif merged[name] is None or tail is None:
+        merged[name] = None
+      elif isinstance(merged[name], TsRange) and isinstance(tail, TsRange):
+        merged[name] = TsRange(min(merged[name].start, tail.start), max(merged[name].end, tail.end))
+      elif isinstance(merged[name], TsRange) or isinstance(tail, TsRange):
+        # a tail and a time range cannot be expressed as one selection
+        merged[name] = None
+      else:
+        merged[name] = max(merged[name], tail)
+  return merged
+
+
+def resolve_timezone(name: Optional[str]) -> datetime.tzinfo:
+  """tzinfo of an IANA zone name; unknown or missing names fall back to UTC."""
+  if not name or name == "UTC":
+    return datetime.timezone.utc
+  try:
+    return zoneinfo.ZoneInfo(name)
+  except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+    logging.warning("unknown timezone %r, using UTC", name)
+    return datetime.timezone.utc
+
+
+def day_range(first: str | datetime.date, last: str | datetime.date, tz: datetime.tzinfo) -> TsRange:
+  """Timestamps from local midnight of `first` to local midnight after `last`, in `tz`."""
+  if isinstance(first, str):
+    first = datetime.date.fromisoformat(first)
+  if isinstance(last, str):
+    last = datetime.date.fromisoformat(last)
+  start = datetime.datetime.combine(first, datetime.time(), tz)
+  end = datetime.datetime.combine(last + datetime.timedelta(days=1), datetime.time(), tz)
+  return TsRange(int(start.timestamp()), int(end.timestamp()))
+
+
+def _timestamp_of(item) -> int:
+  return item["timestamp"] if isinstance(item, dict) else item.timestamp
+
+
+def sorted_by_timestamp(items: list) -> list:
+  """items in timestamp order, one per timestamp (the later record wins); works on models and on raw dicts."""
+  if all(_timestamp_of(a) < _timestamp_of(b) for a, b in zip(items, items[1:])):
+    return items
+  by_ts = {_timestamp_of(item): item for item in items}
+  return [by_ts[ts] for ts in sorted(by_ts)]
+
+
+def select_range(items: list, rng: TsRange) -> list:
+  """Items of a timestamp-sorted list inside rng, in O(log n); works on models and on raw dicts."""
+  lo = bisect_left(items, rng.start, key=_timestamp_of)
+  hi = bisect_left(items, rng.end, lo=lo, key=_timestamp_of)
+  return items[lo:hi]
+
+
+def nights_between(sleep_data: List[SleepResult], first: str, last: str, tz: datetime.tzinfo) -> List[SleepResult]:
+  """Nights whose record timestamp falls on a local calendar day in [first, last]."""
+  return select_range(sleep_data, day_range(first, last, tz))
+
+
+def _select(value: Any, spec: Optional[int | TsRange]) -> Any:
+  if spec is None or not isinstance(value, list):
+    return value
+  if isinstance(spec, TsRange):
+    return select_range(value, spec)
+  return value[-spec:] if spec > 0 else []
+
+
+class ProfileView:
+  """UserProfile 的只读字段投影
+
+  Holds only the requested fields, each validated exactly as UserProfile
+  would validate it. Reading a field outside the projection raises
+  AttributeError instead of silently returning a default.
+  """
+  __slots__ = ("_values",)
+
+  def __init__(self, values: Dict[str, Any]):
+    self._values = values
+
+  def __getattr__(self, name: str) -> Any:
+    try:
+      return self._values[name]
+    except KeyError:
+      if name in UserProfile.model_fields:
+        raise AttributeError(f"UserProfile field '{name}' is not part of this projection") from None
+      raise AttributeError(name) from None
+
+  @property
+  def fields(self) -> List[str]:
+    return list(self._values)
+
+  @classmethod
+  def from_data(cls, data: Dict[str, Any], fields: FieldSpec) -> "ProfileView":
+    """Validate only the projected fields of a json-ready profile dict."""
+    values = {}
+    fields = normalize_field_spec(fields)
+    _backfill_derived_fields(data, fields, STORED_CONTEXT)
+    for name, tail in fields.items():
+      if name not in data:
+        values[name] = UserProfile.model_fields[name].get_default(call_default_factory=True)
+        continue
+      value = data[name]
+      if name == "sleep_data":
+        # sort_sleep_data runs after validation, but TsRange and tail projections need the order first
+        value = sorted_by_timestamp(value)
+      value = _select(value, tail)
+      for validator in _profile_field_before_validators(name):
+        value = validator(value)
+      values[name] = _profile_field_adapter(name).validate_python(value, context=STORED_CONTEXT)
+    return cls(values)
+
+  @classmethod
+  def from_profile(cls, profile: UserProfile, fields: FieldSpec) -> "ProfileView":
+    values = {}
+    for name, tail in normalize_field_spec(fields).items():
+      values[name] = _select(getattr(profile, name), tail)
+    return cls(values)
+
 
 class ProfileData(BaseModel):
   uid: Optional[str] = Field(None, description="uid, just for debug")
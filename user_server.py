@@ -1,28 +1,43 @@
 import asyncio,copy,datetime,json,logging,os,threading,time
-from typing import Any, Optional, List
+from bisect import bisect_left
+from operator import attrgetter
+from typing import Any, Iterable, Optional, List
 from pathlib import Path
 from dotenv import load_dotenv
 import jwt
 from pydantic import BaseModel, ValidationError
 import websockets
 from aiohttp import ClientResponseError, ClientSession, web
-from sleep_reco import RecommendationEngine
+from sleep_reco import RECO_SCENARIOS, RECO_SOP, RecommendationEngine
 try:
   import plyvel
 except ImportError:
   plyvel = None
-from user_profile import UserProfile, SleepScenario
 from config import Config
-from common import util
+from common.uid_lock import UidLockManager
+from common.uid_mailbox import UidMailbox
+from common.debounced_worker import DebouncedWorker
+from common.loop_monitor import EventLoopLagMonitor
+from common.series import BehaviorSeries, EventSeries, PACKED_CONTEXT, DEFAULT_CAPACITY, merge_behavior_groups
+from common.rollup import fold_behavior_rollups
+from db.segment_log import SegmentLogDB
+from db.profile_cache import ProfileCache
+from db.write_batcher import WriteBatcher
+from db.async_profile_store import AsyncProfileStore
+from db import profile_codec, profile_parts
 from user_profile import (
-  UserProfile, ProfileRequest, ProfileResponse, ProfileData,
+  UserProfile, ProfileView, FieldSpec, normalize_field_spec, merge_field_specs, ProfileRequest, ProfileResponse, ProfileData, STORED_CONTEXT,
+  SleepScenario, SceneUsage, SleepAggregates, RecoBaseline,
   InvalidOrExpiredTokenResp, InvalidReqFormatResp, BaseResponse,
   AnalysisRequest, AnalysisResponse,
   SleepAdviceRequest, SleepAdviceResponse, SleepAdviceResult,
 )
 from auth import AuthRequest
 from uid.uuid import get_or_create_uuid
-from llm_service import SleepAnalysisLLM, extract_sleep_context, deep_merge
+from analysis_modules import ANALYSIS_MODULES, overall_score
+from reco_gate import RecoGate, snapshot as reco_snapshot
+from llm_service import SleepAnalysisLLM, extract_sleep_context, deep_merge, SLEEP_CONTEXT_FIELDS
+from tool.doubao_langchain import close_async_http_session
 import logger
 import copy
 
@@ -31,17 +46,42 @@ run_dir = os.getenv("RUN_DIR")
 logger.init_log(f"{run_dir}/user_server_logs")
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
 REMOTE_SYNC_HEADER = "X-Mindora-Remote-Sync"
+# server-side aggregates that are not part of the profile the app reads or writes (model_dump exclude spec)
+API_EXCLUDED_FIELDS = {
+  "behavior_rollups": True,
+  "sleep_aggregates": True,
+  "reco_baseline": True,
+  "scene_usage": True,
+  # recomputed from sleep_status whenever a night is ingested
+  "sleep_data": {"__all__": {"night_summary"}},
+}
 
 
 # all bloking sync api
 class UserProfileServ:
-  MAX_BEHAVIOR_LEN = 100
+  MAX_BEHAVIOR_LEN = DEFAULT_CAPACITY
   def __init__(self):
-    self.lock = threading.RLock()
+    # per-uid locks: a slow update for one user never blocks other users
+    self.locks = UidLockManager()
+    # concurrent update_profile calls of one uid are merged into one read-modify-write
+    self.mailbox = UidMailbox()
+    # recommendations are regenerated off the update path, debounced per uid
+    self.reco_worker = None
+    if Config.RECO_WORKERS > 0:
+      self.reco_worker = DebouncedWorker(
+        self._refresh_reco,
+        workers=Config.RECO_WORKERS,
+        debounce_sec=Config.RECO_DEBOUNCE_SEC,
+        max_delay_sec=Config.RECO_MAX_DELAY_SEC,
+        name="reco-worker",
+      )
+    # decides whether an update moved the profile enough to regenerate recommendations
+    self.reco_gate = RecoGate(Config.RECO_RERUN_RULES, Config.RECO_RERUN_MAX_AGE_SEC)
+    # validated profiles of hot users, written through by save_profile
+    self.cache = ProfileCache(Config.PROFILE_CACHE_MAX_BYTES, Config.PROFILE_CACHE_MAX_ENTRIES)
     self.storage_mode = (Config.USER_PROFILE_STORAGE_MODE or "leveldb").strip().lower()
     self.db = None
     self.json_path = Path(run_dir) / Config.USER_PROFILE_JSON_PATH
-    self.text_profiles: dict[str, Any] = {}
 
     if self.storage_mode == "leveldb":
       if plyvel is None:
@@ -51,13 +91,36 @@ class UserProfileServ:
     elif self.storage_mode not in {"txt_json", "json_txt", "json"}:
       raise ValueError(f"unsupported USER_PROFILE_STORAGE_MODE: {self.storage_mode}")
     else:
-      self.text_profiles = self._load_profiles_from_text_unlocked()
-      logging.info(f"preloaded {len(self.text_profiles)} user profiles from {self.json_path}")
+      # append-only segment log: one record per write instead of rewriting every profile
+      self.db = SegmentLogDB(
+        Path(run_dir) / Config.USER_PROFILE_SEGMENT_DIR,
+        segment_max_bytes=Config.USER_PROFILE_SEGMENT_MAX_BYTES,
+        fsync=Config.USER_PROFILE_SEGMENT_FSYNC,
+        compact_interval_sec=Config.USER_PROFILE_COMPACT_INTERVAL_SEC,
+        compact_garbage_ratio=Config.USER_PROFILE_COMPACT_GARBAGE_RATIO,
+      )
+
+    # concurrent saves are group-committed as one write batch
+    self.writer = WriteBatcher(
+      self.db,
+      window_ms=Config.PROFILE_WRITE_BATCH_WINDOW_MS,
+      max_writes=Config.PROFILE_WRITE_BATCH_MAX_WRITES,
+      sync=Config.PROFILE_WRITE_SYNC and self.storage_mode == "leveldb",
+    )
+    if isinstance(self.db, SegmentLogDB):
+      if len(self.db) == 0:
+        self._import_legacy_text_profiles()
+      logging.info(f"loaded {len(self.db)} user profile records from {self.db.path}")
 
     logging.info(f"user profile storage mode={self.storage_mode}")
 
-  def _profile_to_json_data(self, profile: UserProfile) -> dict:
-    return profile.model_dump(mode="json")
+  def _profile_to_json_data(self, profile: UserProfile, fields: Optional[set] = None) -> dict:
+    # behavior series are stored packed; the API still sees (ts, value) lists
+    return profile.model_dump(mode="json", include=fields, context=PACKED_CONTEXT)
+
+  @staticmethod
+  def _encode_record(data: dict) -> bytes:
+    return profile_codec.encode_profile(data, Config.PROFILE_CODEC_COMPRESS_MIN_BYTES)
 
   def _load_profiles_from_text_unlocked(self) -> dict[str, Any]:
     if not self.json_path.exists():
@@ -72,49 +135,106 @@ class UserProfileServ:
       raise ValueError(f"profile json file should be a dict keyed by uid: {self.json_path}")
     return profiles
 
-  def _save_profiles_to_text_unlocked(self, profiles: dict[str, Any]):
-    self.json_path.parent.mkdir(parents=True, exist_ok=True)
-    tmp_path = self.json_path.with_suffix(self.json_path.suffix + ".tmp")
-    tmp_path.write_text(
-      json.dumps(profiles, ensure_ascii=False, indent=2),
-      encoding="utf-8",
-    )
-    tmp_path.replace(self.json_path)
-
-  def _flush_text_profiles_unlocked(self):
-    self._save_profiles_to_text_unlocked(self.text_profiles)
-
-  def get_profile(self, uid: str) -> Optional[UserProfile]:
-    """读取单个用户画像"""
+  def _import_legacy_text_profiles(self):
+    """One-off import of the old single-file user_profiles.txt into the segment log."""
+    profiles = self._load_profiles_from_text_unlocked()
+    # bulk load: one batch for the whole file instead of a group-commit round trip per user
+    with self.db.write_batch() as wb:
+      for uid, data in profiles.items():
+        for key, raw in self._encode_parts(uid, data, profile_parts.ALL_PARTS)[0]:
+          wb.put(key, raw)
+    if profiles:
+      logging.info(f"imported {len(profiles)} legacy user profiles from {self.json_path}")
+
+  def _read_parts(self, uid: str, parts: Iterable[str]) -> Optional[tuple[dict, int]]:
+    """Load and reassemble the requested sub-documents of one user.
+
+    Returns (json-ready field dict, decoded bytes) or None if the user does not
+    exist. Legacy whole-profile records are split into parts on first read.
+    """
+    core_raw = self.db.get(profile_parts.part_key(uid, profile_parts.CORE_PART))  # LevelDB键值为bytes类型
+    if not core_raw:
+      return None
+    data = profile_codec.decode_profile(core_raw)
+    size = profile_codec.decoded_size(core_raw)
+    if profile_parts.is_whole_profile(data):
+      # lazy migration of json text / whole-profile records to per-part records
+      self._write_parts(uid, data, profile_parts.ALL_PARTS)
+      logging.info("split legacy whole-profile record uid=%s size=%d bytes into parts", uid, len(core_raw))
+      return data, size
+
+    data.pop(profile_parts.LAYOUT_MARKER, None)
+    for part in parts:
+      if part == profile_parts.CORE_PART:
+        continue
+      raw = self.db.get(profile_parts.part_key(uid, part))
+      if raw:
+        data.update(profile_codec.decode_profile(raw))
+        size += profile_codec.decoded_size(raw)
+    return data, size
+
+  def _encode_parts(self, uid: str, data: dict, parts: Iterable[str]) -> tuple[list[tuple[bytes, bytes]], int]:
+    """Encode the given parts of a json-ready profile dict into (key/value pairs, decoded bytes)."""
+    size = 0
+    items = []
+    for part, doc in profile_parts.split_profile(data, parts).items():
+      raw = self._encode_record(doc)
+      items.append((profile_parts.part_key(uid, part), raw))
+      size += profile_codec.decoded_size(raw)
+    return items, size
+
+  def _write_parts(self, uid: str, data: dict, parts: Iterable[str]) -> int:
+    """Write the given parts atomically; returns once the group commit holding them is done."""
+    items, size = self._encode_parts(uid, data, parts)
+    self.writer.write(items)
+    return size
+
+  def get_profile(self, uid: str, fields: Optional[FieldSpec] = None) -> Optional[UserProfile | ProfileView]:
+    """读取单个用户画像
+
+    With `fields` (a list, or {field: tail} to keep only the last N items of
+    a list field), only the sub-documents holding those fields are decoded
+    and only those fields are validated; the result is a read-only
+    ProfileView. A full profile may be shared with the cache: treat it as
+    read-only too.
+    """
     if not uid or not isinstance(uid, str):
       logging.error(f"erro uid : {uid}")
       return None
 
-    with self.lock:
-      if self.storage_mode == "leveldb":
-        data = self.db.get(uid.encode('utf-8'))  # LevelDB键值为bytes类型
-        if data:
-          logging.info("get from leveldb uid=%s size=%d bytes", uid, len(data))
-          return UserProfile.model_validate(json.loads(data.decode('utf-8')))
-        logging.info("get from leveldb uid=%s not found", uid)
+    with self.locks(uid):
+      cached = self.cache.get(uid)
+      if cached is not None:
+        return cached if fields is None else ProfileView.from_profile(cached, fields)
+
+      if fields is not None:
+        fields = normalize_field_spec(fields)
+      parts = profile_parts.ALL_PARTS if fields is None else profile_parts.parts_for_fields(fields)
+      loaded = self._read_parts(uid, parts)
+      if loaded is None:
+        logging.info("get from %s uid=%s not found", self.storage_mode, uid)
         return None
+      data, size = loaded
+      if fields is not None:
+        logging.info("get from %s uid=%s fields=%s size=%d bytes", self.storage_mode, uid, fields, size)
+        return ProfileView.from_data(data, fields)
 
-      data = self.text_profiles.get(uid)
-      logging.info("get from json txt uid=%s found=%s size=%d", uid, data is not None, len(json.dumps(data)) if data else 0)
-      if data is not None:
-        return UserProfile.model_validate(data)
-      return None
+      logging.info("get from %s uid=%s size=%d bytes", self.storage_mode, uid, size)
+      profile = UserProfile.model_validate(data, context=STORED_CONTEXT)
+      self.cache.put(uid, profile, size)
+      return profile
 
-  def save_profile(self, uid: str, profile: UserProfile):
-    """将单个用户的画像写入持久化存储"""
-    with self.lock:
-      if self.storage_mode == "leveldb":
-        data = json.dumps(self._profile_to_json_data(profile)).encode('utf-8')
-        self.db.put(uid.encode('utf-8'), data)
-        return
+  def save_profile(self, uid: str, profile: UserProfile, parts: Optional[Iterable[str]] = None):
+    """将单个用户的画像写入持久化存储
 
-      self.text_profiles[uid] = self._profile_to_json_data(profile)
-      self._flush_text_profiles_unlocked()
+    Only the given parts are rewritten; None rewrites every part.
+    """
+    parts = profile_parts.ALL_PARTS if parts is None else frozenset(parts)
+    with self.locks(uid):
+      data = self._profile_to_json_data(profile, profile_parts.fields_for_parts(parts))
+      size = self._write_parts(uid, data, parts)
+      # a partial write keeps the cache charge measured on the last whole read/write
+      self.cache.put(uid, profile, size if parts == profile_parts.ALL_PARTS else None)
 
   def _merge_profile(self, old_profile, new_profile):
     return old_profile
@@ -122,29 +242,63 @@ class UserProfileServ:
   @staticmethod
   def _behavior_counts(behaviors: dict) -> dict:
     """Return a compact count summary for logging."""
-    return {k: len(v) if isinstance(v, list) else v for k, v in behaviors.items()}
+    return {k: len(v) if isinstance(v, (list, BehaviorSeries, EventSeries)) else v for k, v in behaviors.items()}
 
   def _merge_behavior(self, old_behaviors, new_behaviors):
-    # merge sort, consider the old ones is sorted already
+    # one vectorized concat + sort + dedup + tail-trim over every behavior type
     logging.info(
       "merge behavior counts before=%s new=%s",
       self._behavior_counts(old_behaviors),
       self._behavior_counts(new_behaviors),
     )
+    # the common case -- a device pushing samples newer than anything stored -- appends
+    # in place to the ring buffers; only overlapping types go through the full merge
+    overlapping = {}
     for behavior_type, values in new_behaviors.items():
-      values.sort(key=lambda x:x[0])
-      if behavior_type in old_behaviors and isinstance(values, list):
-        old_behaviors[behavior_type].sort(key=lambda x:x[0])
-        old_behaviors[behavior_type]= util.merge_two_sorted_dedup(old_behaviors[behavior_type], values)
-      else:
-        old_behaviors[behavior_type] = values
-
-      if len(old_behaviors[behavior_type]) > UserProfileServ.MAX_BEHAVIOR_LEN:
-        old_behaviors[behavior_type] = old_behaviors[behavior_type][-UserProfileServ.MAX_BEHAVIOR_LEN:]
+      old_values = old_behaviors.get(behavior_type)
+      if isinstance(values, BehaviorSeries) and isinstance(old_values, BehaviorSeries) and old_values.extend(values):
+        continue
+      if isinstance(values, EventSeries) and isinstance(old_values, EventSeries) and old_values.extend(values):
+        continue
+      overlapping[behavior_type] = values
+    if overlapping:
+      old_behaviors.update(merge_behavior_groups(old_behaviors, overlapping, UserProfileServ.MAX_BEHAVIOR_LEN))
 
     logging.info("after update behavior counts=%s", self._behavior_counts(old_behaviors))
     return old_behaviors
 
+  @staticmethod
+  def _merge_sleep_data(profile: UserProfile, new_nights: list) -> bool:
+    """Upsert nights by record timestamp into the sorted sleep_data, keeping the newest SLEEP_DATA_MAX_NIGHTS.
+
+    sleep_aggregates follows every night added, replaced or dropped.
+    """
+    if not new_nights:
+      return False
+    nights = profile.sleep_data
+    aggregates = profile.sleep_aggregates
+    key = attrgetter("timestamp")
+    for night in new_nights:
+      # usually the newest night, so this lands at the end
+      i = bisect_left(nights, night.timestamp, key=key)
+      if i < len(nights) and nights[i].timestamp == night.timestamp:
+        aggregates.remove(nights[i])
+        nights[i] = night
+      else:
+        nights.insert(i, night)
+      aggregates.add(night)
+    for night in nights[:-Config.SLEEP_DATA_MAX_NIGHTS]:
+      aggregates.remove(night)
+    del nights[:-Config.SLEEP_DATA_MAX_NIGHTS]
+    return True
+
+  @staticmethod
+  def _fold_rollups(profile: UserProfile, old_behaviors: dict, new_behaviors: dict) -> bool:
+    updated = fold_behavior_rollups(
+      profile.behavior_rollups, old_behaviors, new_behaviors, Config.BEHAVIOR_ROLLUP_RETENTION,
+    )
+    return bool(updated)
+
   @staticmethod
   def _extract_sop_start_events(plays: list) -> list[tuple[str, int, dict]]:
     """Extract SOP start events from a plays list.
@@ -152,7 +306,7 @@ class UserProfileServ:
     Returns tuples of (cmd, timestamp, event_dict).
     """
     events: list[tuple[str, int, dict]] = []
-    if not isinstance(plays, list):
+    if not isinstance(plays, (list, EventSeries)):
       return events
     for item in plays:
       if not isinstance(item, (list, tuple)) or len(item) < 2:
@@ -166,91 +320,209 @@ class UserProfileServ:
         events.append((cmd, int(ts), event))
     return events
 
-  def _update_mindora_record(self, profile: UserProfile, new_profile: UserProfile):
-    """Move SOP play counts from behaviors.plays into mindora_record."""
+  def _update_mindora_record(self, profile: UserProfile, new_profile: UserProfile) -> bool:
+    """Move SOP play counts from behaviors.plays into mindora_record.
+
+    Returns True if any event was recorded.
+    """
     plays = new_profile.behaviors.get("plays", [])
+    updated = False
     for cmd, ts, event in self._extract_sop_start_events(plays):
-      record = profile.mindora_record.setdefault(cmd, [])
+      record = profile.mindora_record.get(cmd)
+      if record is None:
+        record = profile.mindora_record[cmd] = EventSeries(capacity=UserProfileServ.MAX_BEHAVIOR_LEN)
+      # O(1) for in-order events; the ring keeps it sorted and evicts the oldest once full
       record.append((ts, event))
-      # keep the list sorted by timestamp and cap the length
-      record.sort(key=lambda x: x[0])
-      if len(record) > UserProfileServ.MAX_BEHAVIOR_LEN:
-        record[:] = record[-UserProfileServ.MAX_BEHAVIOR_LEN:]
+      usage = profile.scene_usage.get(cmd)
+      if usage is None:
+        usage = profile.scene_usage[cmd] = SceneUsage()
+      usage.record(ts)
+      updated = True
+    return updated
 
   @staticmethod
   def _profile_for_log(profile: UserProfile) -> dict:
-    """Return a compact dict for logging (behaviors are replaced by counts)."""
-    data = profile.model_dump(mode="json", exclude_none=True)
+    """Return a compact dict for logging (behaviors and rollups are replaced by counts)."""
+    data = profile.model_dump(mode="json", exclude_none=True, exclude=API_EXCLUDED_FIELDS)
     if isinstance(data.get("behaviors"), dict):
       data["behaviors"] = {
         k: len(v) if isinstance(v, list) else v for k, v in data["behaviors"].items()
       }
+    data["behavior_rollups"] = {k: v.bucket_counts() for k, v in profile.behavior_rollups.items()}
     return data
 
   def calc_sleep_reco(self, uid: str, new_profile: UserProfile, old_profile: UserProfile) -> List[SleepScenario]:
     # 1. 触发推荐引擎逻辑
-    sleep_scenarios = old_profile.sleep_scenarios_reco
-    # if RecommendationEngine.should_rerun_recommendation(old_profile, new_profile):
     logging.info(f"Rerunning sleep scenario recommendation for {uid}")
     sleep_scenarios = RecommendationEngine.generate(new_profile)
 
     return sleep_scenarios
 
   def calc_standard_sop_reco(self, uid: str, new_profile: UserProfile, old_profile: UserProfile) -> List[SleepScenario]:
-    sop_reco = old_profile.standard_sop_reco
-    candidates = []
+    # scenes the user has played are the candidates when no SOP candidate file is configured
+    candidates = [key for key in new_profile.mindora_record.keys() if "sleep.scene." in key]
     logging.info(f"Rerunning standard SOP recommendation for {uid} with candidates={candidates}")
     sop_reco = RecommendationEngine.generate_sop_reco(new_profile, candidates)
     return sop_reco
 
+  def _schedule_reco(self, uid: str, tags: Iterable[str]):
+    if self.reco_worker is None:
+      self._refresh_reco(uid, set(tags))
+    else:
+      self.reco_worker.schedule(uid, tags)
+
+  def _refresh_reco(self, uid: str, tags: set):
+    """Regenerate the recommendations named by `tags` ("scenarios", "sop") and write back the reco part.
+
+    The LLM calls run on the stored profile without holding the uid lock;
+    only the write-back takes it, onto whatever the profile is by then.
+    """
+    profile = self.get_profile(uid)
+    if profile is None:
+      return
+    update = {}
+    if RECO_SCENARIOS in tags:
+      update["sleep_scenarios_reco"] = self.calc_sleep_reco(uid, profile, profile)
+      # later updates are measured against what this run saw
+      update["reco_baseline"] = reco_snapshot(profile)
+    if RECO_SOP in tags:
+      update["standard_sop_reco"] = self.calc_standard_sop_reco(uid, profile, profile)
+    with self.locks(uid):
+      current = self.get_profile(uid)
+      if current is None:
+        return
+      self.save_profile(uid, current.model_copy(update=update), {"reco"})
+    logging.info(
+      "reco refreshed uid=%s tags=%s worker=%s cache=%s prompt=%s",
+      uid, sorted(tags), self.reco_worker.stats() if self.reco_worker else None,
+      RecommendationEngine.cache.stats(), RecommendationEngine.prompt_stats.stats(),
+    )
+
   def update_profile(self, uid: str, new_profile: UserProfile, skip_sleep_scenarios_reco_update: bool = False) -> bool:
-    """写入用户行为（仅更新单个用户数据）"""
+    """写入用户行为（仅更新单个用户数据）
+
+    Concurrent updates of one uid are coalesced: whoever arrives first merges
+    every payload queued for that uid in a single read-modify-write, and all
+    callers get its result. Recommendations are not regenerated here; the
+    merged profile is saved and reco_gate may queue a job on reco_worker.
+    """
     if new_profile is None or uid is None or not isinstance(uid, str):
       logging.error(f"invalid new profile {new_profile} or uid {uid}")
       return False
+    return self.mailbox.submit(uid, (new_profile, skip_sleep_scenarios_reco_update), self._apply_updates)
+
+  def _merge_update(self, profile: UserProfile, new_profile: UserProfile, changed_parts: set):
+    """Merge one update payload into `profile`, recording the touched sub-documents."""
+    # just replace, if need
+    if len(new_profile.uid_emb) > 16 or profile.uid_emb is None or len(profile.uid_emb) == 0:
+      profile.uid_emb = new_profile.uid_emb
+      changed_parts.add(profile_parts.CORE_PART)
+
+    long_term_profile = self._merge_profile(profile.long_term_profile, new_profile.long_term_profile)
+    if long_term_profile != profile.long_term_profile:
+      profile.long_term_profile = long_term_profile
+      changed_parts.add(profile_parts.CORE_PART)
+
+    if new_profile.behaviors:
+      # fold into the long-horizon rollups first, while the raw rings still tell which samples are re-sends
+      if self._fold_rollups(profile, profile.behaviors, new_profile.behaviors):
+        changed_parts.add("rollups")
+      profile.behaviors = self._merge_behavior(profile.behaviors, new_profile.behaviors)
+      changed_parts.add("behaviors")
 
-    with self.lock:
+    if self._merge_sleep_data(profile, new_profile.sleep_data):
+      changed_parts.add("sleep_data")
+
+    # aggregate SOP play events into mindora_record so we can keep behaviors small
+    if self._update_mindora_record(profile, new_profile):
+      changed_parts.add("mindora_record")
+
+  def _apply_updates(self, uid: str, updates: list[tuple[UserProfile, bool]]) -> bool:
+    """Merge queued (new_profile, skip_reco) payloads in arrival order and save once.
+
+    If any payload asked for recommendations, reco_gate decides whether the
+    merged profile moved far enough from the last rerun; if so the local
+    scorer refreshes them in this same save and an LLM re-rank is queued.
+    """
+    skip_sleep_scenarios_reco_update = all(skip for _, skip in updates)
+    with self.locks(uid):
       # 读取或创建用户画像（仅操作单个用户，避免全量加载）
-      profile = self.get_profile(uid)
-      old_profile = profile
+      old_profile = self.get_profile(uid)
+      # merge into a private copy so cached readers never see a half-merged profile
+      profile = old_profile.model_copy(deep=True) if old_profile is not None else None
       if profile is None:
-        if not skip_sleep_scenarios_reco_update:
-          new_profile.sleep_scenarios_reco = RecommendationEngine.generate(new_profile)
-          new_profile.standard_sop_reco = RecommendationEngine.generate_sop_reco(
-            new_profile,
-            [key for key in new_profile.mindora_record.keys() if "sleep.scene." in key],
-        )
+        new_profile = updates[0][0]
+        # rollups are derived from behaviors only, never taken from the payload
+        new_profile.behavior_rollups = {}
+        self._fold_rollups(new_profile, {}, new_profile.behaviors)
+        new_profile.behaviors = self._merge_behavior({}, new_profile.behaviors)
+        new_profile.mindora_record = {
+          cmd: record.trim(UserProfileServ.MAX_BEHAVIOR_LEN) for cmd, record in new_profile.mindora_record.items()
+        }
+        del new_profile.sleep_data[:-Config.SLEEP_DATA_MAX_NIGHTS]
+        new_profile.sleep_aggregates = SleepAggregates.from_nights(new_profile.sleep_data)
+        for later, _ in updates[1:]:
+          self._merge_update(new_profile, later, set())
+        new_profile.reco_baseline = RecoBaseline()
+        tags = () if skip_sleep_scenarios_reco_update else (RECO_SCENARIOS, RECO_SOP)
+        self._local_reco(new_profile, tags, set())
         self.save_profile(uid, new_profile)
+        self._queue_llm_reco(uid, tags)
         return True
 
-      # just replace, if need
-      if len(new_profile.uid_emb) > 16 or profile.uid_emb is None or len(profile.uid_emb) == 0:
-        profile.uid_emb = new_profile.uid_emb
-
-      profile.long_term_profile = self._merge_profile(profile.long_term_profile, new_profile.long_term_profile)
-
-      profile.behaviors = self._merge_behavior(profile.behaviors, new_profile.behaviors)
-
-      # aggregate SOP play events into mindora_record so we can keep behaviors small
-      self._update_mindora_record(profile, new_profile)
+      # sub-documents touched by this update; only these are rewritten
+      changed_parts = set()
+      for new_profile, _ in updates:
+        self._merge_update(profile, new_profile, changed_parts)
 
+      decision = None
+      tags = ()
       if not skip_sleep_scenarios_reco_update:
-        profile.sleep_scenarios_reco = self.calc_sleep_reco(uid, profile, old_profile)
-        profile.standard_sop_reco = self.calc_standard_sop_reco(uid, profile, old_profile)
-      elif not profile.standard_sop_reco:
+        decision = self.reco_gate.decide(uid, profile)
+        if decision.rerun:
+          tags = (RECO_SCENARIOS, RECO_SOP)
+      if not tags and not profile.standard_sop_reco:
         # make sure we never leave standard_sop_reco empty just because the
         # sleep-scenarios skip flag is set
-        profile.standard_sop_reco = self.calc_standard_sop_reco(uid, profile, old_profile)
-      # 仅保存当前用户的更新（而非全量数据）
-      self.save_profile(uid, profile)
+        tags = (RECO_SOP,)
+      self._local_reco(profile, tags, changed_parts)
+
+      # 仅保存当前用户变化的子文档（而非全量数据）
+      self.save_profile(uid, profile, changed_parts)
+      self._queue_llm_reco(uid, tags)
       logging.info(
-        "Profile updated uid=%s summary=%s",
+        "Profile updated uid=%s payloads=%d reco_gate=%s summary=%s cache=%s writer=%s mailbox=%s reco=%s",
         uid,
+        len(updates),
+        decision.reason if decision is not None else "skip_flag",
         self._profile_for_log(profile),
+        self.cache.stats(),
+        self.writer.stats(),
+        self.mailbox.stats(),
+        self.reco_worker.stats() if self.reco_worker else None,
       )
       return True
-  
+
+  def _local_reco(self, profile: UserProfile, tags: Iterable[str], changed_parts: set):
+    """Refresh the recommendations named by `tags` in place from the local scorer (well under 1 ms)."""
+    if not tags or not Config.RECO_LOCAL_SCORER:
+      return
+    if RECO_SCENARIOS in tags:
+      profile.sleep_scenarios_reco = RecommendationEngine.local_scenarios(profile)
+      profile.reco_baseline = reco_snapshot(profile)
+    if RECO_SOP in tags:
+      profile.standard_sop_reco = RecommendationEngine.local_sop_reco(profile)
+    changed_parts.add("reco")
+
+  def _queue_llm_reco(self, uid: str, tags: Iterable[str]):
+    """Queue the LLM pass over what _local_reco wrote; without the local scorer it is the only source."""
+    if tags and (Config.RECO_LLM_RERANK or not Config.RECO_LOCAL_SCORER):
+      self._schedule_reco(uid, tags)
+
   def close(self):
+    if self.reco_worker is not None:
+      self.reco_worker.close()
+    self.writer.close()
     if self.db is not None:
       self.db.close()
 
@@ -306,15 +578,22 @@ class UserServer:
     self.host = Config.HOST
     self.port = Config.PORT
     self.user_serv = UserProfileServ()
+    # handlers await storage through this facade; blocking calls never run on the event loop
+    self.store = AsyncProfileStore(self.user_serv, Config.PROFILE_STORE_WORKERS)
+    self.loop_monitor = EventLoopLagMonitor(Config.EVENT_LOOP_LAG_WARN_MS, Config.EVENT_LOOP_LAG_CHECK_INTERVAL_SEC)
     self.update_task = None
     self.app = web.Application()
     self.active_uid = ""
     self.system_uid = get_or_create_uuid()
     self.debug_uid_set = {"mindora_test_uid1", "mindora_test_uid2", "mindora_test_uid3", "test_debug_user_001"}
     self.llm = SleepAnalysisLLM()
+    # the LLM's pooled aiohttp session lives on this loop; close it with the app
+    self.app.on_cleanup.append(close_async_http_session)
     self.setup_routes()
 
   def close(self):
+    self.loop_monitor.stop()
+    self.store.close()
     self.user_serv.close()
     if self.update_task:
       self.update_task.cancel()
@@ -353,7 +632,7 @@ class UserServer:
 
     return uid
 
-  def handle_query_profile(self, request: ProfileRequest) -> BaseResponse:
+  async def handle_query_profile(self, request: ProfileRequest) -> BaseResponse:
     logging.info("handle query_profile request=%s", self._request_for_log(request))
     """查询用户画像（从LevelDB按需读取）"""
     if request.data is None:
@@ -369,10 +648,10 @@ class UserServer:
     if uid == "active_uid":
       uid = self.active_uid
 
-    profile = self.user_serv.get_profile(uid)
+    profile = await self.store.get_profile(uid)
     if profile:
       logging.info("profile found uid=%s summary=%s", uid, self.user_serv._profile_for_log(profile))
-      return ProfileResponse(code=0, msg="succ", request_type=request.request_type, data={"user_profile": profile.model_dump()})
+      return ProfileResponse(code=0, msg="succ", request_type=request.request_type, data={"user_profile": profile.model_dump(exclude=API_EXCLUDED_FIELDS)})
     else:
       logging.warning("uid=%s query not found request=%s", uid, self._request_for_log(request))
       return ProfileResponse(code=0, msg=f"User with uid '{request.data}' not found", request_type=request.request_type, data=None)
@@ -391,8 +670,7 @@ class UserServer:
       return InvalidOrExpiredTokenResp()
 
     async with self.server_semaphore:
-      succ = await asyncio.to_thread(
-        self.user_serv.update_profile,
+      succ = await self.store.update_profile(
         uid,
         request.data.user_profile,
         request.data.skip_sleep_scenarios_reco_update,
@@ -406,13 +684,14 @@ class UserServer:
     if not Config.RemoteHost or len(Config.RemoteHost) < 10:
       return False
 
-    profile = self.user_serv.get_profile(uid)
+    profile = await self.store.get_profile(uid)
     if profile is None:
       logging.warning(f"skip remote sync because local profile missing for uid={uid}")
       return False
 
     remote_endpoint = f"{Config.RemoteHost.rstrip('/')}/user_profile"
-    sync_data = {"user_profile": profile.model_dump()}
+    # the remote server rebuilds rollups from the behaviors it merges
+    sync_data = {"user_profile": profile.model_dump(exclude=API_EXCLUDED_FIELDS)}
     if request.data.jwt_token is not None:
       sync_data["jwt_token"] = request.data.jwt_token
     else:
@@ -425,7 +704,7 @@ class UserServer:
       timestamp=int(time.time()),
       version=request.version,
       data=ProfileData.model_validate(sync_data),
-    ).model_dump()
+    ).model_dump(exclude={"data": {"user_profile": API_EXCLUDED_FIELDS}})
 
     try:
       async with ClientSession() as session:
@@ -466,7 +745,7 @@ class UserServer:
           data = json.loads(msg)
           req = ProfileRequest.model_validate(data)
           if req.request_type == "query_profile":
-            response_obj = self.handle_query_profile(req)
+            response_obj = await self.handle_query_profile(req)
           elif req.request_type == "update_profile":
             response_obj = await self.handle_update_profile(req)
           else:
@@ -480,13 +759,9 @@ class UserServer:
       logging.error("Connection closed.")
 
 
-  def get_overall_score(self, profile: UserProfile) -> Optional[float]:
-    """计算用户最近7天的平均睡眠质量得分（0-100）"""
-    if not profile.sleep_data:
-      return None
-    recent = profile.sleep_data[-7:]
-    scores = [s.sleep_quality for s in recent if s.sleep_quality is not None]
-    return round(sum(scores) / len(scores), 2) if scores else None
+  def get_overall_score(self, profile: UserProfile | ProfileView, nights: Optional[list] = None) -> Optional[float]:
+    """计算用户平均睡眠质量得分（0-100）, see analysis_modules.overall_score"""
+    return overall_score(profile, nights)
 
   async def handle_profile_request_http(self, request: web.Request) -> web.Response:
     try:
@@ -496,7 +771,7 @@ class UserServer:
       logging.info("request %s", self._request_for_log(req))
 
       if req.request_type == "query_profile":
-        response_obj = self.handle_query_profile(req)
+        response_obj = await self.handle_query_profile(req)
         return web.json_response(response_obj.model_dump(), status=get_http_status(response_obj))
 
       elif req.request_type == "update_profile":
@@ -518,7 +793,7 @@ class UserServer:
         if not uid:
           return web.json_response(InvalidOrExpiredTokenResp().model_dump(), status=401)
 
-        profile = self.user_serv.get_profile(uid)
+        profile = await self.store.get_profile(uid, fields={"sleep_data": 30, "sleep_aggregates": None, "sleep_analysis": None, "long_term_profile": None})
         if not profile:
           return web.json_response(ProfileResponse(code=404, msg="Profile not found").model_dump(), status=404)
 
@@ -567,11 +842,14 @@ class UserServer:
       if isinstance(uid, BaseResponse):
         return web.json_response(uid.model_dump(), status=uid.code)
 
-      profile = self.user_serv.get_profile(uid)
+      fields = self._analysis_fields(req)
+      if self.llm.enabled:
+        fields = merge_field_specs(fields, SLEEP_CONTEXT_FIELDS)
+      profile = await self.store.get_profile(uid, fields=fields)
       response_data = self._build_analysis_data(req, profile)
 
       if self.llm.enabled:
-        ctx = extract_sleep_context(profile, req.data)
+        ctx = extract_sleep_context(profile, req.data, include_profile_json=False)
         llm_text = await self.llm.generate(req.request_type, ctx, req.data.language, req.data.modules)
         if llm_text:
           deep_merge(response_data, llm_text)
@@ -617,7 +895,8 @@ class UserServer:
       if isinstance(uid, BaseResponse):
         return web.json_response(uid.model_dump(), status=uid.code)
 
-      profile = self.user_serv.get_profile(uid)
+      # the profile only feeds the LLM prompt
+      profile = await self.store.get_profile(uid) if self.llm.enabled else None
       date = req.data.date or datetime.date.today().isoformat()
       language = req.data.language or "en"
 
@@ -667,246 +946,13 @@ class UserServer:
         BaseResponse(code=500, msg="Internal server error").model_dump(), status=500
       )
 
-  def _build_analysis_data(self, req: AnalysisRequest, profile: Optional[UserProfile]) -> dict:
-    d = req.data
-    rt = req.request_type
-    if rt == "analysis_overview":
-      return self._build_overview(d, profile)
-    elif rt == "analysis_sleep_day":
-      return self._build_sleep_day(d, profile)
-    elif rt == "analysis_sleep_week":
-      return self._build_sleep_week(d, profile)
-    elif rt == "analysis_sleep_month":
-      return self._build_sleep_month(d, profile)
-    elif rt == "analysis_explore":
-      return self._build_explore(d, profile)
-    raise ValueError(f"Unknown request_type: {rt}")
-
-  def _filter_modules(self, data: dict, modules: list) -> dict:
-    return {k: v for k, v in data.items() if k in modules} if modules else data
-
-  def _build_overview(self, d, profile: Optional[UserProfile]) -> dict:
-    date = d.date or datetime.date.today().isoformat()
-    score = self.get_overall_score(profile) if profile else None
-    if score is None:
-      score = 82
-
-    weekly_best = None
-    if profile and profile.mindora_record:
-      best = max(profile.mindora_record.items(), key=lambda x: len(x[1]), default=None)
-      if best and best[1]:
-        weekly_best = {
-          "audio_name": best[0].replace("sleep.scene.", "").replace("_", " ").title(),
-          "used_times": len(best[1]),
-          "score": int(score),
-          "start_date": (datetime.date.fromisoformat(date) - datetime.timedelta(days=6)).isoformat(),
-          "end_date": date,
-        }
-    if weekly_best is None:
-      weekly_best = {
-        "audio_name": "Sedona Red Rocks",
-        "used_times": 5,
-        "score": 92,
-        "start_date": (datetime.date.fromisoformat(date) - datetime.timedelta(days=6)).isoformat(),
-        "end_date": date,
-      }
+  def _analysis_fields(self, req: AnalysisRequest) -> dict:
+    """Fields the requested modules read, sleep_data narrowed to the requested days (a bisect on load)."""
+    return ANALYSIS_MODULES.fields(req.request_type, req.data)
 
-    result = {
-      "overall_score": {"score": int(score), "date": date},
-      "weekly_best": weekly_best,
-      "sleep_insight": {
-        "title": "Excellent Deep Sleep Performance",
-        "description": "Your deep sleep accounts for a healthy proportion of total sleep. Keep maintaining a regular sleep schedule.",
-        "date": date,
-      },
-    }
-    return self._filter_modules(result, d.modules)
-
-  def _build_sleep_day(self, d, profile: Optional[UserProfile]) -> dict:
-    date = d.date or datetime.date.today().isoformat()
-    latest = profile.sleep_data[-1] if profile and profile.sleep_data else None
-    score = int(latest.sleep_quality) if latest and latest.sleep_quality else 70
-
-    result = {
-      "score_summary": {"score": score, "date": date},
-      "sleep_scenarios_reco": {
-        "title": "Sedona Desert Calm",
-        "description": "You fell asleep quickly and maintained a stable sleep rhythm after the scenario started.",
-        "date": date,
-      },
-      "stage_insights": {
-        "awake": {"description": "A brief awakening was detected and you returned to sleep quickly.", "date": date},
-        "rem":   {"description": "REM sleep was sustained and supports emotional processing.", "date": date},
-        "core":  {"description": "Core sleep remained stable across most of the night.", "date": date},
-        "deep":  {"description": "Deep sleep contributed strongly to physical recovery.", "date": date},
-      },
-    }
-    return self._filter_modules(result, d.modules)
-
-  def _build_sleep_week(self, d, profile: Optional[UserProfile]) -> dict:
-    today = datetime.date.today()
-    start = d.start_date or (today - datetime.timedelta(days=6)).isoformat()
-    end   = d.end_date   or today.isoformat()
-
-    score = self.get_overall_score(profile) if profile else None
-    score = int(score) if score else 86
-    label = "Excellent" if score >= 80 else "Good" if score >= 60 else "Fair"
-
-    result = {
-      "score_summary": {"score": score, "label": label, "start_date": start, "end_date": end},
-      "sleep_trends": {
-        "body": "Excellent Deep Sleep Performance",
-        "description": "Your deep sleep accounted for a healthy proportion of total sleep this week.",
-        "start_date": start,
-        "end_date": end,
-      },
-      "onset_efficiency": {
-        "scenario_name": "Sedona Desert Calm",
-        "used_times": 5,
-        "score": score,
-        "start_date": start,
-        "end_date": end,
-      },
-    }
-    return self._filter_modules(result, d.modules)
-
-  def _build_sleep_month(self, d, profile: Optional[UserProfile]) -> dict:
-    today = datetime.date.today()
-    start = d.start_date or (today - datetime.timedelta(days=29)).isoformat()
-    end   = d.end_date   or today.isoformat()
-
-    score = self.get_overall_score(profile) if profile else None
-    score = int(score) if score else 89
-    label = "Excellent" if score >= 80 else "Good" if score >= 60 else "Fair"
-
-    # Build score_series from real data, fall back to mock trend
-    score_series: list = []
-    if profile and profile.sleep_data:
-      for sr in profile.sleep_data[-30:]:
-        if sr.sleep_quality is not None:
-          score_series.append({
-            "date": datetime.date.fromtimestamp(sr.timestamp).isoformat(),
-            "score": int(sr.sleep_quality),
-          })
-    if not score_series:
-      cur = datetime.date.fromisoformat(start)
-      end_d = datetime.date.fromisoformat(end)
-      base = 62
-      while cur <= end_d:
-        score_series.append({"date": cur.isoformat(), "score": min(100, base)})
-        base += 1
-        cur += datetime.timedelta(days=1)
-
-    result = {
-      "score_summary": {"score": score, "label": label, "start_date": start, "end_date": end},
-      "sleep_trends": {
-        "body": "This month, you maintained a consistent amount of sleep.",
-        "description": "Deep sleep remained above the standard level and your bedtime trended earlier.",
-        "score_series": score_series,
-        "start_date": start,
-        "end_date": end,
-      },
-      "onset_efficiency": {
-        "scenario_list": ["Sedona Desert Calm", "Maldives Drift Sleep", "Canadian Forest Solace"],
-        "description": "Sedona Desert Calm was your most frequently used sleep scenario this month and showed the best onset performance.",
-        "start_date": start,
-        "end_date": end,
-      },
-    }
-    return self._filter_modules(result, d.modules)
-
-  def _build_explore(self, d, profile: Optional[UserProfile]) -> dict:
-    date  = d.date or datetime.date.today().isoformat()
-    start = (datetime.date.fromisoformat(date) - datetime.timedelta(days=6)).isoformat()
-
-    has_data = profile is not None and bool(profile.sleep_data)
-    latest   = profile.sleep_data[-1] if has_data else None
-    summaries = latest.sequence_summaries if (latest and latest.sleep_status) else {}
-
-    overall_score    = int(latest.sleep_quality) if latest and latest.sleep_quality else 82
-    onset_score      = int(latest.soe)           if latest and latest.soe           else 82
-    structure_score  = 49
-    fluctuation_score = 34
-
-    tb = summaries.get("time_in_bed") or 1
-    rem_pct  = f"{round(summaries.get('rem_sleep_duration',  0) / tb * 100, 1)}%" if summaries else "22%"
-    deep_pct = f"{round(summaries.get('deep_sleep_duration', 0) / tb * 100, 1)}%" if summaries else "29.8%"
-    core_pct = f"{round(summaries.get('core_sleep_duration', 0) / tb * 100, 1)}%" if summaries else "48.2%"
-
-    hr_mid = int(latest.avg_heart_rate) if latest and latest.avg_heart_rate else 70
-    hr_range = f"{hr_mid - 15}-{hr_mid + 15}bpm"
-    resp_fluct = f"{int(latest.respiratory_var or 25)}%" if latest else "25%"
-
-    scene_id   = "cocos_island_moonlight"
-    scene_name = "Cocos Island Moonlight"
-    if profile and profile.mindora_record:
-      best = max(profile.mindora_record.items(), key=lambda x: len(x[1]), default=None)
-      if best and best[1]:
-        scene_id   = best[0].replace("sleep.scene.", "")
-        scene_name = scene_id.replace("_", " ").title()
-
-    awake_count = summaries.get("night_awake_count", 2)
-    result = {
-      "data_ready": has_data,
-      "header_summary": {
-        "intro_text": "Last night your body entered a stable, relaxed, and highly restorative sleep state.",
-        "intro_detail_text": "What happened last night, what helped you most, and how Mindora adjusted for you.",
-        "date": date,
-      },
-      "score_summary": {
-        "score": overall_score,
-        "title": "Sleep Score",
-        "efficiency_score":   onset_score,
-        "structure_score":    structure_score,
-        "fluctuation_score":  fluctuation_score,
-        "date": date,
-      },
-      "onset_efficiency": {
-        "score": onset_score,
-        "label": "Healthy Range",
-        "onset_minutes": 12,
-        "first_sleep_time":           latest.first_sleep_time if latest else "23:45",
-        "pre_sleep_heart_rate":       f"{int(latest.hr_before_sleep)}bpm"  if latest and latest.hr_before_sleep  else "68bpm",
-        "pre_sleep_respiratory_rate": f"{int(latest.rr_before_sleep)}brpm" if latest and latest.rr_before_sleep else "15brpm",
-        "description": "You fell asleep faster than your recent average and your pre-sleep physiology stayed calm.",
-        "date": date,
-      },
-      "sleep_structure": {
-        "score": structure_score,
-        "label": "Average",
-        "continuous_sleep_minutes": int(tb),
-        "rem_percent":  rem_pct,
-        "deep_percent": deep_pct,
-        "core_percent": core_pct,
-        "description": "Your sleep structure remained relatively balanced, with deep sleep contributing strongly to recovery.",
-        "date": date,
-      },
-      "night_fluctuation": {
-        "score": fluctuation_score,
-        "label": "High Fluctuation" if awake_count > 3 else "Normal",
-        "intervention": "Rain Wash",
-        "awake_count":            awake_count,
-        "awake_duration_minutes": int(summaries.get("night_awake_duration", 5)),
-        "awake_type":             summaries.get("night_awake_type") or "Brief awakening",
-        "heart_rate_range":       hr_range,
-        "respiratory_fluctuation": resp_fluct,
-        "description": "You had a small number of brief interruptions and the system applied a suitable intervention.",
-        "date": date,
-      },
-      "scene_preference": {
-        "scene_id":   scene_id,
-        "scene_name": scene_name,
-        "scene_type": "Ocean wind with slow percussion",
-        "description": "This scene has recently matched your sleep onset rhythm most consistently.",
-        "start_date": start,
-        "end_date":   date,
-      },
-      "sleep_advice": {
-        "description": "Keep your current bedtime and continue using the same wind-down scene for the next few nights.",
-        "date": date,
-      },
-    }
-    return self._filter_modules(result, d.modules)
+  def _build_analysis_data(self, req: AnalysisRequest, profile: Optional[ProfileView]) -> dict:
+    # only the producers of the requested modules run, see analysis_modules
+    return ANALYSIS_MODULES.build(req.request_type, req.data, profile)
 
   async def handle_login_http(self, request: web.Request) -> web.Response:
     try:
@@ -941,7 +987,7 @@ class UserServer:
       if resp is None:
         logging.warning(f"none resp from remote server: {Config.RemoteHost}")
 
-      succ = self.user_serv.update_profile(resp.profile)
+      succ = await self.store.update_profile(self.active_uid, resp.profile)
       if not succ:
         logging.warning(f"erro in update profile for {resp.profile}")
       else:
@@ -951,6 +997,8 @@ class UserServer:
     """启动HTTP服务器"""
     runner = web.AppRunner(self.app)
     await runner.setup()
+    if Config.EVENT_LOOP_LAG_WARN_MS > 0:
+      self.loop_monitor.start()
     site = web.TCPSite(runner, self.host, self.port)
     await site.start()
     logging.info(f"UserServer (LevelDB) started on http://{self.host}:{self.port}")
@@ -958,6 +1006,8 @@ class UserServer:
     await asyncio.Event().wait()
 
   async def start(self):
+    if Config.EVENT_LOOP_LAG_WARN_MS > 0:
+      self.loop_monitor.start()
     async with websockets.serve(self.handle_profile_request, self.host, self.port):
       logging.info(f"UserServer started on ws://{self.host}:{self.port}")
       await asyncio.Future()  # 持续运行